@@ -186,6 +186,7 @@ setup(name = 'veusz',
         Extension('veusz.helpers.recordpaint',
                   ['veusz/helpers/src/recordpaint/recordpaintdevice.cpp',
                    'veusz/helpers/src/recordpaint/recordpaintengine.cpp',
+                   'veusz/helpers/src/recordpaint/paintbuffer.cpp',
                    'veusz/helpers/src/recordpaint/recordpaint.sip'],
                   language="c++",
                   include_dirs=['veusz/helpers/src/recordpaint'],
@@ -18,10 +18,23 @@
 
 # hooks to allow different datatypes to be imported
 
-from . import defn_standard, dialog_standard
-from . import defn_csv, dialog_csv
-from . import defn_twod, dialog_twod
-from . import defn_nd, dialog_nd
-from . import defn_hdf5, dialog_hdf5
-from . import dialog_fits, defn_fits
-from . import defn_plugin, dialog_plugin
+from . import defn_standard
+from . import defn_csv
+from . import defn_twod
+from . import defn_nd
+from . import defn_hdf5
+from . import defn_fits
+from . import defn_plugin
+
+def loadImportTabs():
+    """Import the dialog tabs for the import dialog.
+
+    These are only needed by the user interface, so are imported on
+    first use."""
+    from . import dialog_standard
+    from . import dialog_csv
+    from . import dialog_twod
+    from . import dialog_nd
+    from . import dialog_hdf5
+    from . import dialog_fits
+    from . import dialog_plugin
@@ -0,0 +1,175 @@
+#    Copyright (C) 2018 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""Run import operations in background threads.
+
+The data are read by calling prepareImport() on each operation in a
+worker thread, leaving the user interface responsive. The operations
+are then applied to the document in the main thread, which is quick as
+the data have already been read.
+"""
+
+from __future__ import division, print_function
+import os.path
+import time
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from .. import qtall as qt4
+from .. import document
+from . import base
+
+def _(text, disambiguation=None, context="Import"):
+    return qt4.QCoreApplication.translate(context, text, disambiguation)
+
+# time to wait before showing a progress dialog (s)
+PROGRESS_DELAY = 0.3
+
+def _fileSize(op):
+    """Get size of file read by operation, or 0 if unknown."""
+    try:
+        return os.path.getsize(op.params.filename)
+    except (AttributeError, TypeError, EnvironmentError):
+        return 0
+
+def _prepareOp(op, progress):
+    """Read data for operation in worker thread."""
+    base.setCurrentProgress(progress)
+    try:
+        op.prepareImport()
+    finally:
+        base.setCurrentProgress(None)
+
+class BackgroundImport(object):
+    """Read the data for a list of import operations in worker threads."""
+
+    def __init__(self, ops, maxthreads=None):
+        self.ops = ops
+        self.progresses = [
+            base.ImportProgress(totalbytes=_fileSize(op)) for op in ops]
+
+        if maxthreads is None:
+            maxthreads = multiprocessing.cpu_count()
+        self.pool = ThreadPool(max(1, min(len(ops), maxthreads)))
+        self.results = [
+            self.pool.apply_async(_prepareOp, (op, progress))
+            for op, progress in zip(ops, self.progresses)]
+        self.pool.close()
+
+    def done(self):
+        """Have all the operations finished reading?"""
+        return all([r.ready() for r in self.results])
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds for reading to finish.
+        Returns whether finished."""
+        end = time.time() + timeout
+        for r in self.results:
+            r.wait(max(0., end-time.time()))
+        return self.done()
+
+    def totalBytes(self):
+        return sum([p.totalbytes for p in self.progresses])
+
+    def bytesRead(self):
+        return sum([p.bytesread for p in self.progresses])
+
+    def rowsRead(self):
+        return sum([p.rowsread for p in self.progresses])
+
+    def cancel(self):
+        """Ask the operations to stop reading."""
+        for p in self.progresses:
+            p.cancel()
+
+    def cancelled(self):
+        return any([p.cancelled for p in self.progresses])
+
+    def finish(self):
+        """Wait for the threads to finish.
+
+        Any exception raised by an import is raised here. If the import
+        was cancelled, ImportCancelled is raised."""
+
+        self.pool.join()
+        for r in self.results:
+            r.get()
+        if self.cancelled():
+            raise base.ImportCancelled(_('Import cancelled'))
+
+def _progressText(bgimport):
+    """Text describing the progress of the import."""
+    text = _('Read %i rows') % bgimport.rowsRead()
+    nbytes = bgimport.bytesRead()
+    if nbytes > 0:
+        text += _(' (%.1f MB)') % (nbytes/(1024*1024))
+    return text
+
+def prepareInBackground(parent, ops):
+    """Read the data for the operations in background threads,
+    showing a progress dialog if this takes some time.
+
+    parent: parent widget for progress dialog
+    ops: list of import operations
+
+    Raises ImportCancelled if the user cancels the import, or any
+    exception raised while importing.
+    """
+
+    bgimport = BackgroundImport(ops)
+    if not bgimport.wait(PROGRESS_DELAY):
+        total = bgimport.totalBytes()
+        dialog = qt4.QProgressDialog(
+            _('Importing data...'), _('Cancel'), 0, 1000 if total else 0,
+            parent)
+        dialog.setWindowTitle(_('Importing data'))
+        dialog.setWindowModality(qt4.Qt.WindowModal)
+        dialog.setMinimumDuration(0)
+
+        while not bgimport.done():
+            if dialog.wasCanceled():
+                bgimport.cancel()
+            if total:
+                # readers count characters, not bytes, so clip
+                dialog.setValue(
+                    min(999, int(1000*bgimport.bytesRead()/total)))
+            dialog.setLabelText(_progressText(bgimport))
+            qt4.QCoreApplication.processEvents(
+                qt4.QEventLoop.AllEvents, 50)
+            bgimport.wait(0.05)
+
+        dialog.close()
+        dialog.deleteLater()
+
+    bgimport.finish()
+
+def applyImport(parent, doc, ops, descr='import data'):
+    """Import data in the background, then apply the operations to the
+    document.
+
+    ops can be a single operation or a list, which is applied as a single
+    operation so it is undone in one step.
+    """
+
+    if not isinstance(ops, (list, tuple)):
+        prepareInBackground(parent, [ops])
+        doc.applyOperation(ops)
+    else:
+        prepareInBackground(parent, list(ops))
+        doc.applyOperation(
+            document.OperationMultiple(list(ops), descr=descr))
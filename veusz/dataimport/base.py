@@ -19,15 +19,69 @@
 """Parameters for import routines."""
 
 from __future__ import division, print_function
+import os
 import sys
 import copy
+import threading
 
-from ..compat import citems, cstr
+from ..compat import citems, cvalues, cstr
+from .. import qtall as qt4
 from .. import utils
+from . import importcache
+
+def _(text, disambiguation=None, context="Import"):
+    """Translate text."""
+    return qt4.QCoreApplication.translate(context, text, disambiguation)
 
 class ImportingError(RuntimeError):
     """Common error when import fails."""
 
+class ImportCancelled(ImportingError):
+    """Raised when an import is cancelled by the user."""
+
+class ImportProgress(object):
+    """Progress of an import, which may be running in another thread.
+
+    Readers call update() as they read data, which raises
+    ImportCancelled if cancel() has been called.
+    """
+
+    def __init__(self, totalbytes=0):
+        self.totalbytes = totalbytes
+        self.bytesread = 0
+        self.rowsread = 0
+        self.cancelled = False
+
+    def update(self, nbytes=0, nrows=0):
+        """Record bytes and rows read."""
+        self.bytesread += nbytes
+        self.rowsread += nrows
+        if self.cancelled:
+            raise ImportCancelled(_("Import cancelled"))
+
+    def cancel(self):
+        """Ask the import to stop."""
+        self.cancelled = True
+
+# progress object of import running in each thread
+_threadprogress = threading.local()
+
+def fileStat(filename):
+    """Return (modification time, size) of file, or None if unknown."""
+    try:
+        s = os.stat(filename)
+    except (OSError, TypeError):
+        return None
+    return (s.st_mtime, s.st_size)
+
+def currentProgress():
+    """Return ImportProgress for import in this thread, or None."""
+    return getattr(_threadprogress, 'progress', None)
+
+def setCurrentProgress(progress):
+    """Set ImportProgress for import in this thread (or None)."""
+    _threadprogress.progress = progress
+
 class ImportParamsBase(object):
     """Import parameters for the various imports.
 
@@ -79,9 +133,14 @@ class ImportParamsBase(object):
 class LinkedFileBase(object):
     """A base class for linked files containing common routines."""
 
+    # whether reloading is skipped if the file has not changed
+    skipunchanged = True
+
     def __init__(self, params):
         """Save parameters."""
         self.params = params
+        # (mtime, size) of file when last read
+        self.filestat = None
 
     def createOperation(self):
         """Return operation to recreate self."""
@@ -179,16 +238,40 @@ class LinkedFileBase(object):
                 read.append(name)
         return read
 
-    def reloadLinks(self, document):
-        """Reload links using an operation"""
+    def isUnchanged(self):
+        """Has the file not changed since it was last read?"""
+        return ( self.skipunchanged and self.filestat is not None and
+                 fileStat(self.filename) == self.filestat )
+
+    def prepareReload(self):
+        """Create the operation for reloading and read its data.
+        This does not use the document, so can be called in another thread.
+
+        Returns (operation, exception raised or None)
+        """
 
-        # get the operation for reloading
         op = self.createOperation()(self.params)
+        try:
+            op.prepareImport()
+        except Exception as ex:
+            return (op, ex)
+        return (op, None)
+
+    def reloadLinks(self, document, prepared=None):
+        """Reload links using an operation.
+        prepared is the optional return value of prepareReload()."""
+
+        # get the operation for reloading
+        if prepared is None:
+            prepared = self.prepareReload()
+        op, ex = prepared
 
         # load data into a temporary document
         tempdoc = document.__class__()
 
         try:
+            if ex is not None:
+                raise ex
             tempdoc.applyOperation(op)
         except Exception as ex:
             # if something breaks, record an error and return nothing
@@ -204,6 +287,8 @@ class LinkedFileBase(object):
         tags = self._deleteLinkedDatasets(document)
         # move datasets into document
         read = self._moveReadDatasets(tempdoc, document, tags)
+        # the datasets now link to self, so remember the file details
+        self.filestat = getattr(op, 'filestat', None)
 
         # return errors (if any)
         errors = op.outinvalids
@@ -213,8 +298,12 @@ class LinkedFileBase(object):
 class OperationDataImportBase(object):
     """Default useful import class."""
 
+    # whether results of import can be stored in the import cache
+    cacheable = True
+
     def __init__(self, params):
         self.params = params
+        self.prepared = False
 
     def doImport(self, document):
         """Do import, override this.
@@ -254,11 +343,13 @@ class OperationDataImportBase(object):
 
             doceval.update()
 
-    def do(self, document):
-        """Do import."""
+    def prepareImport(self):
+        """Read the data without modifying the document.
+
+        This can be called in another thread before the operation is
+        applied, so that do() does not need to read the data itself.
+        """
 
-        # list of returned dataset names
-        self.outnames = []
         # map of names to datasets
         self.outdatasets = {}
         # list of returned custom variables
@@ -266,11 +357,43 @@ class OperationDataImportBase(object):
         # invalid conversions
         self.outinvalids = {}
 
+        # file details before reading, so changes while reading are seen
+        filestat = fileStat(getattr(self.params, 'filename', None))
+
+        # do actual import, unless the results are in the cache
+        cache = importcache.getImportCache()
+        if cache is not None and cache.load(self):
+            retn = None
+        else:
+            retn = self.doImport()
+            if cache is not None and retn is None:
+                cache.store(self)
+
+        # remember file details so unchanged files are not reloaded
+        self.filestat = filestat
+        for ds in cvalues(self.outdatasets):
+            if ds.linked is not None:
+                ds.linked.filestat = filestat
+
+        self.prepared = True
+        self.prepareretn = retn
+        return retn
+
+    def do(self, document):
+        """Do import."""
+
+        # list of returned dataset names
+        self.outnames = []
+
         # remember datasets in document for undo
         self.oldcustoms = None
 
-        # do actual import
-        retn = self.doImport()
+        # use data read by prepareImport if it has been called
+        if not self.prepared:
+            self.prepareImport()
+        retn = self.prepareretn
+        # read again if redone
+        self.prepared = False
 
         # these are custom values returned from the plugin
         if self.outcustoms:
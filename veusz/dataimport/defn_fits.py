@@ -56,6 +56,7 @@ class ImportParamsFITS(base.ImportParamsBase):
      twodranges: map hdf names to 2d range (minx, miny, maxx, maxy)
      twod_as_oned: set of hdf names to read 2d dataset as 1d dataset
      wcsmodes: how to treat wcs when importing
+     compact: keep single precision and integer data types
     """
 
     defaults = {
@@ -65,6 +66,7 @@ class ImportParamsFITS(base.ImportParamsBase):
         'twodranges': None,
         'twod_as_oned': None,
         'wcsmodes': None,
+        'compact': False,
         }
     defaults.update(base.ImportParamsBase.defaults)
 
@@ -135,7 +137,7 @@ class OperationDataImportFITS(base.OperationDataImportBase):
 
             # finally return data
             objdata = fits_hdf5_helpers.convertDatasetToObject(
-                data, aslice)
+                data, aslice, compact=self.params.compact)
             dsread[name] = _DataRead(dsname, objdata, options)
 
         except fits_hdf5_helpers.ConvertError:
@@ -229,10 +231,14 @@ class OperationDataImportFITS(base.OperationDataImportBase):
         """Read data from fits file and return a dict of names to data."""
 
         dsread = {}
+        progress = base.currentProgress()
         with fits.open(self.params.filename, 'readonly') as fitsf:
             hdunames = fits_hdf5_helpers.getFITSHduNames(fitsf)
 
             for item in self.params.items:
+                if progress is not None:
+                    # allow cancelling between items
+                    progress.update()
                 parts = [p.strip() for p in item.split('/') if p.strip()]
 
                 if not parts:
@@ -305,7 +311,7 @@ class OperationDataImportFITS(base.OperationDataImportBase):
                 if args[a] is not None and len(args[a]) > minlen:
                     args[a] = args[a][:minlen]
 
-            ds = datasets.Dataset(**args)
+            ds = datasets.Dataset(compact=self.params.compact, **args)
 
         elif data.ndim == 2:
             # 2D dataset
@@ -315,10 +321,13 @@ class OperationDataImportFITS(base.OperationDataImportBase):
                  data.shape[1] in (2,3) ):
                 # actually a 1D dataset in disguise
                 if data.shape[1] == 2:
-                    ds = datasets.Dataset(data=data[:,0], serr=data[:,1])
+                    ds = datasets.Dataset(
+                        data=data[:,0], serr=data[:,1],
+                        compact=self.params.compact)
                 else:
                     ds = datasets.Dataset(
-                        data=data[:,0], perr=data[:,1], nerr=data[:,2])
+                        data=data[:,0], perr=data[:,1], nerr=data[:,2],
+                        compact=self.params.compact)
             else:
                 # this really is a 2D dataset
 
@@ -340,7 +349,8 @@ class OperationDataImportFITS(base.OperationDataImportBase):
                     attrs["yrange"] = (r[1], r[3])
 
                 # create the object
-                ds = datasets.Dataset2D(data, **attrs)
+                ds = datasets.Dataset2D(
+                    data, compact=self.params.compact, **attrs)
 
         else:
             # N-dimensional dataset
@@ -400,7 +410,8 @@ def ImportFileFITS(
         wcsmodes=None,
         prefix='', suffix='',
         renames=None,
-        linked=False):
+        linked=False,
+        compact=False):
     """Import data from a FITS file
 
     items is a list of datasets to be imported.
@@ -450,6 +461,9 @@ def ImportFileFITS(
 
     linked specifies that the dataset is linked to the file.
 
+    compact keeps single precision and integer data in their original
+    type, rather than converting them to double precision.
+
     Values under the VEUSZ header keyword can be used to override defaults:
      'name': override name for dataset
      'slice': slice on importing (use format "start:stop:step,...")
@@ -482,7 +496,8 @@ def ImportFileFITS(
         wcsmodes=wcsmodes,
         prefix=prefix, suffix=suffix,
         renames=renames,
-        linked=linked)
+        linked=linked,
+        compact=compact)
     op = OperationDataImportFITS(params)
     comm.document.applyOperation(op)
 
@@ -78,6 +78,7 @@ class ImportParamsHDF5(base.ImportParamsBase):
      twodranges: map hdf names to 2d range (minx, miny, maxx, maxy)
      twod_as_oned: set of hdf names to read 2d dataset as 1d dataset
      convert_datetime: map float or strings to datetime
+     compact: keep single precision and integer data types
     """
 
     defaults = {
@@ -87,6 +88,7 @@ class ImportParamsHDF5(base.ImportParamsBase):
         'twodranges': None,
         'twod_as_oned': None,
         'convert_datetime': None,
+        'compact': False,
         }
     defaults.update(base.ImportParamsBase.defaults)
 
@@ -162,7 +164,7 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
 
             # finally return data
             objdata = fits_hdf5_helpers.convertDatasetToObject(
-                dataset, aslice)
+                dataset, aslice, compact=self.params.compact)
             dsread[name] = _DataRead(dsname, objdata, options)
 
         except fits_hdf5_helpers.ConvertError:
@@ -209,8 +211,12 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
         """Read data from hdf5 file and return a dict of names to data."""
 
         dsread = {}
+        progress = base.currentProgress()
         with h5py.File(self.params.filename, "r") as hdff:
             for hi in self.params.items:
+                if progress is not None:
+                    # allow cancelling between items
+                    progress.update()
                 # workaround for h5py bug
                 # using unicode names for groups/datasets does not work
                 if not cpy3 and isinstance(hi, cunicode):
@@ -292,7 +298,7 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                     if args[a] is not None and len(args[a]) > minlen:
                         args[a] = args[a][:minlen]
 
-                ds = datasets.Dataset(**args)
+                ds = datasets.Dataset(compact=self.params.compact, **args)
 
         elif data.ndim == 2:
             # 2D dataset
@@ -302,10 +308,13 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                  data.shape[1] in (2,3) ):
                 # actually a 1D dataset in disguise
                 if data.shape[1] == 2:
-                    ds = datasets.Dataset(data=data[:,0], serr=data[:,1])
+                    ds = datasets.Dataset(
+                        data=data[:,0], serr=data[:,1],
+                        compact=self.params.compact)
                 else:
                     ds = datasets.Dataset(
-                        data=data[:,0], perr=data[:,1], nerr=data[:,2])
+                        data=data[:,0], perr=data[:,1], nerr=data[:,2],
+                        compact=self.params.compact)
             else:
                 # this really is a 2D dataset
 
@@ -327,7 +336,8 @@ class OperationDataImportHDF5(base.OperationDataImportBase):
                     attrs["yrange"] = (r[1], r[3])
 
                 # create the object
-                ds = datasets.Dataset2D(data, **attrs)
+                ds = datasets.Dataset2D(
+                    data, compact=self.params.compact, **attrs)
 
         else:
             # N-dimensional dataset
@@ -423,7 +433,8 @@ def ImportFileHDF5(comm, filename,
                    convert_datetime=None,
                    prefix='', suffix='',
                    renames=None,
-                   linked=False):
+                   linked=False,
+                   compact=False):
     """Import data from a HDF5 file
 
     items is a list of groups and datasets which can be imported.
@@ -464,6 +475,9 @@ def ImportFileHDF5(comm, filename,
 
     linked specifies that the dataset is linked to the file.
 
+    compact keeps single precision and integer data in their original
+    type, rather than converting them to double precision.
+
     Attributes can be used in datasets to override defaults:
      'vsz_name': set to override name for dataset in veusz
      'vsz_slice': slice on importing (use format "start:stop:step,...")
@@ -497,7 +511,8 @@ def ImportFileHDF5(comm, filename,
         convert_datetime=convert_datetime,
         prefix=prefix, suffix=suffix,
         renames=renames,
-        linked=linked)
+        linked=linked,
+        compact=compact)
     op = OperationDataImportHDF5(params)
     comm.document.applyOperation(op)
 
@@ -59,6 +59,9 @@ class ImportParamsPlugin(base.ImportParamsBase):
 class LinkedFilePlugin(base.LinkedFileBase):
     """Represent a file linked using an import plugin."""
 
+    # plugins may read other files or sources
+    skipunchanged = False
+
     def createOperation(self):
         """Return operation to recreate self."""
         return OperationDataImportPlugin
@@ -77,6 +80,9 @@ class OperationDataImportPlugin(base.OperationDataImportBase):
 
     descr = _('import using plugin')
 
+    # plugins may read other files or sources
+    cacheable = False
+
     def doImport(self):
         """Do import."""
 
@@ -100,7 +106,7 @@ class OperationDataImportPlugin(base.OperationDataImportBase):
 
         # stick back together the plugin parameter object
         plugparams = plugins.ImportPluginParams(
-            p.filename, p.encoding, pparams)
+            p.filename, p.encoding, pparams, linked=p.linked)
         results = plugin.doImport(plugparams)
 
         # make link for file
@@ -25,6 +25,7 @@ from ..compat import crange, cnext, cstr
 from .. import utils
 from . import defn_csv
 from . import base
+from . import background
 
 def _(text, disambiguation=None, context="Import_CSV"):
     return qt4.QCoreApplication.translate(context, text, disambiguation)
@@ -201,7 +202,7 @@ class ImportTabCSV(importdialog.ImportTab):
             op = defn_csv.OperationDataImportCSV(params)
 
             # actually import the data
-            doc.applyOperation(op)
+            background.applyImport(self, doc, op)
 
             # feature feedback
             utils.feedback.importcts['csv'] += 1
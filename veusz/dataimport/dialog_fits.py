@@ -25,6 +25,7 @@ from ..dialogs import importdialog
 from ..compat import cstr
 
 from . import base
+from . import background
 from . import defn_fits
 
 from . import fits_hdf5_tree
@@ -318,13 +319,14 @@ class ImportTabFITS(importdialog.ImportTab):
             tags=tags,
             prefix=prefix, suffix=suffix,
             linked=linked,
+            compact=setting.settingdb['compact_datasets'],
             )
 
         op = defn_fits.OperationDataImportFITS(params)
 
         try:
             # actually do the import
-            doc.applyOperation(op)
+            background.applyImport(self, doc, op)
 
             # inform user
             self.fitsimportstatus.setText(
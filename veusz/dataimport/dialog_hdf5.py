@@ -25,6 +25,7 @@ from ..dialogs import importdialog
 from ..compat import cstr
 
 from . import base
+from . import background
 from . import defn_hdf5
 
 from . import fits_hdf5_tree
@@ -389,13 +390,14 @@ class ImportTabHDF5(importdialog.ImportTab):
             tags=tags,
             prefix=prefix, suffix=suffix,
             linked=linked,
+            compact=setting.settingdb['compact_datasets'],
             )
 
         op = defn_hdf5.OperationDataImportHDF5(params)
 
         try:
             # actually do the import
-            doc.applyOperation(op)
+            background.applyImport(self, doc, op)
 
             # inform user
             self.hdfimportstatus.setText(_("Import complete (%i datasets)") %
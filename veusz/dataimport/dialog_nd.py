@@ -25,6 +25,8 @@ from .. import utils
 from ..dialogs import importdialog
 from . import defn_nd
 from . import simpleread
+from . import base
+from . import background
 from . import dialog_csv
 
 def _(text, disambiguation=None, context="Import_ND"):
@@ -131,7 +133,7 @@ class ImportTabND(importdialog.ImportTab):
 
             # do the importing
             op = defn_nd.OperationDataImportND(params)
-            doc.applyOperation(op)
+            background.applyImport(self, doc, op)
 
             # show result
             output = [_("Successfully read:")]
@@ -148,6 +150,9 @@ class ImportTabND(importdialog.ImportTab):
         except error as e:
             output = e.args[0]
 
+        except base.ImportCancelled as e:
+            output = cstr(e)
+
         except simpleread.ReadNDError as e:
             output = _("Error importing datasets:\n %s") % cstr(e)
 
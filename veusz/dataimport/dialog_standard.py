@@ -21,9 +21,11 @@ from __future__ import division
 from .. import qtall as qt4
 from .. import utils
 from ..dialogs import importdialog, veuszdialog
-from ..compat import citems
+from ..compat import citems, cstr
 from . import defn_standard
 from . import simpleread
+from . import base
+from . import background
 
 def _(text, disambiguation=None, context="Import_Standard"):
     return qt4.QCoreApplication.translate(context, text, disambiguation)
@@ -98,7 +100,11 @@ class ImportTabStandard(importdialog.ImportTab):
             return
 
         # actually import the data
-        doc.applyOperation(op)
+        try:
+            background.applyImport(self, doc, op)
+        except base.ImportCancelled as e:
+            qt4.QMessageBox.warning(self, _("Veusz"), cstr(e))
+            return
 
         # tell the user what happened
         # failures in conversion
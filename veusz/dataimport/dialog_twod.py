@@ -25,6 +25,8 @@ from .. import utils
 from ..dialogs import importdialog
 from . import defn_twod
 from . import simpleread
+from . import base
+from . import background
 from . import dialog_csv
 
 def _(text, disambiguation=None, context="Import_2D"):
@@ -176,7 +178,7 @@ class ImportTab2D(importdialog.ImportTab):
 
         try:
             op = defn_twod.OperationDataImport2D(params)
-            doc.applyOperation(op)
+            background.applyImport(self, doc, op)
 
             output = [_('Successfully read datasets:')]
             for ds in op.outnames:
@@ -190,6 +192,9 @@ class ImportTab2D(importdialog.ImportTab):
             # feature feedback
             utils.feedback.importcts['twod'] += 1
 
+        except base.ImportCancelled as e:
+            output = cstr(e)
+
         except simpleread.Read2DError as e:
             output = _('Error importing datasets:\n %s') % cstr(e)
 
@@ -24,6 +24,7 @@ import re
 import numpy as N
 
 from .. import qtall as qt
+from .. import datasets
 
 def _(text, disambiguation=None, context="Import_FITS_HDF5"):
     return qt.QCoreApplication.translate(context, text, disambiguation)
@@ -147,8 +148,9 @@ def convertFromBytes(s):
             return s.decode('utf-8')
     return s
 
-def convertDatasetToObject(data, slices):
+def convertDatasetToObject(data, slices, compact=False):
     """Convert numpy/hdf dataset to suitable data for veusz.
+    If compact, keep data types which can be stored compactly.
     Raise ConvertError if cannot."""
 
     # lazily-loaded h5py
@@ -168,7 +170,10 @@ def convertDatasetToObject(data, slices):
         raise ConvertError(_("Could not get data type of dataset"))
 
     if kind in ('b', 'i', 'u', 'f'):
-        data = N.array(data, dtype=N.float64)
+        if compact and datasets.compactDtype(data.dtype):
+            data = N.array(data)
+        else:
+            data = N.array(data, dtype=N.float64)
         if data.ndim == 0:
             raise ConvertError(_("Dataset has no dimensions"))
         return data
@@ -0,0 +1,261 @@
+#    Copyright (C) 2018 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+##############################################################################
+
+"""A cache of imported datasets stored on disk.
+
+Each entry is a directory named by a hash of the import operation, its
+parameters and the size and modification time of the imported
+file. The directory contains an index.json file describing the
+datasets, and a .npy file for each numerical array. Arrays are memory
+mapped when read back.
+"""
+
+from __future__ import division, print_function
+import os
+import os.path
+import sys
+import json
+import shutil
+import hashlib
+import tempfile
+
+import numpy as N
+
+from ..compat import citems, cstr
+from .. import qtall as qt4
+from .. import setting
+from .. import datasets
+from .. import utils
+
+# increase this if the format of the cache changes
+CACHE_FORMAT = 1
+
+def cacheDirectory():
+    """Get directory where the cache is stored."""
+    d = setting.settingdb['import_cache_dir']
+    if not d:
+        d = os.path.join(
+            qt4.QStandardPaths.writableLocation(
+                qt4.QStandardPaths.CacheLocation),
+            'importcache')
+    return d
+
+def _encodeValue(val, arrays):
+    """Encode attribute value for JSON.
+
+    Arrays are added to arrays and replaced by a reference.
+    Raises ValueError if value cannot be encoded."""
+
+    if val is None or isinstance(val, (bool, int, float, cstr)):
+        return val
+    elif isinstance(val, N.ndarray):
+        if val.dtype.hasobject:
+            raise ValueError('Cannot cache object arrays')
+        arrays.append(val)
+        return {'array': 'a%i.npy' % (len(arrays)-1)}
+    elif isinstance(val, (N.integer, N.floating)):
+        return val.item()
+    elif isinstance(val, (list, tuple)):
+        out = [_encodeValue(v, arrays) for v in val]
+        return out if isinstance(val, list) else {'tuple': out}
+    raise ValueError('Cannot cache value of type %s' % type(val))
+
+def _decodeValue(val, dirname):
+    """Decode value encoded by _encodeValue."""
+    if isinstance(val, list):
+        return [_decodeValue(v, dirname) for v in val]
+    elif isinstance(val, dict):
+        if 'array' in val:
+            # copy-on-write mapping, so the cache is never modified
+            arr = N.load(
+                os.path.join(dirname, val['array']), mmap_mode='c')
+            return arr.view(N.ndarray)
+        return tuple([_decodeValue(v, dirname) for v in val['tuple']])
+    return val
+
+class ImportCache(object):
+    """Cache of results of import operations."""
+
+    def __init__(self, dirname, maxsize):
+        """dirname: directory to store cache
+        maxsize: approximate maximum size of cache in bytes."""
+        self.dirname = dirname
+        self.maxsize = maxsize
+
+    def key(self, op):
+        """Return key for operation, or None if it cannot be cached."""
+
+        params = op.params
+        filename = getattr(params, 'filename', None)
+        if not op.cacheable or not filename:
+            return None
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+
+        pars = dict([
+            (k, getattr(params, k))
+            for k in list(params.defaults) + params._extras])
+        keydata = json.dumps(
+            [CACHE_FORMAT, utils.version(),
+             op.__class__.__module__, op.__class__.__name__,
+             os.path.abspath(filename), st.st_size, st.st_mtime,
+             pars],
+            sort_keys=True, default=repr)
+        return hashlib.sha1(keydata.encode('utf-8')).hexdigest()
+
+    def load(self, op):
+        """Load outputs of import operation from cache.
+        Returns True if successful."""
+
+        key = self.key(op)
+        if key is None:
+            return False
+        entry = os.path.join(self.dirname, key)
+        try:
+            with open(os.path.join(entry, 'index.json')) as f:
+                index = json.load(f)
+            outdatasets = {}
+            # datasets share link objects, as in a normal import
+            links = {}
+            for name, dsinfo in citems(index['datasets']):
+                outdatasets[name] = self._loadDataset(
+                    op, dsinfo, entry, links)
+        except Exception:
+            # treat any problem as a cache miss
+            return False
+
+        # mark as recently used
+        try:
+            os.utime(entry, None)
+        except OSError:
+            pass
+
+        op.outdatasets = outdatasets
+        op.outinvalids = index['invalids']
+        return True
+
+    def _loadDataset(self, op, dsinfo, entry, links):
+        """Recreate dataset from cached information.
+
+        links is a dict of link objects already created, by class."""
+
+        cls = getattr(datasets, dsinfo['class'])
+        if not issubclass(cls, datasets.DatasetConcreteBase):
+            raise ValueError('Invalid class')
+        ds = cls.__new__(cls)
+        datasets.DatasetConcreteBase.__init__(ds)
+        for attr, val in citems(dsinfo['attrs']):
+            setattr(ds, attr, _decodeValue(val, entry))
+        ds.tags = set(dsinfo['tags'])
+
+        if dsinfo['linked'] is not None:
+            key = tuple(dsinfo['linked'])
+            if key not in links:
+                module, clsname = key
+                linkcls = getattr(sys.modules[module], clsname)
+                links[key] = linkcls(op.params)
+            ds.linked = links[key]
+        return ds
+
+    def store(self, op):
+        """Store outputs of import operation in cache."""
+
+        key = self.key(op)
+        if key is None or op.outcustoms:
+            return
+
+        # encode datasets, giving up if anything is not supported
+        arrays = []
+        dsinfos = {}
+        try:
+            for name, ds in citems(op.outdatasets):
+                if getattr(datasets, type(ds).__name__, None) is not type(ds):
+                    return
+                attrs = {}
+                for attr, val in citems(ds.__dict__):
+                    if attr not in ('document', 'linked', 'tags'):
+                        attrs[attr] = _encodeValue(val, arrays)
+                linked = None
+                if ds.linked is not None:
+                    linked = (type(ds.linked).__module__,
+                              type(ds.linked).__name__)
+                dsinfos[name] = {
+                    'class': type(ds).__name__,
+                    'attrs': attrs,
+                    'tags': sorted(ds.tags),
+                    'linked': linked,
+                    }
+            index = json.dumps({
+                'datasets': dsinfos,
+                'invalids': op.outinvalids,
+                })
+        except (ValueError, TypeError):
+            return
+
+        size = sum([a.nbytes for a in arrays])
+        if size > self.maxsize:
+            return
+
+        # write into temporary directory, then move into place
+        tempdir = None
+        try:
+            if not os.path.isdir(self.dirname):
+                os.makedirs(self.dirname)
+            tempdir = tempfile.mkdtemp(dir=self.dirname, prefix='tmp_')
+            for i, a in enumerate(arrays):
+                N.save(os.path.join(tempdir, 'a%i.npy' % i), a,
+                       allow_pickle=False)
+            with open(os.path.join(tempdir, 'index.json'), 'w') as f:
+                f.write(index)
+            os.rename(tempdir, os.path.join(self.dirname, key))
+        except EnvironmentError:
+            if tempdir is not None:
+                shutil.rmtree(tempdir, ignore_errors=True)
+            return
+
+        self.prune()
+
+    def prune(self):
+        """Remove least recently used entries if cache is too large."""
+
+        entries = []
+        total = 0
+        for name in os.listdir(self.dirname):
+            path = os.path.join(self.dirname, name)
+            if name.startswith('tmp_') or not os.path.isdir(path):
+                continue
+            size = sum([
+                os.path.getsize(os.path.join(path, f))
+                for f in os.listdir(path)])
+            entries.append((os.path.getmtime(path), size, path))
+            total += size
+
+        entries.sort()
+        while total > self.maxsize and entries:
+            mtime, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+def getImportCache():
+    """Return ImportCache object if the cache is enabled, else None."""
+    if not setting.settingdb['import_cache']:
+        return None
+    return ImportCache(
+        cacheDirectory(), setting.settingdb['import_cache_size']*1024*1024)
@@ -24,7 +24,7 @@ import re
 import csv
 import numpy as N
 
-from .base import ImportingError
+from .base import ImportingError, currentProgress
 from ..compat import crange, cnext, cstr, CIterator
 from .. import datasets
 from .. import utils
@@ -362,12 +362,16 @@ class ReadCSV(object):
         # type detection
         self.colblanks = {}
 
+        progress = currentProgress()
+
         # iterate over each line (or column)
         while True:
             try:
                 line = cnext(it)
             except StopIteration:
                 break
+            if progress is not None:
+                progress.update(sum([len(c) for c in line])+len(line), 1)
 
             # iterate over items on line
             for colnum, col in enumerate(line):
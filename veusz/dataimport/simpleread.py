@@ -366,6 +366,10 @@ class Stream(object):
     [^ \t\n\r#!%;]+ # match normal space/tab separated items
     ''', re.VERBOSE )
 
+    # lines without these characters (quotes, comments or whitespace
+    # other than space, tab and line ends) can be split with str.split
+    complex_re = re.compile( r'[`"\'#!%;]|[^\S \t\n\r]', re.UNICODE )
+
     def __init__(self):
         """Initialise stream object."""
         self.remainingline = []
@@ -402,8 +406,12 @@ class Stream(object):
                 return False
 
             # break up and append to buffer (removing comments)
-            cmpts = self.find_re.findall(line)
-            self.remainingline += [ x for x in cmpts if x[0] not in '#!%;']
+            if self.complex_re.search(line) is None:
+                self.remainingline += line.split()
+            else:
+                cmpts = self.find_re.findall(line)
+                self.remainingline += [
+                    x for x in cmpts if x[0] not in '#!%;']
 
             if self.remainingline and self.remainingline[-1] == '\\':
                 # this is a continuation: drop this item and read next line
@@ -418,11 +426,15 @@ class FileStream(Stream):
         """File can be any iterator-like object."""
         Stream.__init__(self)
         self.file = file
+        self.progress = base.currentProgress()
 
     def readLine(self):
         """Read the next line of the data source.
         StopIteration is raised if there is no more data."""
-        return cnext(self.file)
+        line = cnext(self.file)
+        if self.progress is not None:
+            self.progress.update(len(line), 1)
+        return line
 
 class StringStream(FileStream):
     '''For reading data from a string.'''
@@ -644,6 +656,81 @@ class SimpleRead(object):
 class Read2DError(base.ImportingError):
     pass
 
+def _floatRow(cols, errorclass):
+    """Convert a list of text values to a 1D float array.
+
+    The conversion is done by numpy in a single call. If this fails,
+    the values are converted one by one to report the bad value."""
+    try:
+        return N.array(cols, dtype=N.float64)
+    except ValueError:
+        pass
+
+    line = []
+    for v in cols:
+        try:
+            line.append(float(v))
+        except ValueError:
+            raise errorclass("Could not interpret number '%s'" % v)
+    return N.array(line, dtype=N.float64)
+
+class _MatrixBuffer(object):
+    """Collect rows of text values into a preallocated 2D float array.
+
+    Rows are converted in blocks, and the array is grown by doubling
+    its number of rows when full."""
+
+    # number of rows to convert at once
+    blocksize = 1024
+
+    def __init__(self, errorclass):
+        self.errorclass = errorclass
+        self.pending = []
+        self.buf = None
+        self.nrows = 0
+
+    def addRow(self, cols):
+        self.pending.append(cols)
+        if len(self.pending) >= self.blocksize:
+            self._convertPending()
+
+    def _convertPending(self):
+        """Convert pending rows and copy them into the array."""
+
+        rows = self.pending
+        self.pending = []
+        try:
+            block = N.array(rows, dtype=N.float64)
+        except ValueError:
+            # bad value or rows of different lengths
+            block = [_floatRow(r, self.errorclass) for r in rows]
+            try:
+                block = N.array(block, dtype=N.float64)
+            except ValueError:
+                block = None
+        if ( block is None or block.ndim != 2 or
+             (self.buf is not None and block.shape[1] != self.buf.shape[1]) ):
+            raise self.errorclass("Could not convert data to 2D matrix")
+
+        if self.buf is None:
+            self.buf = N.empty(block.shape)
+        elif self.nrows+len(block) > len(self.buf):
+            newbuf = N.empty(
+                (max(len(self.buf)*2, self.nrows+len(block)),
+                 self.buf.shape[1]))
+            newbuf[:self.nrows] = self.buf[:self.nrows]
+            self.buf = newbuf
+        self.buf[self.nrows:self.nrows+len(block)] = block
+        self.nrows += len(block)
+
+    def array(self):
+        """Get rows read as a 2D array (which may be empty)."""
+        if self.pending:
+            self._convertPending()
+        if self.buf is None:
+            return N.zeros((0, 0))
+        return self.buf[:self.nrows]
+
 class SimpleRead2D(object):
     def __init__(self, name, params):
         """Read dataset with name given.
@@ -728,13 +815,16 @@ class SimpleRead2D(object):
             'gridatedge': self._paramGridAtEdge,
             }
 
-        rows = []
+        # the first row is kept separately, as it may be the x grid
+        firstrow = None
+        rest = _MatrixBuffer(Read2DError)
+
         # loop over lines
         while stream.newLine():
             cols = stream.allColumns()
 
             if len(cols) == 0:
-                if len(rows) != 0:
+                if firstrow is not None:
                     # end of data
                     break
                 continue
@@ -746,18 +836,15 @@ class SimpleRead2D(object):
                 stream.flushLine()
                 continue
 
-            # read columns
-            line = []
-            while True:
-                v = stream.nextColumn()
-                if v is None:
-                    break
-                try:
-                    line.append( float(v) )
-                except ValueError:
-                    raise Read2DError("Could not interpret number '%s'" % v)
+            # convert columns later in blocks
+            stream.flushLine()
+            if firstrow is None:
+                firstrow = _floatRow(cols, Read2DError)
+            else:
+                rest.addRow(cols)
 
-            rows.insert(0, line)
+        # rows are in reverse-y order in the file
+        rest = rest.array()[::-1]
 
         if self.params.gridatedge:
 
@@ -766,24 +853,34 @@ class SimpleRead2D(object):
                 raise Read2DError(
                     "x|y grid|cent are incompatible with gridatedge")
 
-            if len(rows) > 0:
-                self.xcent = N.array(rows[-1])
+            if firstrow is not None:
+                self.xcent = firstrow
             else:
                 self.xcent = N.array([])
-            self.ycent = N.array([r[0] for r in rows[:-1]])
 
             # chop out grid
-            rows = [ r[1:] for r in rows[:-1] ]
+            if len(rest) > 0:
+                self.ycent = rest[:,0].copy()
+                self.data = N.ascontiguousarray(rest[:,1:])
+            else:
+                self.ycent = N.array([])
+                self.data = None
+
+        elif firstrow is not None:
+            self.data = N.empty((len(rest)+1, len(firstrow)))
+            if len(rest) > 0:
+                if rest.shape[1] != len(firstrow):
+                    raise Read2DError("Could not convert data to 2D matrix")
+                self.data[:-1] = rest
+            self.data[-1] = firstrow
+
+        else:
+            self.data = None
 
         # dodgy formatting probably...
-        if len(rows) == 0:
+        if self.data is None:
             raise Read2DError("No data could be imported for dataset")
 
-        try:
-            self.data = N.array(rows, dtype=N.float64)
-        except ValueError:
-            raise Read2DError("Could not convert data to 2D matrix")
-
         # obvious check
         if len(self.data.shape) != 2:
             raise Read2DError("Dataset was not 2D")
@@ -887,6 +984,8 @@ class SimpleReadND(object):
             }
 
         vals = []
+        # lines in file order, for reshaping
+        lines = []
 
         # keep track of where we are in terms of index
         dimstack = []
@@ -905,15 +1004,8 @@ class SimpleReadND(object):
                     continue
 
             # read columns
-            line = []
-            while True:
-                v = stream.nextColumn()
-                if v is None:
-                    break
-                try:
-                    line.append(float(v))
-                except ValueError:
-                    raise ReadNDError("Could not interpret number '%s'" % v)
+            stream.flushLine()
+            line = _floatRow(cols, ReadNDError)
 
             if len(line) > 0:
                 # previous blank lines
@@ -936,7 +1028,8 @@ class SimpleReadND(object):
                     while s >= len(v):
                         v.append([])
                     v = v[s]
-                v.append(N.array(line, dtype=N.float64))
+                v.append(line)
+                lines.append(line)
             else:
                 if len(vals) > 0:
                     dimidx -= 1
@@ -944,15 +1037,7 @@ class SimpleReadND(object):
         if self.params.shape is not None:
             # flatten so we can reshape properly later (this is to
             # allow free form input with the shape option)
-            fdata = []
-            def flatten(d):
-                for x in d:
-                    if isinstance(x, list):
-                        flatten(x)
-                    else:
-                        fdata.append(x)
-            flatten(vals)
-            vals = N.hstack((fdata))
+            vals = N.concatenate(lines) if lines else N.array([])
 
         try:
             self.data = N.array(vals, dtype=N.float64)
@@ -26,17 +26,27 @@ def _(text, disambiguation=None, context="Datasets"):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-def convertNumpy(a, dims=1):
+def compactDtype(dtype):
+    """Can values of this numpy type be stored without conversion in
+    compact datasets? Integers must be converted exactly to doubles."""
+    return ( (dtype.kind == 'f' and dtype.itemsize <= 8) or
+             (dtype.kind in 'iu' and dtype.itemsize <= 4) )
+
+def convertNumpy(a, dims=1, compact=False):
     """Convert to a numpy double if possible.
 
     dims is number of dimensions to check for
+    if compact, keep arrays of smaller floating point or integer types
     """
     if a is None:
         # leave as None
         return None
     elif isinstance(a, N.ndarray):
         # make conversion if numpy type is not correct
-        if a.dtype != N.float64:
+        if compact and compactDtype(a.dtype):
+            if not a.dtype.isnative:
+                a = a.astype(a.dtype.newbyteorder('='))
+        elif a.dtype != N.float64:
             a = a.astype(N.float64)
     else:
         # convert to numpy array
@@ -68,6 +78,24 @@ def convertNumpyNegAbs(a):
     else:
         return -N.abs( convertNumpy(a) )
 
+def widenToFit(a, vals):
+    """Return array a, converted to doubles if it is a compact integer
+    array which cannot store vals exactly."""
+    if a.dtype.kind in 'iu':
+        v = N.asarray(vals, dtype=N.float64)
+        with N.errstate(invalid='ignore'):
+            if not N.all(v.astype(a.dtype) == v):
+                return a.astype(N.float64)
+    return a
+
+def widenToDouble(a):
+    """Return array a converted to doubles if it is a compact array,
+    so that arithmetic on it cannot overflow or wrap around."""
+    if ( isinstance(a, N.ndarray) and a.dtype.kind in 'iuf' and
+         a.dtype != N.float64 ):
+        return a.astype(N.float64)
+    return a
+
 def copyOrNone(a):
     """Return a copy if not None, or None."""
     if a is None:
@@ -22,7 +22,7 @@ from __future__ import division
 import re
 import numpy as N
 
-from .commonfn import _
+from .commonfn import _, widenToDouble
 from .base import DatasetExpressionException
 from .oned import Dataset1DBase, Dataset
 from .twod import Dataset2DBase, Dataset2D
@@ -88,7 +88,7 @@ def _evaluateDataset(datasets, dsname, dspart):
     if val is None:
         raise DatasetExpressionException(
             _("Dataset '%s' does not have part '%s'") % (dsname, dspart))
-    return val
+    return widenToDouble(val)
 
 def _returnNumericDataset(doc, vals, dimensions, subdatasets):
     """Used internally to convert a set of values (which needs to be
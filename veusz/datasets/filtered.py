@@ -17,6 +17,7 @@
 ###############################################################################
 
 from __future__ import division, print_function
+import re
 import numpy as N
 
 from ..compat import czip, crepr
@@ -24,11 +25,21 @@ from ..compat import czip, crepr
 from .commonfn import _
 from .base import DatasetBase
 from .oned import Dataset
-from .expression import evalDatasetExpression
+from .expression import evalDatasetExpression, substituteDatasets
+
+# functions in expressions which depend on the document as a whole
+_docdepend_re = re.compile(
+    r'\b(DATA|SETTING|FILENAME|BASENAME|DATE|TIME|ENVIRON)\b')
 
 class DatasetFilterGenerator(object):
     """This object is shared by all DatasetFiltered datasets, to calculate
-    the filter expression."""
+    the filter expression.
+
+    The filter mask is only recalculated if the datasets in the
+    expression change, and is shared by all the outputs. Each output
+    is only filtered when it is requested and its input or the mask
+    has changed.
+    """
 
     def __init__(self, inexpr, indatasets,
                  prefix="", suffix="",
@@ -42,7 +53,6 @@ class DatasetFilterGenerator(object):
         replaceblanks = replace filtered values by nans
         """
 
-        self.changeset = -1
         self.inexpr = inexpr
         self.indatasets = indatasets
         self.prefix = prefix
@@ -50,53 +60,84 @@ class DatasetFilterGenerator(object):
         self.invert = invert
         self.replaceblanks = replaceblanks
 
-        self.outdatasets = {}
+        # filter mask, key used to check whether it is out of date,
+        # slice equivalent to mask (if the selected items are
+        # contiguous) and document changeset when last checked
+        self.mask = None
+        self.maskkey = None
+        self.maskslice = None
+        self.maskchangeset = None
+
+        # cached outputs: name -> (input key, filtered dataset)
+        self.outcache = {}
 
-    def filterNumeric(self, ds, filterarr):
+    def filterNumeric(self, ds, minlen):
         """Filter a numeric dataset."""
         outdata = {}
-        minlen = len(filterarr)
+        mask = self.mask[:minlen]
+        sl = self.contiguousSlice(minlen)
         for attr in ds.columns:
             data = getattr(ds, attr)
             if data is None:
                 filtered = None
-            else:
+            elif self.replaceblanks:
                 filtered = N.array(data[:minlen])
-                if self.replaceblanks:
-                    filtered[N.logical_not(filterarr)] = N.nan
-                else:
-                    filtered = filtered[filterarr]
+                filtered[N.logical_not(mask)] = N.nan
+            elif sl is not None:
+                # no need to copy
+                filtered = data[sl]
+            else:
+                filtered = data[:minlen][mask]
             outdata[attr] = filtered
         return ds.returnCopyWithNewData(**outdata)
 
-    def filterText(self, ds, filterarr):
+    def filterText(self, ds, minlen):
         """Filter a text dataset."""
         data = ds.data
+        mask = self.mask[:minlen]
+        sl = self.contiguousSlice(minlen)
         if self.replaceblanks:
             filtered = [(d if f else "")
-                        for f, d in czip(filterarr, data)]
+                        for f, d in czip(mask, data)]
+        elif sl is not None:
+            filtered = data[sl]
         else:
-            filtered = [d for f, d in czip(filterarr, data) if f]
+            filtered = [data[i] for i in N.flatnonzero(mask)]
         return ds.returnCopyWithNewData(data=filtered)
 
-    def checkUpdate(self, doc):
-        """Check whether datasets need to be updated."""
-        if doc.changeset != self.changeset:
-            self.changeset = doc.changeset
-            log = self.evaluateFilter(doc)
-            if log:
-                doc.log('\n'.join(log)+'\n')
+    def contiguousSlice(self, minlen):
+        """Return slice equivalent to first minlen items of mask, if
+        possible, or None."""
+        if self.maskslice is None:
+            return None
+        return slice(min(self.maskslice.start, minlen),
+                     min(self.maskslice.stop, minlen))
+
+    def getMaskKey(self, doc):
+        """Return key which changes if the filter expression may
+        evaluate differently."""
+        expr = self.inexpr
+        if expr in doc.data:
+            names = [expr]
+        else:
+            names = substituteDatasets(doc.data, expr, 'data')[1]
+        key = ( tuple(names), doc.evaluate.contextchangeset ) + tuple(
+            [doc.datasetChangeKey(name) for name in names])
 
-    def evaluateFilter(self, doc):
-        """Update filtering calculation if doc changed.
+        # give up if the expression could depend on anything else
+        defns = [val for name, val in doc.evaluate.def_definitions]
+        if any([_docdepend_re.search(t) for t in [expr]+defns]):
+            key += (doc.changeset,)
+        return key
+
+    def evaluateMask(self, doc):
+        """Evaluate filter mask.
 
         Returns log of errors
         """
 
-        # this is populated by output
-        self.outdatasets = {}
+        self.mask = self.maskslice = None
 
-        # evaluate filter expression
         d = evalDatasetExpression(doc, self.inexpr)
         if d is None:
             return ["Invalid filter expression: '%s'" % self.inexpr]
@@ -108,12 +149,76 @@ class DatasetFilterGenerator(object):
             return [
                 _("Input filter expression non-numeric: '%s'") % self.inexpr]
 
-        filterarr = d.data.astype(N.bool)
+        mask = d.data.astype(N.bool_)
         if self.invert:
-            filterarr = N.logical_not(filterarr)
+            mask = N.logical_not(mask)
+        self.mask = mask
+
+        idxs = N.flatnonzero(mask)
+        if len(idxs) == 0:
+            self.maskslice = slice(0, 0)
+        elif idxs[-1]-idxs[0]+1 == len(idxs):
+            self.maskslice = slice(idxs[0], idxs[-1]+1)
+        return []
+
+    def checkMask(self, doc):
+        """Update the mask if necessary, logging any errors."""
+        if doc.changeset == self.maskchangeset:
+            return
+        self.maskchangeset = doc.changeset
+        key = self.getMaskKey(doc)
+        if key != self.maskkey:
+            self.maskkey = key
+            self.outcache = {}
+            log = self.evaluateMask(doc)
+            if log:
+                doc.log('\n'.join(log)+'\n')
+
+    def filterDataset(self, doc, name):
+        """Return (filtered dataset or None, log of errors)."""
+
+        if self.mask is None:
+            # an error has already been reported
+            return None, []
+        ds = doc.data.get(name)
+        if ds is None:
+            return None, []
+        if ds.dimensions != 1:
+            return None, [
+                _("Filtered dataset '%s' has more than 1 dimension") % name]
+
+        minlen = min(len(ds.data), len(self.mask))
+        if ds.datatype == "numeric":
+            return self.filterNumeric(ds, minlen), []
+        elif ds.datatype == "text":
+            return self.filterText(ds, minlen), []
+        return None, [_("Could not filter dataset '%s'") % name]
+
+    def getOutput(self, doc, name):
+        """Get filtered version of the dataset name, or None."""
+
+        self.checkMask(doc)
+
+        key = doc.datasetChangeKey(name)
+        if name in self.outcache and self.outcache[name][0] == key:
+            return self.outcache[name][1]
+
+        ds, log = self.filterDataset(doc, name)
+        if log:
+            doc.log('\n'.join(log)+'\n')
+        self.outcache[name] = (key, ds)
+        return ds
+
+    def evaluateFilter(self, doc):
+        """Check the filter and input datasets.
+
+        Returns log of errors
+        """
+
+        log = self.evaluateMask(doc)
+        if log:
+            return log
 
-        # do filtering of datasets
-        log = []
         for name in self.indatasets:
             ds = doc.data.get(name)
             if ds is None:
@@ -121,19 +226,8 @@ class DatasetFilterGenerator(object):
             if ds.dimensions != 1:
                 log.append(
                     _("Filtered dataset '%s' has more than 1 dimension") % name)
-                continue
-            minlen = min(len(ds.data), len(filterarr))
-            filterarrchop = filterarr[:minlen]
-
-            if ds.datatype == "numeric":
-                filtered = self.filterNumeric(ds, filterarrchop)
-            elif ds.datatype == "text":
-                filtered = self.filterText(ds, filterarrchop)
-            else:
+            elif ds.datatype not in ("numeric", "text"):
                 log.append(_("Could not filter dataset '%s'") % name)
-                continue
-
-            self.outdatasets[name] = filtered
         return log
 
     def saveToFile(self, doc, fileobj):
@@ -179,10 +273,9 @@ class DatasetFiltered(DatasetBase):
     def _checkUpdate(self):
         """Recalculate if document has changed."""
         if self.document.changeset != self.changeset:
-            self.generator.checkUpdate(self.document)
             self.changeset = self.document.changeset
 
-            ds = self.generator.outdatasets.get(self.namein)
+            ds = self.generator.getOutput(self.document, self.namein)
             if ds is None:
                 self._internalds = Dataset(data=[])
             else:
@@ -19,12 +19,140 @@
 from __future__ import division
 import numpy as N
 
-from ..compat import citems
+from ..compat import citems, czip
 from .. import utils
 from .commonfn import _
 from .oned import Dataset1DBase
 from .expression import evalDatasetExpression
 
+def binIndices(data, edges, uniform=False, islog=False):
+    """Return index of bin for each value in data.
+
+    edges are the N+1 bin edges. Values outside the bins or which are
+    not finite get an index of -1. As with N.histogram, bins include
+    their lower edge, and the last bin also includes its upper edge.
+
+    If uniform is set, the edges are equally spaced (in log space if
+    islog), so that the bin can be computed directly rather than
+    searched for.
+    """
+
+    data = N.asarray(data)
+    edges = N.asarray(edges, dtype=N.float64)
+    nbins = len(edges) - 1
+    idxs = N.full(data.shape, -1, dtype=N.intp)
+    if nbins < 1:
+        return idxs
+
+    with N.errstate(invalid='ignore'):
+        inrange = (data >= edges[0]) & (data <= edges[-1])
+    vals = data[inrange]
+
+    if uniform and edges[-1] > edges[0] and (not islog or edges[0] > 0):
+        if islog:
+            vals = N.log(vals)
+            lo, hi = N.log(edges[0]), N.log(edges[-1])
+        else:
+            lo, hi = edges[0], edges[-1]
+        binidx = ((vals - lo) * (nbins / (hi - lo))).astype(N.intp)
+        N.clip(binidx, 0, nbins-1, out=binidx)
+
+        # correct for rounding errors by comparing with the edges
+        vals = data[inrange]
+        binidx -= vals < edges[binidx]
+        binidx += (vals >= edges[binidx+1]) & (binidx != nbins-1)
+    else:
+        binidx = N.searchsorted(edges, vals, side='right') - 1
+        binidx[binidx == nbins] = nbins-1
+
+    idxs[inrange] = binidx
+    return idxs
+
+class HistogramCounter(object):
+    """Count values into bins, caching the result.
+
+    If the same data and bins are counted again, as given by the key
+    passed to count, the previous result is returned. If values have
+    only been appended to the data since the last count, only the new
+    values are counted.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Forget the cached counts."""
+        self.datas = self.edges = self.counts = None
+        self.mode = self.key = None
+
+    def _binCounts(self, datas, edges, uniform, islog):
+        """Count values in each bin, for data in each dimension."""
+
+        shape = tuple(len(e)-1 for e in edges)
+        if min(shape) < 1:
+            return N.zeros([max(s, 0) for s in shape], dtype=N.int64)
+
+        flatidx = None
+        for data, edge, size in czip(datas, edges, shape):
+            idx = binIndices(data, edge, uniform=uniform, islog=islog)
+            if flatidx is None:
+                flatidx = idx
+            else:
+                # combine with index from previous dimensions
+                bad = (flatidx < 0) | (idx < 0)
+                flatidx = flatidx*size + idx
+                flatidx[bad] = -1
+
+        counts = N.bincount(
+            flatidx[flatidx >= 0], minlength=int(N.prod(shape)))
+        return counts.astype(N.int64).reshape(shape)
+
+    def count(self, datas, edges, uniform=False, islog=False, key=None):
+        """Return number of values in each bin.
+
+        datas: list of data arrays, one for each dimension
+        edges: list of bin edge arrays, one for each dimension
+        uniform: bin edges are equally spaced
+        islog: bin edges are equally spaced in log space
+        key: value which changes when the data change (if not None)
+
+        Returns an integer array with a dimension for each data array.
+        """
+
+        datas = [N.asarray(d) for d in datas]
+        edges = [N.asarray(e) for e in edges]
+        mode = (uniform, islog)
+
+        if ( self.counts is not None and self.mode == mode and
+             len(edges) == len(self.edges) and
+             all(( N.array_equal(e1, e2)
+                   for e1, e2 in czip(edges, self.edges) )) ):
+
+            if key is not None and key == self.key:
+                # unchanged data
+                return self.counts
+
+            # check whether data have only been appended to (arrays
+            # modified in place cannot be compared with old values)
+            nold = len(self.datas[0])
+            if ( not any(( N.may_share_memory(d, old)
+                           for d, old in czip(datas, self.datas) )) and
+                 all(( len(d) >= nold for d in datas )) and
+                 all(( N.array_equal(d[:nold], old)
+                       for d, old in czip(datas, self.datas) )) ):
+                self.counts = self.counts + self._binCounts(
+                    [d[nold:] for d in datas], edges, uniform, islog)
+                self.datas = datas
+                self.key = key
+                return self.counts
+
+        self.counts = self._binCounts(datas, edges, uniform, islog)
+        self.datas = datas
+        self.key = key
+        self.edges = edges
+        self.mode = mode
+        return self.counts
+
 class DatasetHistoGenerator(object):
     def __init__(self, document, inexpr,
                  binmanual = None, binparams = None,
@@ -53,19 +181,31 @@ class DatasetHistoGenerator(object):
         self.cumulative = cumulative
         self.errors = errors
         self.bindataset = self.valuedataset = None
+        self.counter = HistogramCounter()
+        self.datakey = self._cacheddata = None
+
+    def _dataKey(self):
+        """Return key which changes when the input data may change."""
+        doc = self.document
+        if self.inexpr in doc.data:
+            return doc.datasetChangeKey(self.inexpr)
+        # expressions can depend on anything in the document
+        return (doc.changeset,)
 
     def getData(self):
         """Get data from input expression, caching result."""
         if self.document.changeset != self.changeset:
-            d = evalDatasetExpression(self.document, self.inexpr)
-            if d is not None:
-                d = d.data
-                # only use finite data
-                d = d[N.isfinite(d)]
-                if len(d) == 0:
-                    d = None
-
-            self._cacheddata = d
+            key = self._dataKey()
+            if key != self.datakey:
+                d = evalDatasetExpression(self.document, self.inexpr)
+                if d is not None:
+                    # only use finite data
+                    d = d.data[N.isfinite(d.data)]
+                    if len(d) == 0:
+                        d = None
+                self._cacheddata = d
+                self.datakey = key
+
             self.changeset = self.document.changeset
         return self._cacheddata
 
@@ -118,11 +258,23 @@ class DatasetHistoGenerator(object):
         perr = binlocs[1:] - data
         return data, nerr, perr
 
+    def getCounts(self, data, binlocs):
+        """Get number of values in each bin.
+
+        The counts are cached for the data and bins, so are only
+        computed once for each version of the data."""
+        uniform = self.binmanual is None
+        islog = uniform and bool(self.binparams[3])
+        return self.counter.count(
+            [data], [binlocs], uniform=uniform, islog=islog,
+            key=self.datakey)
+
     def getErrors(self, data, binlocs):
         """Compute error bars if requried."""
 
-        hist, edges = N.histogram(data, bins=binlocs)
+        hist = self.getCounts(data, binlocs)
         hist = hist.astype(N.float64)  # integers can break plots (github#49)
+        edges = binlocs
 
         # calculate scaling values for error bars
         if self.method == 'density':
@@ -151,12 +303,14 @@ class DatasetHistoGenerator(object):
         if data is None:
             return (N.array([]), None, None)
 
-        density = self.method == 'density'
         binlocs = self.binLocations()
-        hist, edges = N.histogram(data, bins=binlocs, density=density)
+        hist = self.getCounts(data, binlocs)
         hist = hist.astype(N.float64)  # integers can break plots (github#49)
-        
-        if self.method == 'fractions':
+
+        if self.method == 'density':
+            with N.errstate(divide='ignore', invalid='ignore'):
+                hist = hist / (N.diff(binlocs) * hist.sum())
+        elif self.method == 'fractions':
             hist = hist * (1./data.size)
 
         # if cumulative wanted
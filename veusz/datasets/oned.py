@@ -18,14 +18,15 @@
 
 """One dimensional datasets."""
 
+import weakref
 import numpy as N
 
 from .commonfn import (
-    _, dsPreviewHelper, copyOrNone, convertNumpy,
+    _, dsPreviewHelper, copyOrNone, convertNumpy, widenToFit,
     convertNumpyAbs, convertNumpyNegAbs, datasetNameToDescriptorName)
 from .base import DatasetConcreteBase, DatasetException
 
-from ..compat import czip,  crepr
+from ..compat import czip, crange, crepr
 from .. import utils
 
 class Dataset1DBase(DatasetConcreteBase):
@@ -42,7 +43,7 @@ class Dataset1DBase(DatasetConcreteBase):
 
     def userSize(self):
         """Size of dataset."""
-        return str( self.data.shape[0] )
+        return str( len(self) )
 
     def userPreview(self):
         """Preview of data."""
@@ -57,7 +58,7 @@ class Dataset1DBase(DatasetConcreteBase):
             templ = _("1D (length %i, asymmetric errors)")
         else:
             templ = _("1D (length %i)")
-        return templ % len(self.data)
+        return templ % len(self)
 
     def invalidDataPoints(self):
         """Return a numpy bool detailing which datapoints are invalid."""
@@ -77,8 +78,9 @@ class Dataset1DBase(DatasetConcreteBase):
         '''Get range of coordinates for each point in the form
         (minima, maxima).'''
 
-        minvals = self.data.copy()
-        maxvals = self.data.copy()
+        # data may be compact, so make sure errors can be added
+        minvals = N.array(self.data, dtype=N.float64)
+        maxvals = N.array(self.data, dtype=N.float64)
 
         if self.serr is not None:
             minvals -= self.serr
@@ -93,13 +95,47 @@ class Dataset1DBase(DatasetConcreteBase):
         return ( minvals[N.isfinite(minvals)],
                  maxvals[N.isfinite(maxvals)] )
 
+    def _rangeArrays(self):
+        """Arrays used to calculate ranges."""
+        return (self.data, self.serr, self.nerr, self.perr)
+
+    def _calcRange(self, combined, positive):
+        """Calculate range (see utils.dataRange)."""
+        return utils.dataRange(
+            self.data, self.serr, self.nerr, self.perr, combined, positive)
+
+    def _cachedRange(self, combined, positive):
+        """Get range, which is cached until the data change."""
+
+        doc = self.document
+        changeset = None if doc is None else doc.datachangeset
+        arrays = self._rangeArrays()
+
+        # ranges are valid while the document data and arrays are the same
+        cache = getattr(self, '_rangecache', None)
+        if cache is None or cache[0] != changeset or any([
+                (a is not None) != (r is not None) or
+                (r is not None and r() is not a)
+                for a, r in czip(arrays, cache[1]) ]):
+            cache = self._rangecache = (
+                changeset,
+                [None if a is None else weakref.ref(a) for a in arrays],
+                {} )
+
+        key = (combined, positive)
+        if changeset is None or key not in cache[2]:
+            cache[2][key] = self._calcRange(combined, positive)
+        return cache[2][key]
+
     def getRange(self):
         '''Get total range of coordinates. Returns None if empty.'''
-        minvals, maxvals = self.getPointRanges()
-        if len(minvals) > 0 and len(maxvals) > 0:
-            return ( minvals.min(), maxvals.max() )
-        else:
-            return None
+        return self._cachedRange(True, False)
+
+    def getErrorRange(self, positive=False):
+        '''Get range of the data points and the points plus or minus
+        each error (the values visited by rangeVisit). If positive, only
+        include positive values. Returns None if empty.'''
+        return self._cachedRange(False, positive)
 
     def rangeVisit(self, fn):
         '''Call fn on data points and error values, in order to get range.'''
@@ -139,7 +175,8 @@ class Dataset1DBase(DatasetConcreteBase):
         return Dataset(data = copyOrNone(self.data),
                        serr = copyOrNone(self.serr),
                        perr = copyOrNone(self.perr),
-                       nerr = copyOrNone(self.nerr))
+                       nerr = copyOrNone(self.nerr),
+                       compact = True)
 
     def returnCopyWithNewData(self, **args):
         """Return dataset of same type using the column data given."""
@@ -151,17 +188,19 @@ class Dataset(Dataset1DBase):
     editable = True
 
     def __init__(self, data = None, serr = None, nerr = None, perr = None,
-                 linked = None):
+                 linked = None, compact = False):
         '''Initialise dataset with the sets of values given.
 
         The values can be given as numpy 1d arrays or lists of numbers
         linked optionally specifies a LinkedFile to link the dataset to
+        compact keeps data in single precision or integer arrays,
+        rather than converting them to double precision
         '''
 
         Dataset1DBase.__init__(self, linked=linked)
 
         # convert data to numpy arrays
-        self.data = convertNumpy(data)
+        self.data = convertNumpy(data, compact=compact)
         self.serr = convertNumpyAbs(serr)
         self.perr = convertNumpyAbs(perr)
         self.nerr = convertNumpyNegAbs(nerr)
@@ -229,7 +268,8 @@ class Dataset(Dataset1DBase):
         for col in self.columns:
             coldata = getattr(self, col)
             if coldata is not None:
-                retn[col] = coldata[row:row+numrows]
+                # copy, so the old array is not kept by the undo history
+                retn[col] = coldata[row:row+numrows].copy()
                 setattr(self, col, N.delete( coldata, N.s_[row:row+numrows] ))
 
         self.document.modifiedData(self)
@@ -245,11 +285,115 @@ class Dataset(Dataset1DBase):
             if col in rowdata:
                 data[:len(rowdata[col])] = N.array(rowdata[col])
             if coldata is not None:
+                coldata = widenToFit(coldata, data)
                 newdata = N.insert(coldata, [row]*numrows, data)
                 setattr(self, col, newdata)
 
         self.document.modifiedData(self)
 
+# number of values converted at a time by DatasetNative
+NATIVE_CHUNK = 1<<20
+
+class DatasetNative(Dataset1DBase):
+    """1D dataset keeping values in their original numerical type.
+
+    The values can be a read-only or memory-mapped array, which is not
+    copied. They are converted to floating point when the data
+    attribute is used, and the converted values are only kept while
+    they are referenced elsewhere, e.g. by a plotter while painting.
+    Ranges are calculated in chunks without converting the whole
+    array.
+
+    Operations editing the dataset replace it with a normal Dataset
+    holding a copy of the values.
+    """
+
+    editable = True
+    serr = perr = nerr = None
+
+    def __init__(self, data, linked=None):
+        """data is a 1D numpy array of a numerical type."""
+
+        Dataset1DBase.__init__(self, linked=linked)
+        if data.ndim != 1:
+            raise DatasetException('Only 1-dimensional arrays allowed')
+        self.nativedata = data
+        self._dataref = None
+
+    @property
+    def data(self):
+        """Values converted to floating point (read only)."""
+        d = None if self._dataref is None else self._dataref()
+        if d is None:
+            d = self.nativedata.astype(N.float64)
+            d.flags.writeable = False
+            self._dataref = weakref.ref(d)
+        return d
+
+    def _chunks(self):
+        """Iterate over values converted to floating point in chunks."""
+        nd = self.nativedata
+        for i in crange(0, len(nd), NATIVE_CHUNK):
+            yield nd[i:i+NATIVE_CHUNK].astype(N.float64)
+
+    def _getItemHelper(self, key):
+        """Convert only the values selected by key."""
+        return {'data': N.array(self.nativedata[key], dtype=N.float64)}
+
+    def __len__(self):
+        return len(self.nativedata)
+
+    def empty(self):
+        return len(self.nativedata) == 0
+
+    def userPreview(self):
+        return dsPreviewHelper(self.nativedata)
+
+    def description(self):
+        return _("1D (length %i, %s)") % (
+            len(self.nativedata), self.nativedata.dtype.name)
+
+    def invalidDataPoints(self):
+        return N.logical_not(N.isfinite(self.nativedata))
+
+    def _rangeArrays(self):
+        return (self.nativedata,)
+
+    def _calcRange(self, combined, positive):
+        minval = maxval = None
+        for chunk in self._chunks():
+            r = utils.dataRange(chunk, None, None, None, False, positive)
+            if r is not None:
+                minval = r[0] if minval is None else min(minval, r[0])
+                maxval = r[1] if maxval is None else max(maxval, r[1])
+        if minval is None:
+            return None
+        return (minval, maxval)
+
+    def rangeVisit(self, fn):
+        '''Call fn on data points, in order to get range.'''
+        for chunk in self._chunks():
+            fn(chunk)
+
+    def saveDataDumpToText(self, fileobj, name):
+        '''Save data to file.'''
+        descriptor = datasetNameToDescriptorName(name) + '(numeric)'
+        fileobj.write( "ImportString(%s,'''\n" % crepr(descriptor) )
+        for chunk in self._chunks():
+            fileobj.write( ''.join(['%e\n' % v for v in chunk]) )
+        fileobj.write( "''')\n" )
+
+    def returnCopy(self):
+        """Return version of dataset with no linking."""
+        return Dataset(data=N.array(self.nativedata), compact=True)
+
+    def saveDataDumpToHDF5(self, group, name):
+        """Save dataset to HDF5."""
+        odgrp = group.create_group(utils.escapeHDFDataName(name))
+        odgrp.attrs['vsz_datatype'] = '1d'
+        odgrp['data'] = self.nativedata
+        odgrp['data'].attrs['vsz_name'] = name.encode('utf-8')
+
 class DatasetRange(Dataset1DBase):
     """Dataset consisting of a range of values e.g. 1 to 10 in 10 steps."""
 
@@ -48,10 +48,13 @@ class _DatasetPlugin(object):
             shape = [str(len(self.data))]
         shape = u'\u00d7'.join(shape)
 
-        return '%s plugin dataset (fields %s), size %s' % (
+        info = '%s plugin dataset (fields %s), size %s' % (
             self.pluginmanager.plugin.name,
             ', '.join(fields),
             shape)
+        if self.pluginmanager.updatetime is not None:
+            info += ', updated in %.3g s' % self.pluginmanager.updatetime
+        return info
 
     def canUnlink(self):
         """Can relationship be unlinked?"""
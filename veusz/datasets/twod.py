@@ -170,7 +170,8 @@ class Dataset2DBase(DatasetConcreteBase):
         return Dataset2D( N.array(self.data),
                           xrange=self.xrange, yrange=self.yrange,
                           xedge=self.xedge, yedge=self.yedge,
-                          xcent=self.xcent, ycent=self.ycent )
+                          xcent=self.xcent, ycent=self.ycent,
+                          compact=True )
 
     def returnCopyWithNewData(self, **args):
         return Dataset2D(**args)
@@ -182,10 +183,12 @@ class Dataset2D(Dataset2DBase):
 
     def __init__(self, data=None, xrange=None, yrange=None,
                  xedge=None, yedge=None,
-                 xcent=None, ycent=None):
+                 xcent=None, ycent=None, compact=False):
         '''Create a two dimensional dataset based on data.
 
         data: 2d numpy of imaging data
+        compact: keep single precision or integer data without
+                 converting to double precision
 
         Range specfied by:
          xrange: a tuple of (start, end) coordinates for x
@@ -200,7 +203,7 @@ class Dataset2D(Dataset2DBase):
 
         Dataset2DBase.__init__(self)
 
-        self.data = convertNumpy(data, dims=2)
+        self.data = convertNumpy(data, dims=2, compact=compact)
 
         # try to regularise data if possible
         # by converting regular grids to ranges
@@ -22,9 +22,10 @@
 
 from __future__ import division
 
+from collections import OrderedDict
 import numpy as N
 
-from ..compat import cstr
+from ..compat import cstr, crange, citems, czip
 from .. import qtall as qt4
 from .. import document
 from .. import datasets
@@ -36,62 +37,263 @@ def _(text, disambiguation=None, context="DataEditDialog"):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-class DatasetTableModel1D(qt4.QAbstractTableModel):
-    """Provides access to editing and viewing of datasets."""
+# number of rows added to a table each time the view asks for more
+FETCH_ROWS = 100000
 
-    def __init__(self, parent, document, datasetname):
+class FormattedValueCache(object):
+    """Cache of dataset values converted for display.
+
+    Values are converted in blocks of rows and only a limited number of
+    blocks are kept, so only the rows near to those shown are converted.
+    """
+
+    blocksize = 256
+    maxblocks = 64
+
+    def __init__(self):
+        self.blocks = OrderedDict()
+
+    def clear(self):
+        """Empty the cache."""
+        self.blocks.clear()
+
+    def invalidate(self, dsname, colname, row):
+        """Remove the block holding the row given."""
+        self.blocks.pop((dsname, colname, row//self.blocksize), None)
+
+    def value(self, ds, dsname, colname, row):
+        """Get converted value in column colname of dataset at row."""
+        key = (dsname, colname, row//self.blocksize)
+        start = key[2]*self.blocksize
+        try:
+            # move to end, so the most recently used blocks are kept
+            block = self.blocks.pop(key)
+        except KeyError:
+            # only get the rows in the block, as getting the whole
+            # column can convert all the values in the dataset
+            data = ds._getItemHelper(
+                slice(start, start+self.blocksize)).get(colname)
+            if data is None:
+                return None
+            block = [ds.uiDataItemToData(v) for v in data]
+            if len(self.blocks) >= self.maxblocks:
+                self.blocks.popitem(last=False)
+        self.blocks[key] = block
+
+        try:
+            return block[row-start]
+        except IndexError:
+            return None
+
+class DatasetTableModelFetched(qt4.QAbstractTableModel):
+    """Base model for tables of 1D datasets.
+
+    Rows are given to the view in chunks of FETCH_ROWS, converted
+    values are cached and edits only update the changed cell.
+
+    Subclasses should implement changeKey, countState and columnAttr.
+    countState should return a dict of the attributes describing the
+    table size, including changekey, rows and cols.
+    """
+
+    def __init__(self, parent, document):
         qt4.QAbstractTableModel.__init__(self, parent)
 
         self.document = document
-        self.dsname = datasetname
+        self.cache = FormattedValueCache()
+        self.fetched = FETCH_ROWS
+        # (row, column) of cell being edited by setData
+        self.editing = None
 
+        self.updateCounts()
         document.signalModified.connect(self.slotDocumentModified)
 
+    def changeKey(self):
+        """Return key which changes when the dataset(s) change."""
+
+    def countState(self):
+        """Return dict of attributes giving the number of rows and
+        columns."""
+
+    def updateCounts(self, state=None):
+        """Update the number of rows and columns."""
+        if state is None:
+            state = self.countState()
+        for attr, val in citems(state):
+            setattr(self, attr, val)
+
+    def columnAttr(self, column):
+        """Return (dataset name, column name) for table column."""
+
+    def otherChanged(self, oldkey, newkey, dsname):
+        """Have datasets shown other than dsname changed between the
+        change keys given?"""
+        return False
+
     def rowCount(self, parent):
-        """Return number of rows."""
+        """Return number of rows fetched."""
         if parent.isValid():
             # docs say we should return zero
             return 0
+        # the final blank row is only shown once all rows are fetched
+        if self.fetched >= self.rows-1:
+            return self.rows
+        return self.fetched
 
-        try:
-            return len(self.document.data[self.dsname].data)+1
-        except (KeyError, AttributeError):
+    def columnCount(self, parent):
+        """Return number of columns."""
+        if parent.isValid():
             return 0
+        return self.cols
+
+    def canFetchMore(self, parent):
+        """Are there more rows to show?"""
+        return not parent.isValid() and self.fetched < self.rows-1
+
+    def fetchMore(self, parent):
+        """Show another chunk of rows."""
+        if parent.isValid():
+            return
+        oldrows = self.rowCount(parent)
+        self.fetched += FETCH_ROWS
+        newrows = self.rows if self.fetched >= self.rows-1 else self.fetched
+        if newrows > oldrows:
+            self.beginInsertRows(parent, oldrows, newrows-1)
+            self.endInsertRows()
 
     def slotDocumentModified(self):
         """Called when document modified."""
-        self.layoutChanged.emit()
+        key = self.changeKey()
+        if key == self.changekey:
+            return
+
+        oldkey = self.changekey
+        state = self.countState()
+        if (state['rows'], state['cols']) != (self.rows, self.cols):
+            # rows or columns added or removed
+            self.beginResetModel()
+            self.updateCounts(state)
+            self.cache.clear()
+            self.endResetModel()
+            return
+
+        editeddsname = None
+        if self.editing is not None:
+            editeddsname = self.columnAttr(self.editing[1])[0]
+        self.updateCounts(state)
+
+        if ( editeddsname is not None and
+             not self.otherChanged(oldkey, key, editeddsname) ):
+            # only the cell being edited has changed
+            row, column = self.editing
+            dsname, colname = self.columnAttr(column)
+            self.cache.invalidate(dsname, colname, row)
+            idx = self.index(row, column)
+            self.dataChanged.emit(idx, idx)
+        else:
+            self.cache.clear()
+            rows = self.rowCount(qt4.QModelIndex())
+            if rows > 0 and self.cols > 0:
+                self.dataChanged.emit(
+                    self.index(0, 0), self.index(rows-1, self.cols-1))
+                self.headerDataChanged.emit(
+                    qt4.Qt.Horizontal, 0, self.cols-1)
 
-    def columnCount(self, parent):
-        """Return number of columns."""
+    def data(self, index, role):
+        """Return data for index."""
+        if role not in (qt4.Qt.DisplayRole, qt4.Qt.EditRole):
+            return None
+        dsname, colname = self.columnAttr(index.column())
+        ds = self.document.data.get(dsname)
+        if ds is None or colname is None:
+            return None
+        return self.cache.value(ds, dsname, colname, index.row())
 
-        if parent.isValid():
-            return 0
+    def applyEdit(self, row, column, ops):
+        """Apply operation to edit the cell given."""
+        self.editing = (row, column)
         try:
-            ds = self.document.data[self.dsname]
-        except KeyError:
-            return 0
-        return len( ds.column_descriptions )
+            self.document.applyOperation(ops)
+        except RuntimeError:
+            return False
+        finally:
+            self.editing = None
+        return True
 
-    def data(self, index, role):
-        """Return data for index."""
-        # get dataset
-        ds = self.document.data[self.dsname]
-        if ds is not None:
-            # select correct part of dataset
-            data = getattr(ds, ds.columns[index.column()])
-        if ds is not None and data is not None and role in (
-            qt4.Qt.DisplayRole, qt4.Qt.EditRole):
-            # blank row at end of data
-            if index.row() == len(data):
-                return None
+    def pasteColumnOps(self, ops, dsname, colname, row, texts, lengths):
+        """Add operations to ops to set values in a column of a
+        dataset, starting at row, from the text values given.
 
-            # convert data to data
-            d = data[index.row()]
-            return ds.uiDataItemToData(d)
+        Rows are added to the dataset if required. lengths is a dict
+        of the dataset lengths after the operations already in ops.
+        Raises ValueError if the values are invalid."""
 
-        # empty entry
-        return None
+        ds = self.document.data[dsname]
+        if not ds.editable:
+            raise ValueError('Dataset not editable')
+        vals = [ds.uiConvertToDataItem(t) for t in texts]
+
+        if getattr(ds, colname) is None:
+            ops.addOperation(
+                document.OperationDatasetAddColumn(dsname, colname))
+        nrows = lengths.setdefault(dsname, len(ds))
+        if row+len(vals) > nrows:
+            ops.addOperation(
+                document.OperationDatasetInsertRow(
+                    dsname, nrows, row+len(vals)-nrows))
+            lengths[dsname] = row+len(vals)
+        ops.addOperation(
+            document.OperationDatasetSetVal(
+                dsname, colname, slice(row, row+len(vals)), vals))
+
+    def pasteTable(self, row, column, table):
+        """Paste table (a list of rows of text values) into the table,
+        starting at the row and column given."""
+
+        ops = document.OperationMultiple([], descr=_('paste values'))
+        ncols = min(max([len(r) for r in table]), self.cols-column)
+        lengths = {}
+        try:
+            for coloffset in crange(ncols):
+                texts = [r[coloffset] if coloffset < len(r) else ''
+                         for r in table]
+                dsname, colname = self.columnAttr(column+coloffset)
+                self.pasteColumnOps(
+                    ops, dsname, colname, row, texts, lengths)
+        except ValueError:
+            return False
+
+        try:
+            self.document.applyOperation(ops)
+        except RuntimeError:
+            return False
+        return True
+
+class DatasetTableModel1D(DatasetTableModelFetched):
+    """Provides access to editing and viewing of datasets."""
+
+    def __init__(self, parent, document, datasetname):
+        self.dsname = datasetname
+        DatasetTableModelFetched.__init__(self, parent, document)
+
+    def changeKey(self):
+        return self.document.datasetChangeKey(self.dsname)
+
+    def countState(self):
+        ds = self.document.data.get(self.dsname)
+        try:
+            rows = len(ds)+1
+        except (AttributeError, TypeError):
+            rows = 0
+        return {
+            'changekey': self.changeKey(),
+            'rows': rows,
+            'cols': 0 if ds is None else len(ds.column_descriptions),
+            }
+
+    def columnAttr(self, column):
+        ds = self.document.data.get(self.dsname)
+        return self.dsname, (None if ds is None else ds.columns[column])
 
     def headerData(self, section, orientation, role):
         """Return row numbers or column names."""
@@ -106,7 +308,7 @@ class DatasetTableModel1D(qt4.QAbstractTableModel):
                 # column names
                 return ds.column_descriptions[section]
             else:
-                if section == len(ds.data):
+                if section == self.rows-1:
                     return "+"
                 # return row numbers
                 return section+1
@@ -152,7 +354,7 @@ class DatasetTableModel1D(qt4.QAbstractTableModel):
                                                    ds.columns[column]))
 
         # add a row if necessary
-        if row == len(ds.data):
+        if row == len(ds):
             ops.addOperation(
                 document.OperationDatasetInsertRow(self.dsname, row, 1))
 
@@ -166,34 +368,26 @@ class DatasetTableModel1D(qt4.QAbstractTableModel):
             document.OperationDatasetSetVal(self.dsname,
                                             ds.columns[column],
                                             row, val))
-        try:
-            self.document.applyOperation(ops)
-        except RuntimeError:
-            return False
-        return True
+        return self.applyEdit(row, column, ops)
 
-class DatasetTableModelMulti(qt4.QAbstractTableModel):
+class DatasetTableModelMulti(DatasetTableModelFetched):
     """Edit multiple datasets simultaneously with a spreadsheet-like style."""
 
     def __init__(self, parent, document, datasetnames):
-        qt4.QAbstractTableModel.__init__(self, parent)
-
-        self.document = document
         self.dsnames = datasetnames
-        document.signalModified.connect(self.slotDocumentModified)
+        DatasetTableModelFetched.__init__(self, parent, document)
 
-        self.changeset = -1
-        self.rows = 0
+    def changeKey(self):
+        return tuple([self.document.datasetChangeKey(name)
+                      for name in self.dsnames])
 
-    def updateCounts(self):
+    def countState(self):
         """Count rows and columns."""
 
-        self.changeset = self.document.changeset
-
         rows = 0
-        rowcounts = self.rowcounts = []
-        colcounts = self.colcounts = []
-        colattrs = self.colattrs = []
+        rowcounts = []
+        colcounts = []
+        colattrs = []
 
         for dsidx, name in enumerate(self.dsnames):
             if name not in self.document.data:
@@ -204,7 +398,7 @@ class DatasetTableModelMulti(qt4.QAbstractTableModel):
                 dataset.dimensions != 1):
                 continue
 
-            r = len(dataset.data)+1
+            r = len(dataset)+1
             rowcounts.append(r)
             rows = max(rows, r)
 
@@ -216,41 +410,24 @@ class DatasetTableModelMulti(qt4.QAbstractTableModel):
             colcounts.append( len(attr) )
             colattrs += attr
 
-        self.rows = rows
-
-    def rowCount(self, parent):
-        if parent.isValid():
-            return 0
-        if self.changeset != self.document.changeset:
-            self.updateCounts()
-        return self.rows
-
-    def columnCount(self, parent):
-        if parent.isValid():
-            return 0
-        if self.changeset != self.document.changeset:
-            self.updateCounts()
-        return len(self.colattrs)
-
-    def slotDocumentModified(self):
-        self.updateCounts()
-        self.layoutChanged.emit()
-
-    def data(self, index, role):
-        """Return data for index."""
-
-        dsname, colname, dsidx, colidx = self.colattrs[index.column()]
-        ds = self.document.data[dsname]
-        data = getattr(ds, colname)
-
-        if role == qt4.Qt.DisplayRole:
-            if index.row() < self.rowcounts[dsidx]-1:
-                # convert data to Data
-                d = data[index.row()]
-                return ds.uiDataItemToData(d)
-
-        # empty entry
-        return None
+        return {
+            'changekey': self.changeKey(),
+            'rows': rows,
+            'cols': len(colattrs),
+            'rowcounts': rowcounts,
+            'colcounts': colcounts,
+            'colattrs': colattrs,
+            }
+
+    def columnAttr(self, column):
+        return self.colattrs[column][:2]
+
+    def otherChanged(self, oldkey, newkey, dsname):
+        # derived datasets shown change whenever the document changes
+        for name, old, new in czip(self.dsnames, oldkey, newkey):
+            if old != new and name != dsname:
+                return True
+        return False
 
     def headerData(self, section, orientation, role):
         """Return row numbers or column names."""
@@ -309,12 +486,7 @@ class DatasetTableModelMulti(qt4.QAbstractTableModel):
 
         ops.addOperation(
             document.OperationDatasetSetVal(dsname, colname, row, val))
-
-        try:
-            self.document.applyOperation(ops)
-            return True
-        except RuntimeError:
-            return False
+        return self.applyEdit(row, column, ops)
 
     def insertRows(self, row, count):
         ops = []
@@ -558,6 +730,7 @@ class DataEditDialog(VeuszDialog):
         # actions for data table
         for text, slot in (
             (_('Copy'), self.slotCopy),
+            (_('Paste'), self.slotPaste),
             (_('Delete row'), self.slotDeleteRow),
             (_('Insert row'), self.slotInsertRow),
             ):
@@ -747,6 +920,25 @@ class DataEditDialog(VeuszDialog):
         # put text on clipboard
         qt4.QApplication.clipboard().setText(lines)
 
+    def slotPaste(self):
+        """Paste tab-separated text from the clipboard, starting at
+        the current cell."""
+        model = self.datatableview.model()
+        if not isinstance(model, DatasetTableModelFetched):
+            return
+        text = qt4.QApplication.clipboard().text()
+        lines = text.replace('\r', '').split('\n')
+        if lines and lines[-1] == '':
+            del lines[-1]
+        if not lines:
+            return
+
+        index = self.datatableview.currentIndex()
+        if not index.isValid():
+            return
+        table = [line.split('\t') for line in lines]
+        model.pasteTable(index.row(), index.column(), table)
+
     def slotDeleteRow(self):
         """Delete the current row."""
         self.datatableview.model().removeRows(
@@ -401,6 +401,7 @@ class ExportDialog(VeuszDialog):
             backcolor=setdb['export_background'],
             svgtextastext=setdb['export_SVG_text_as_text'],
             svgdpi=setdb['export_DPI_SVG'],
+            svgstreaming=setdb['export_SVG_streaming'],
         )
 
         def _overwriteQuestion(filename):
@@ -103,6 +103,8 @@ class ImportDialog(VeuszDialog):
 
         # tabs loaded currently in dialog
         self.tabs = {}
+        from .. import dataimport
+        dataimport.loadImportTabs()
         for tabname, tabclass in importtabs:
             w = tabclass(self)
             self.methodtab.addTab(w, tabname)
@@ -62,6 +62,8 @@ class PreferencesDialog(VeuszDialog):
             setdb['plot_updatepolicy'])
         self.intervalCombo.setCurrentIndex(index)
         self.threadSpinBox.setValue( setdb['plot_numthreads'] )
+        self.undoMemorySpinBox.setValue( setdb['undo_memory_limit'] )
+        self.undoSpillCheck.setChecked( setdb['undo_spill'] )
         self.translationEdit.setText( setdb['translation_file'] )
         self.translationBrowseButton.clicked.connect(
             self.translationBrowseClicked)
@@ -75,6 +77,11 @@ class PreferencesDialog(VeuszDialog):
         # use cwd for file dialogs
         (self.dirDocCWDRadio if setdb['dirname_usecwd'] else self.dirDocPrevRadio).click()
 
+        # import cache
+        self.importCacheGroup.setChecked( setdb['import_cache'] )
+        self.importCacheSizeSpinBox.setValue( setdb['import_cache_size'] )
+        self.compactDatasetsCheck.setChecked( setdb['compact_datasets'] )
+
         # exporting documents
         {
             'doc': self.dirExportDocRadio,
@@ -199,11 +206,18 @@ class PreferencesDialog(VeuszDialog):
         setdb['plot_antialias'] = self.antialiasCheck.isChecked()
         setdb['ui_english'] = self.englishCheck.isChecked()
         setdb['plot_numthreads'] = self.threadSpinBox.value()
+        setdb['undo_memory_limit'] = self.undoMemorySpinBox.value()
+        setdb['undo_spill'] = self.undoSpillCheck.isChecked()
         setdb['translation_file'] = self.translationEdit.text()
 
         # use cwd
         setdb['dirname_usecwd'] = self.dirDocCWDRadio.isChecked()
 
+        # import cache
+        setdb['import_cache'] = self.importCacheGroup.isChecked()
+        setdb['import_cache_size'] = self.importCacheSizeSpinBox.value()
+        setdb['compact_datasets'] = self.compactDatasetsCheck.isChecked()
+
         for radio, val in (
                 (self.dirExportDocRadio, 'doc'),
                 (self.dirExportCWDRadio, 'cwd'),
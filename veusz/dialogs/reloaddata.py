@@ -67,7 +67,7 @@ class ReloadData(VeuszDialog):
         # manual reload
         self.reloadbutton = self.buttonBox.addButton(
             "&Reload again", qt4.QDialogButtonBox.ApplyRole)
-        self.reloadbutton.clicked.connect(self.reloadData)
+        self.reloadbutton.clicked.connect(lambda: self.reloadData())
 
         # close by default, not reload
         self.buttonBox.button(qt4.QDialogButtonBox.Close).setDefault(True)
@@ -100,10 +100,11 @@ class ReloadData(VeuszDialog):
         newstat = self.statLinkedFiles()
         if newstat != self.filestats:
             self.filestats = newstat
-            self.reloadData()
+            self.reloadData(skipunchanged=True)
 
-    def reloadData(self):
-        """Reload linked data. Show the user what was done."""
+    def reloadData(self, skipunchanged=False):
+        """Reload linked data. Show the user what was done.
+        If skipunchanged, only reload files which have changed."""
 
         lines = []
         datasets = []
@@ -111,7 +112,7 @@ class ReloadData(VeuszDialog):
         try:
             # try to reload the datasets
             datasets, errors = self.document.reloadLinkedDatasets(
-                self.filenames)
+                self.filenames, skipunchanged=skipunchanged)
         except EnvironmentError as e:
             lines.append(_("Error reading file: %s") % cstr(e))
 
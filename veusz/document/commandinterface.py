@@ -63,6 +63,7 @@ class CommandInterface(qt4.QObject):
         'CreateHistogram',
         'DatasetPlugin',
         'FilterDatasets',
+        'FitWidgets',
         'Get',
         'GetChildren',
         'GetColormap',
@@ -742,13 +743,48 @@ class CommandInterface(qt4.QObject):
         # run action
         w.getAction(action).function()
 
+    def FitWidgets(self, widgets=None, threads=0):
+        """Fit the Fit widgets given concurrently.
+
+        widgets is a list of widget paths (default is current
+        widget). Any Fit widgets contained in these widgets are also
+        fitted.
+        threads is the number of threads to use (0 for number of CPUs)
+
+        The results are applied as a single operation, and a report of
+        chi^2 and timing for each fit is returned.
+        """
+
+        from ..widgets import fit
+
+        if widgets is None:
+            widgets = ['.']
+        elif isinstance(widgets, cbasestr):
+            widgets = [widgets]
+
+        fitwidgets = []
+        for path in widgets:
+            w = self.document.resolveWidgetPath(self.currentwidget, path)
+            allw = []
+            w.buildFlatWidgetList(allw)
+            for child in allw:
+                if child.typename == 'fit' and child not in fitwidgets:
+                    fitwidgets.append(child)
+
+        results = fit.fitWidgets(fitwidgets, threads=threads)
+        report = fit.fitReport(results)
+        if self.verbose:
+            print(report)
+        return report
+
     def Print(self):
         """Print document."""
         export.printDialog(None, self.document)
 
     def Export(self, filename, color=True, page=[0], dpi=100,
                antialias=True, quality=85, backcolor='#ffffff00',
-               pdfdpi=150, svgdpi=96, svgtextastext=False):
+               pdfdpi=150, svgdpi=96, svgtextastext=False,
+               svgstreaming=False):
         """Export plot to filename.
 
         color is True or False if color is requested in output file
@@ -761,6 +797,7 @@ class CommandInterface(qt4.QObject):
         pdfdpi is the dpi to use when exporting eps or pdf files
         svgdpi is the dpi to use when exporting svg files
         svgtextastext: write text in SVG as text, rather than curves
+        svgstreaming: write SVG elements as they are drawn, using less memory
         """
 
         # compatibility where page was a single number
@@ -774,7 +811,8 @@ class CommandInterface(qt4.QObject):
             bitmapdpi=dpi, antialias=antialias,
             quality=quality, backcolor=backcolor,
             pdfdpi=pdfdpi,
-            svgdpi=svgdpi, svgtextastext=svgtextastext)
+            svgdpi=svgdpi, svgtextastext=svgtextastext,
+            svgstreaming=svgstreaming)
         e.export()
 
     def Rename(self, widget, newname):
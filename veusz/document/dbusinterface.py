@@ -19,12 +19,65 @@
 """DBus interface to Veusz document."""
 
 from __future__ import division
+import os
+import tempfile
 import numpy as N
 
 from ..compat import cstr
 from ..utils import vzdbus
 from . import commandinterpreter
 
+# Arrays are transferred as raw little-endian bytes with the structure
+# (dtype, shape, bytes), where dtype is a numpy type string (e.g. '<f8'),
+# or as (dtype, shape) and a file descriptor to read the bytes from
+
+def _littleEndian(a):
+    """Return contiguous little-endian version of array."""
+    a = N.asarray(a)
+    return N.ascontiguousarray(a, dtype=a.dtype.newbyteorder('<'))
+
+def _arrayToBytes(a):
+    """Convert array to (dtype, shape, bytes).
+    None is converted to an empty array."""
+    if a is None:
+        return ('<f8', [0], b'')
+    a = _littleEndian(a)
+    return (a.dtype.str, list(a.shape), a.tobytes())
+
+def _checkDtype(dtype, shape):
+    """Get numpy dtype and shape, checking they are valid."""
+    dtype = N.dtype(cstr(dtype))
+    if dtype.kind not in 'biuf':
+        raise ValueError('Unsupported data type %s' % dtype.str)
+    shape = [int(x) for x in shape]
+    if any([x < 0 for x in shape]):
+        raise ValueError('Invalid shape')
+    return dtype, shape
+
+def _bytesToArray(dtype, shape, data):
+    """Convert (dtype, shape, bytes) to an array.
+    Returns None if the array is empty."""
+    dtype, shape = _checkDtype(dtype, shape)
+    a = N.frombuffer(data, dtype=dtype)
+    if a.size != N.prod(shape, dtype=N.int64):
+        raise ValueError('Size of data does not match shape')
+    if a.size == 0:
+        return None
+    return a.reshape(shape).copy()
+
+def _readArray(fileobj, dtype, shape):
+    """Read array with dtype and shape from file object."""
+    a = N.empty(shape, dtype=dtype)
+    buf = a.reshape(-1).view(N.uint8)
+    pos = 0
+    while pos < len(buf):
+        # may be a pipe, which can return less than requested
+        nread = fileobj.readinto(buf[pos:])
+        if not nread:
+            raise ValueError('Size of data does not match shape')
+        pos += nread
+    return a
+
 class DBusInterface(vzdbus.Object):
     """DBus interface to Veusz document command interface."""
 
@@ -111,6 +164,18 @@ class DBusInterface(vzdbus.Object):
         data, serr, nerr, perr = self.ci.GetData(cstr(datasetname))
         return lornull(data), lornull(serr), lornull(nerr), lornull(perr)
 
+    @vzdbus.method(dbus_interface=interface,
+                   in_signature='s',
+                   out_signature='(saiay)(saiay)(saiay)(saiay)')
+    def GetData1DBytes(self, datasetname):
+        """Get a numeric dataset as raw bytes. Returns (dtype, shape,
+        bytes) for data, symmetric error, negative error and positive
+        error. Missing errors are returned as empty float64 arrays,
+        ('<f8', [0], b'')."""
+        d = self._getNumeric(datasetname, 1)
+        return tuple([_arrayToBytes(a)
+                      for a in (d.data, d.serr, d.nerr, d.perr)])
+
     @vzdbus.method(dbus_interface=interface,
                    in_signature='s', out_signature='iiddddad')
     def GetData2D(self, datasetname):
@@ -124,6 +189,44 @@ class DBusInterface(vzdbus.Object):
                  data[1][0], data[1][1], data[2][0], data[2][1],
                  list(data[0].flat) )
 
+    @vzdbus.method(dbus_interface=interface,
+                   in_signature='s', out_signature='(saiay)(dd)(dd)')
+    def GetData2DBytes(self, datasetname):
+        """Get a 2D dataset as raw bytes. Returns
+        ((dtype, shape, bytes), (rangex min, rangex max),
+         (rangey min, rangey max))
+        """
+        d = self._getNumeric(datasetname, 2)
+        return ( _arrayToBytes(d.data), tuple(d.xrange), tuple(d.yrange) )
+
+    @vzdbus.method(dbus_interface=interface,
+                   in_signature='ss', out_signature='(sai)h')
+    def GetDataFD(self, datasetname, part):
+        """Get part of a numeric dataset through a file descriptor,
+        for large datasets.
+
+        part is 'data', or 'serr', 'nerr' or 'perr' for the errors of
+        1D datasets. Returns (dtype, shape) and a file descriptor to
+        read the raw bytes from."""
+
+        if vzdbus.UnixFd is None:
+            raise RuntimeError('File descriptor passing not supported')
+        d = self._getNumeric(datasetname, None)
+        parts = ('data', 'serr', 'nerr', 'perr') if d.dimensions == 1 \
+                else ('data',)
+        if part not in parts:
+            raise ValueError('Invalid part %s' % part)
+        a = getattr(d, part)
+        a = _littleEndian(N.zeros(0) if a is None else a)
+
+        # an anonymous file, which is deleted when the fd is closed
+        with tempfile.TemporaryFile(prefix='veusz_dbus_') as f:
+            f.write(a.reshape(-1).view(N.uint8))
+            f.flush()
+            f.seek(0)
+            fd = vzdbus.UnixFd(f)
+        return (a.dtype.str, list(a.shape)), fd
+
     @vzdbus.method(dbus_interface=interface,
                    in_signature='s', out_signature='as')
     def GetDataText(self, datasetname):
@@ -222,6 +325,37 @@ class DBusInterface(vzdbus.Object):
         if not poserr: poserr = None
         self.ci.SetData(cstr(name), data, symerr, negerr, poserr)
 
+    @vzdbus.method(dbus_interface=interface,
+                   in_signature='s(saiay)(saiay)(saiay)(saiay)',
+                   byte_arrays=True)
+    def SetDataBytes(self, name, data, symerr, negerr, poserr):
+        """Set a numeric dataset from raw bytes, each given as
+        (dtype, shape, bytes). Empty errors are not used."""
+        data = _bytesToArray(*data)
+        if data is None:
+            data = N.zeros(0)
+        self.ci.SetData(cstr(name), data, _bytesToArray(*symerr),
+                        _bytesToArray(*negerr), _bytesToArray(*poserr))
+
+    @vzdbus.method(dbus_interface=interface,
+                   in_signature='s(sai)h')
+    def SetDataFD(self, name, dtypeshape, fd):
+        """Set a numeric dataset from raw bytes read from a file
+        descriptor, for large datasets. dtypeshape is (dtype, shape)
+        of the data. 1D shapes create a 1D dataset, 2D shapes a 2D
+        dataset and other shapes an n-D dataset."""
+
+        dtype, shape = _checkDtype(*dtypeshape)
+        with os.fdopen(fd.take(), 'rb') as f:
+            data = _readArray(f, dtype, shape)
+
+        if data.ndim == 1:
+            self.ci.SetData(cstr(name), data)
+        elif data.ndim == 2:
+            self.ci.SetData2D(cstr(name), data)
+        else:
+            self.ci.SetDataND(cstr(name), data)
+
     @vzdbus.method(dbus_interface=interface,
                    in_signature='ssssa{sv}')
     def SetData2DExpressionXYZ(self, name, xexpr, yexpr, zexpr, optargs):
@@ -239,6 +373,18 @@ class DBusInterface(vzdbus.Object):
         data = N.array(data).reshape(nx, ny)
         self.ci.SetData2D(cstr(name), data, xrange=xrange, yrange=yrange)
 
+    @vzdbus.method(dbus_interface=interface,
+                   in_signature='s(saiay)(dd)(dd)',
+                   byte_arrays=True)
+    def SetData2DBytes(self, name, data, xrange, yrange):
+        """Set a 2D dataset from raw bytes (dtype, shape, bytes),
+        with the X and Y ranges."""
+        data = _bytesToArray(*data)
+        if data is None or data.ndim != 2:
+            raise ValueError('2D data required')
+        self.ci.SetData2D(cstr(name), data, xrange=tuple(xrange),
+                          yrange=tuple(yrange))
+
     @vzdbus.method(dbus_interface=interface,
                    in_signature='ssa{sv}')
     def SetDataExpression(self, name, val, optargs):
@@ -260,6 +406,15 @@ class DBusInterface(vzdbus.Object):
     def To(self, path):
         self.ci.To(path)
 
+    def _getNumeric(self, datasetname, dimensions):
+        """Get numeric dataset, checking the number of dimensions if
+        dimensions is not None."""
+        d = self.ci.document.getData(cstr(datasetname))
+        if d.datatype != 'numeric' or (
+                dimensions is not None and d.dimensions != dimensions):
+            raise ValueError('Dataset has the wrong type')
+        return d
+
     # node interface
 
     @vzdbus.method(dbus_interface=interface,
@@ -26,19 +26,17 @@ import codecs
 import os.path
 import traceback
 import datetime
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 from collections import defaultdict
 
-try:
-    import h5py
-except ImportError:
-    h5py = None
-
-from ..compat import citems, cvalues, cstr, CStringIO, cexecfile
+from ..compat import citems, cvalues, crange, czip, cstr, CStringIO, cexecfile
 from .. import qtall as qt4
 
 from . import widgetfactory
 from . import painthelper
 from . import evaluate
+from . import history
 
 from .. import datasets
 from .. import utils
@@ -95,6 +93,13 @@ class Document(qt4.QObject):
         # change tracking of document as a whole
         self.changeset = 0            # increased when the document changes
 
+        # change tracking of datasets: datachangeset is increased when
+        # datasets are added, removed, renamed or modified, and
+        # datasetversions records the datachangeset for each dataset
+        # when it was last changed
+        self.datachangeset = 0
+        self.datasetversions = {}
+
         # map tags to dataset names
         self.datasettags = defaultdict(list)
 
@@ -114,6 +119,8 @@ class Document(qt4.QObject):
     def wipe(self):
         """Wipe out any stored data."""
         self.data = {}
+        self.datasetversions = {}
+        self.datachangeset += 1
         self.basewidget = widgetfactory.thefactory.makeWidget(
             'document', None, self)
         self.setModified(False)
@@ -126,6 +133,7 @@ class Document(qt4.QObject):
         self.historybatch = []
         self.historyundo = []
         self.historyredo = []
+        self.historymemory = history.HistoryMemory()
 
     def suspendUpdates(self):
         """Holds sending update messages.
@@ -192,6 +200,9 @@ class Document(qt4.QObject):
         if not redoing:
             self.historyredo = []
 
+        if not self.historybatch:
+            self.limitHistory()
+
         return retn
 
     def batchHistory(self, batch):
@@ -213,10 +224,12 @@ class Document(qt4.QObject):
         """Undo the previous operation."""
 
         operation = self.historyundo.pop()
+        self.historymemory.restore(operation)
         with DocSuspend(self):
             operation.undo(self)
             self.changeset += 1
         self.historyredo.append(operation)
+        self.limitHistory()
 
     def canUndo(self):
         """Returns True if previous operation can be removed."""
@@ -225,20 +238,91 @@ class Document(qt4.QObject):
     def redoOperation(self):
         """Redo undone operations."""
         operation = self.historyredo.pop()
+        self.historymemory.restore(operation)
         return self.applyOperation(operation, redoing=True)
 
     def canRedo(self):
         """Returns True if previous operation can be redone."""
         return len(self.historyredo) != 0
 
+    def limitHistory(self):
+        """Limit the memory used by the undo history.
+
+        The oldest undo operations are removed if the data they hold
+        use more than the undo_memory_limit setting (in MB). If the
+        undo_spill setting is enabled, large arrays held by operations
+        other than the next to be undone or redone are written to
+        temporary files.
+        """
+
+        limit = setting.settingdb['undo_memory_limit']*1024*1024
+        spill = setting.settingdb['undo_spill']
+
+        memory = self.historymemory
+        memory.update(self, self.historyundo + self.historyredo)
+
+        if spill:
+            for op in self.historyundo[:-1] + self.historyredo[:-1]:
+                memory.spill(op)
+
+        if limit <= 0:
+            return
+        # usage of redo operations, then undo operations from newest
+        usage = memory.usage(self.historyredo + self.historyundo[::-1])
+        total = sum([m for m, d in usage[:len(self.historyredo)]])
+        undousage = usage[len(self.historyredo):][::-1]
+        # keep newest operations until the limit is reached, always
+        # keeping the next one to undo
+        for i in crange(len(self.historyundo)-1, -1, -1):
+            total += undousage[i][0]
+            if total > limit and i != len(self.historyundo)-1:
+                del self.historyundo[:i+1]
+                memory.update(self, self.historyundo + self.historyredo)
+                break
+
+    def historyMemoryUsage(self):
+        """Return (bytes in memory, bytes in temporary files) used by
+        data held only by the undo and redo history."""
+        ops = self.historyundo + self.historyredo
+        self.historymemory.update(self, ops)
+        inmem = ondisk = 0
+        for m, d in self.historymemory.usage(ops):
+            inmem += m
+            ondisk += d
+        return inmem, ondisk
+
     def isBlank(self):
         """Is the document unchanged?"""
         return self.changeset == 0
 
+    def _updateDatasetVersion(self, name):
+        """Record that dataset name has changed."""
+        self.datachangeset += 1
+        self.datasetversions[name] = self.datachangeset
+
+    def datasetVersion(self, name):
+        """Get version number of dataset, which changes when the
+        dataset is replaced or modified."""
+        return self.datasetversions.get(name, 0)
+
+    def datasetChangeKey(self, name):
+        """Return a key which changes when the dataset name changes.
+
+        Derived datasets (expressions, plugins, filters, etc) can
+        change when anything else in the document changes, so the
+        document changeset is included for these."""
+        ds = self.data.get(name)
+        key = (self.datasetVersion(name), id(ds))
+        if ds is not None and (
+            not ds.editable or hasattr(ds, 'pluginmanager')):
+            key += (self.changeset,)
+        return key
+
     def setData(self, name, dataset):
         """Set dataset in document."""
         self.data[name] = dataset
         dataset.document = self
+        self._updateDatasetVersion(name)
 
         # update the change tracking
         self.setModified()
@@ -246,27 +330,42 @@ class Document(qt4.QObject):
     def deleteData(self, name):
         """Remove a dataset"""
         del self.data[name]
+        self.datasetversions.pop(name, None)
+        self.datachangeset += 1
         self.setModified()
 
     def modifiedData(self, dataset):
         """Notify dataset was modified"""
-        assert dataset in self.data.values()
+        names = [n for n, ds in citems(self.data) if ds is dataset]
+        assert names
+        self.modifiedDatasetNames(names)
+
+    def modifiedDatasetNames(self, names):
+        """Notify datasets with the names given were modified."""
+        for name in names:
+            self._updateDatasetVersion(name)
         self.setModified()
 
     def getLinkedFiles(self, filenames=None):
         """Get a list of LinkedFile objects used by the document.
         if filenames is a set, only get the objects with filenames given
         """
-        links = set()
-        for ds in cvalues(self.data):
-            if ds.linked and (filenames is None or
-                              ds.linked.filename in filenames):
-                links.add(ds.linked)
-        return list(links)
-
-    def reloadLinkedDatasets(self, filenames=None):
+        # ordered by dataset name, so the order is reproducible
+        links = []
+        seen = set()
+        for name in sorted(self.data):
+            ds = self.data[name]
+            if ( ds.linked and id(ds.linked) not in seen and
+                 (filenames is None or ds.linked.filename in filenames) ):
+                seen.add(id(ds.linked))
+                links.append(ds.linked)
+        return links
+
+    def reloadLinkedDatasets(self, filenames=None, skipunchanged=True):
         """Reload linked datasets from their files.
         If filenames is a set(), only reload from these filenames
+        If skipunchanged, do not reload files with the same modification
+        time and size as when they were read.
 
         Returns a tuple of
         - List of datasets read
@@ -274,15 +373,28 @@ class Document(qt4.QObject):
         """
 
         links = self.getLinkedFiles(filenames=filenames)
+        if skipunchanged:
+            links = [lf for lf in links if not lf.isUnchanged()]
+
+        # read the files in parallel, without touching the document
+        # (more threads than cpus as reading often waits for the disk)
+        if len(links) > 1:
+            pool = ThreadPool(
+                min(len(links), multiprocessing.cpu_count()+4))
+            prepared = pool.map(lambda lf: lf.prepareReload(), links)
+            pool.close()
+            pool.join()
+        else:
+            prepared = [lf.prepareReload() for lf in links]
 
         read = []
         errors = {}
 
-        # load in the files, merging the vars read and errors
+        # merge the vars read and errors in order
         if links:
             with self.suspend():
-                for lf in links:
-                    nread, nerrors = lf.reloadLinks(self)
+                for lf, prep in czip(links, prepared):
+                    nread, nerrors = lf.reloadLinks(self, prepared=prep)
                     read += nread
                     errors.update(nerrors)
                 self.setModified()
@@ -302,6 +414,8 @@ class Document(qt4.QObject):
         d = self.data[oldname]
         del self.data[oldname]
         self.data[newname] = d
+        self.datasetversions.pop(oldname, None)
+        self._updateDatasetVersion(newname)
 
         self.setModified()
 
@@ -340,8 +454,28 @@ class Document(qt4.QObject):
                     plugin, traceback.format_exc())
                 raise RuntimeError(err)
 
+    def updatePluginDatasets(self):
+        """Update any datasets created by plugins which are out of date,
+        running independent plugins in parallel.
+
+        Returns a list of (plugin name, time taken) for plugins run."""
+
+        managers = []
+        for name in sorted(self.data):
+            manager = getattr(self.data[name], 'pluginmanager', None)
+            if ( manager is not None and manager not in managers and
+                 manager.changeset != self.changeset ):
+                managers.append(manager)
+        if not managers:
+            return []
+
+        from ..plugins import updatePluginManagers
+        return [ (m.plugin.name, t) for m, t in
+                 updatePluginManagers(managers) ]
+
     def paintTo(self, painthelper, page):
         """Paint page specified to the paint helper."""
+        self.updatePluginDatasets()
         self.basewidget.draw(painthelper, page)
 
     def getNumberPages(self):
@@ -486,7 +620,9 @@ class Document(qt4.QObject):
             with codecs.open(filename, 'w', 'utf-8') as f:
                 self.saveToFile(f)
         elif mode == 'hdf5':
-            if h5py is None:
+            try:
+                import h5py
+            except ImportError:
                 raise RuntimeError('Missing h5py module')
             with h5py.File(filename, 'w') as f:
                 self.saveToHDF5File(f)
@@ -63,6 +63,9 @@ class Evaluate:
         # directories to examine when importing
         self.importpath = []
 
+        # increased when the evaluation context is updated
+        self.contextchangeset = 0
+
         self.wipe()
 
     def wipe(self):
@@ -102,6 +105,7 @@ class Evaluate:
         This sets up a safe environment where things can be evaluated
         """
 
+        self.contextchangeset += 1
         c = self.context
         c.clear()
 
@@ -307,7 +311,7 @@ class Evaluate:
         data = getattr(self.doc.data[name], part)
 
         if isinstance(data, N.ndarray):
-            return N.array(data)
+            return N.array(datasets.widenToDouble(data))
         elif isinstance(data, list):
             return list(data)
         return data
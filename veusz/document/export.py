@@ -184,7 +184,8 @@ class Export(object):
 
     def __init__(self, doc, filename, pagenumbers, color=True, bitmapdpi=100,
                  antialias=True, quality=85, backcolor='#ffffff00',
-                 pdfdpi=150, svgdpi=96, svgtextastext=False):
+                 pdfdpi=150, svgdpi=96, svgtextastext=False,
+                 svgstreaming=False):
         """Initialise export class. Parameters are:
         doc: document to write
         filename: output filename
@@ -197,6 +198,7 @@ class Export(object):
         pdfdpi: dpi for pdf and eps files
         svgdpi: dpi for svg files
         svgtextastext: write text in SVG as text, rather than curves
+        svgstreaming: write SVG elements as they are drawn, using less memory
         """
 
         self.doc = doc
@@ -210,6 +212,7 @@ class Export(object):
         self.pdfdpi = pdfdpi
         self.svgdpi = svgdpi
         self.svgtextastext = svgtextastext
+        self.svgstreaming = svgstreaming
 
     def export(self):
         """Export the figure to the filename."""
@@ -397,7 +400,8 @@ class Export(object):
             paintdev = svg_export.SVGPaintDevice(
                 f, size[0]/sdpi, size[1]/sdpi,
                 writetextastext=self.svgtextastext,
-                dpi=self.svgdpi, scale=scale)
+                dpi=self.svgdpi, scale=scale,
+                streaming=self.svgstreaming)
             painter = painthelper.DirectPainter(paintdev)
             self.renderPage(page, size, (sdpi,sdpi), painter)
 
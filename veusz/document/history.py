@@ -0,0 +1,284 @@
+#    Copyright (C) 2018 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+###############################################################################
+
+"""Measure and limit the memory used by operations in the undo history.
+
+Operations keep references to the datasets they replace or delete, so
+that they can be undone. These datasets are no longer in the document,
+so their memory is only used by the history. Large arrays in these
+datasets can optionally be written to a temporary file until the
+operation is undone or redone.
+"""
+
+from __future__ import division
+from collections import defaultdict
+import tempfile
+
+import numpy as N
+
+from ..compat import cvalues
+from .. import datasets
+
+# only write arrays at least this size to temporary files
+SPILL_MIN_BYTES = 1024*1024
+
+class SpillFile(object):
+    """An anonymous temporary file shared by spilled arrays.
+
+    The file is opened when the first array is written and closed when
+    the last array in it is released. The file is truncated when
+    arrays at its end are released."""
+
+    def __init__(self):
+        self.fileobj = None
+        # map offsets of arrays in file to their end offsets
+        self.blocks = {}
+
+    def write(self, array):
+        """Append array to file, returning its offset. The file it was
+        written to is fileobj after writing."""
+        if self.fileobj is None:
+            self.fileobj = tempfile.TemporaryFile(prefix='veusz_undo_')
+        self.fileobj.seek(0, 2)
+        offset = self.fileobj.tell()
+        N.save(self.fileobj, array, allow_pickle=False)
+        self.blocks[offset] = self.fileobj.tell()
+        return offset
+
+    def read(self, offset):
+        """Read array at offset."""
+        self.fileobj.seek(offset)
+        return N.load(self.fileobj, allow_pickle=False)
+
+    def release(self, fileobj, offset):
+        """Array at offset in fileobj is no longer needed."""
+        if fileobj is not self.fileobj:
+            # file already closed and replaced
+            return
+        if fileobj.closed:
+            # closed elsewhere, e.g. while garbage collecting
+            self.fileobj = None
+            self.blocks.clear()
+            return
+        del self.blocks[offset]
+        if not self.blocks:
+            self.fileobj.close()
+            self.fileobj = None
+        else:
+            self.fileobj.truncate(max(cvalues(self.blocks)))
+
+class SpilledArray(object):
+    """An array written to a SpillFile."""
+
+    def __init__(self, array, spillfile):
+        self.nbytes = array.nbytes
+        self.spillfile = spillfile
+        self.offset = spillfile.write(array)
+        self.fileobj = spillfile.fileobj
+
+    def load(self):
+        """Read the array back, releasing it from the file."""
+        array = self.spillfile.read(self.offset)
+        self.spillfile.release(self.fileobj, self.offset)
+        self.spillfile = None
+        return array
+
+    def __del__(self):
+        try:
+            if self.spillfile is not None:
+                self.spillfile.release(self.fileobj, self.offset)
+        except Exception:
+            # modules may have been torn down at interpreter exit
+            pass
+
+def _heldObjects(operation):
+    """Iterate over datasets and arrays held by operation, including
+    those in any sub-operations, lists and dicts."""
+
+    seen = set()
+    stack = [operation]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, (N.ndarray, datasets.DatasetBase)):
+            yield obj
+        elif isinstance(obj, dict):
+            stack += list(cvalues(obj))
+        elif isinstance(obj, (list, tuple)):
+            stack += list(obj)
+        elif hasattr(obj, 'do') and hasattr(obj, 'undo'):
+            # an operation
+            stack += list(cvalues(obj.__dict__))
+
+def _datasetArrays(ds):
+    """Get list of (attribute, array) for arrays stored in dataset.
+    Only attributes in the instance dictionary are considered, which
+    excludes the data of derived datasets. Memory-mapped arrays are
+    already stored in files, so are ignored."""
+    return [
+        (attr, val) for attr, val in ds.__dict__.items()
+        if ( isinstance(val, (N.ndarray, SpilledArray)) and
+             not isinstance(val, N.memmap) )
+    ]
+
+def _liveDatasets(document):
+    """Get set of ids of datasets in the document."""
+    return set([id(ds) for ds in cvalues(document.data)])
+
+class HistoryMemory(object):
+    """Keep track of the memory used by operations in the history.
+
+    The objects held by each operation and their sizes are cached.
+    Sizes are only recomputed when arrays held by an operation are
+    spilled or restored, or its datasets are added to or removed from
+    the document.
+    """
+
+    def __init__(self):
+        self.spillfile = SpillFile()
+        # id(operation) -> (operation, list of held objects)
+        self.held = {}
+        # id(operation) -> list of (id(array), bytes in memory,
+        #                          bytes in temporary file)
+        self.sizes = {}
+        # id(dataset) -> set of ids of operations holding dataset
+        self.holders = defaultdict(set)
+        # ids of operations which have been spilled
+        self.spilled = set()
+        # ids of datasets in the document
+        self.live = set()
+
+    def _heldObjects(self, operation):
+        """Get cached list of objects held by operation."""
+        key = id(operation)
+        if key not in self.held:
+            objs = list(_heldObjects(operation))
+            self.held[key] = (operation, objs)
+            for obj in objs:
+                if isinstance(obj, datasets.DatasetBase):
+                    self.holders[id(obj)].add(key)
+        return self.held[key][1]
+
+    def _invalidate(self, dsids):
+        """Forget sizes of operations holding datasets with ids given."""
+        for dsid in dsids:
+            for key in self.holders.get(dsid, ()):
+                self.sizes.pop(key, None)
+                self.spilled.discard(key)
+
+    def forget(self, operation):
+        """Forget cached information about operation."""
+        key = id(operation)
+        if key in self.held:
+            for obj in self.held.pop(key)[1]:
+                if isinstance(obj, datasets.DatasetBase):
+                    keys = self.holders[id(obj)]
+                    keys.discard(key)
+                    if not keys:
+                        del self.holders[id(obj)]
+        self.sizes.pop(key, None)
+        self.spilled.discard(key)
+
+    def update(self, document, operations):
+        """Update for the operations in the history and the datasets
+        in the document. This should be called before usage or spill
+        if either may have changed."""
+
+        keys = set([id(op) for op in operations])
+        for key in [k for k in self.held if k not in keys]:
+            self.forget(self.held[key][0])
+
+        live = _liveDatasets(document)
+        self._invalidate(live ^ self.live)
+        self.live = live
+
+    def _arraySizes(self, operation):
+        """Get cached list of (id, bytes in memory, bytes in temporary
+        file) for arrays held by operation which are not in the
+        document."""
+
+        key = id(operation)
+        if key not in self.sizes:
+            sizes = []
+            for obj in self._heldObjects(operation):
+                if isinstance(obj, N.ndarray):
+                    sizes.append((id(obj), obj.nbytes, 0))
+                elif id(obj) not in self.live:
+                    for attr, val in _datasetArrays(obj):
+                        if isinstance(val, SpilledArray):
+                            sizes.append((id(val), 0, val.nbytes))
+                        else:
+                            sizes.append((id(val), val.nbytes, 0))
+            self.sizes[key] = sizes
+        return self.sizes[key]
+
+    def usage(self, operations):
+        """Return list of (bytes in memory, bytes in temporary file)
+        used by the data held by each operation which are not in the
+        document. Arrays held by several operations are only counted
+        for the first of them."""
+
+        seen = set()
+        out = []
+        for op in operations:
+            inmem = ondisk = 0
+            for arrid, m, d in self._arraySizes(op):
+                if arrid not in seen:
+                    seen.add(arrid)
+                    inmem += m
+                    ondisk += d
+            out.append((inmem, ondisk))
+        return out
+
+    def spill(self, operation, minbytes=SPILL_MIN_BYTES):
+        """Write large arrays in datasets held by operation, which are
+        not in the document, to the temporary file."""
+
+        key = id(operation)
+        if key in self.spilled:
+            return
+        changed = set()
+        for obj in self._heldObjects(operation):
+            if ( isinstance(obj, datasets.DatasetBase) and
+                 id(obj) not in self.live ):
+                for attr, val in _datasetArrays(obj):
+                    if ( isinstance(val, N.ndarray) and
+                         val.nbytes >= minbytes and
+                         not val.dtype.hasobject ):
+                        setattr(obj, attr, SpilledArray(val, self.spillfile))
+                        changed.add(id(obj))
+        self._invalidate(changed)
+        self.spilled.add(key)
+
+    def restore(self, operation):
+        """Read back any arrays held by operation in the temporary
+        file. The operation is forgotten, as it is about to be undone
+        or redone."""
+
+        changed = set()
+        for obj in self._heldObjects(operation):
+            if isinstance(obj, datasets.DatasetBase):
+                for attr, val in _datasetArrays(obj):
+                    if isinstance(val, SpilledArray):
+                        setattr(obj, attr, val.load())
+                        changed.add(id(obj))
+        self._invalidate(changed)
+        self.forget(operation)
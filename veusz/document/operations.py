@@ -46,6 +46,22 @@ def _(text, disambiguation=None, context="Operations"):
 ###############################################################################
 # Setting operations
 
+def _editableDataset(document, datasetname):
+    """Get dataset datasetname for editing in place.
+
+    Datasets keeping values in their native type may be read-only or
+    memory mapped, so are replaced by a normal dataset holding a copy
+    of the values. Returns (dataset, replaced dataset or None).
+    """
+    ds = document.data[datasetname]
+    if not isinstance(ds, datasets.DatasetNative):
+        return ds, None
+    newds = ds.returnCopy()
+    newds.linked = ds.linked
+    newds.tags = set(ds.tags)
+    document.setData(datasetname, newds)
+    return newds, ds
+
 class Operation(object):
     """Root class for operations."""
 
@@ -877,14 +893,18 @@ class OperationDatasetUnlinkByFile(Operation):
             if ds.linked is not None and ds.linked.filename == self.filename:
                 self.oldlinks[name] = ds.linked
                 ds.linked = None
+        document.modifiedDatasetNames(list(self.oldlinks))
 
     def undo(self, document):
         """Restore links."""
+        names = []
         for name, link in citems(self.oldlinks):
             try:
                 document.data[name].linked = link
+                names.append(name)
             except KeyError:
                 pass
+        document.modifiedDatasetNames(names)
 
 class OperationDatasetDeleteByFile(Operation):
     """Delete all datasets associated with file."""
@@ -929,11 +949,13 @@ class OperationDataTag(Operation):
             if self.tag not in existing:
                 existing.add(self.tag)
                 self.removetags.append(name)
+        document.modifiedDatasetNames(self.removetags)
 
     def undo(self, document):
         """Remove tags, if not previously present."""
         for name in self.removetags:
             document.data[name].tags.remove(self.tag)
+        document.modifiedDatasetNames(self.removetags)
 
 class OperationDataUntag(Operation):
     """Add a tag to a list of datasets."""
@@ -949,11 +971,13 @@ class OperationDataUntag(Operation):
         """Add new tags, if required."""
         for name in self.datasetnames:
             document.data[name].tags.remove(self.tag)
+        document.modifiedDatasetNames(self.datasetnames)
 
     def undo(self, document):
         """Remove tags, if not previously present."""
         for name in self.datasetnames:
             document.data[name].tags.add(self.tag)
+        document.modifiedDatasetNames(self.datasetnames)
 
 ###############################################################################
 # Alter dataset
@@ -973,7 +997,7 @@ class OperationDatasetAddColumn(Operation):
 
     def do(self, document):
         """Zero the column."""
-        ds = document.data[self.datasetname]
+        ds, self.olddataset = _editableDataset(document, self.datasetname)
         datacol = ds.data
         try:
             setattr(ds, self.columnname,
@@ -984,6 +1008,9 @@ class OperationDatasetAddColumn(Operation):
 
     def undo(self, document):
         """Remove the column."""
+        if self.olddataset is not None:
+            document.setData(self.datasetname, self.olddataset)
+            return
         ds = document.data[self.datasetname]
         setattr(ds, self.columnname, None)
         document.setData(self.datasetname, ds)
@@ -994,7 +1021,10 @@ class OperationDatasetSetVal(Operation):
     descr = _('change dataset value')
 
     def __init__(self, datasetname, columnname, row, val):
-        """Set row in column columnname to val."""
+        """Set row in column columnname to val.
+
+        row can also be a slice, in which case val is a sequence of
+        values to set in those rows."""
         self.datasetname = datasetname
         self.columnname = columnname
         self.row = row
@@ -1002,14 +1032,22 @@ class OperationDatasetSetVal(Operation):
 
     def do(self, document):
         """Set the value."""
-        ds = document.data[self.datasetname]
-        datacol = getattr(ds, self.columnname)
+        ds, self.olddataset = _editableDataset(document, self.datasetname)
+        # compact integer data may need converting to hold values
+        datacol = datasets.widenToFit(
+            getattr(ds, self.columnname), self.val)
         self.oldval = datacol[self.row]
+        if isinstance(self.oldval, N.ndarray):
+            # slices of arrays are views, so take a copy
+            self.oldval = self.oldval.copy()
         datacol[self.row] = self.val
         ds.changeValues(self.columnname, datacol)
 
     def undo(self, document):
         """Restore the value."""
+        if self.olddataset is not None:
+            document.setData(self.datasetname, self.olddataset)
+            return
         ds = document.data[self.datasetname]
         datacol = getattr(ds, self.columnname)
         datacol[self.row] = self.oldval
@@ -1030,6 +1068,7 @@ class OperationDatasetSetVal2D(Operation):
     def do(self, document):
         """Set the value."""
         ds = document.data[self.datasetname]
+        ds.data = datasets.widenToFit(ds.data, self.val)
         self.oldval = ds.data[self.row, self.col]
         ds.data[self.row, self.col] = self.val
         document.modifiedData(ds)
@@ -1053,11 +1092,14 @@ class OperationDatasetDeleteRow(Operation):
 
     def do(self, document):
         """Set the value."""
-        ds = document.data[self.datasetname]
+        ds, self.olddataset = _editableDataset(document, self.datasetname)
         self.saveddata = ds.deleteRows(self.row, self.numrows)
 
     def undo(self, document):
         """Restore the value."""
+        if self.olddataset is not None:
+            document.setData(self.datasetname, self.olddataset)
+            return
         ds = document.data[self.datasetname]
         ds.insertRows(self.row, self.numrows, self.saveddata)
 
@@ -1074,11 +1116,14 @@ class OperationDatasetInsertRow(Operation):
 
     def do(self, document):
         """Set the value."""
-        ds = document.data[self.datasetname]
+        ds, self.olddataset = _editableDataset(document, self.datasetname)
         ds.insertRows(self.row, self.numrows, {})
 
     def undo(self, document):
         """Restore the value."""
+        if self.olddataset is not None:
+            document.setData(self.datasetname, self.olddataset)
+            return
         ds = document.data[self.datasetname]
         ds.deleteRows(self.row, self.numrows)
 
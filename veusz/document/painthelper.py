@@ -234,6 +234,24 @@ class PaintHelper(object):
         """
         self._renderState(self.rootstate, painter)
 
+    def memoryUsage(self):
+        """Return approximate number of bytes used by recorded painting."""
+        if self.rootstate is None:
+            return 0
+        return self._stateMemoryUsage(self.rootstate)
+
+    def _stateMemoryUsage(self, state):
+        """Return memory used by state and its children."""
+        rec = state.record
+        if hasattr(rec, 'memoryUsage'):
+            total = rec.memoryUsage()
+        else:
+            # QPicture fallback
+            total = rec.size()
+        for child in state.children:
+            total += self._stateMemoryUsage(child)
+        return total
+
     def _renderState(self, state, painter, indent=0):
         """Render state to painter."""
 
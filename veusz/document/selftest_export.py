@@ -34,8 +34,8 @@ class SelfTestPaintEngine(svg_export.SVGPaintEngine):
 
         text = textitem.text().encode('ascii', 'xmlcharrefreplace').decode(
             'ascii')
-        svg_export.SVGElement(
-            self.celement, 'text',
+        self.addElement(
+            'text',
             'x="%s" y="%s" font-size="%gpt" fill="%s"' % (
                 svg_export.fltStr(pt.x()),
                 svg_export.fltStr(pt.y()),
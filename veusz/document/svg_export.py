@@ -24,6 +24,7 @@ import re
 
 from ..compat import crange, cbytes
 from .. import qtall as qt
+from ..helpers.qtloops import svgPathString
 
 # physical sizes
 inch_mm = 25.4
@@ -63,14 +64,20 @@ def escapeXML(text):
     text = text.replace(u'\ue001', '&amp;')
     return text
 
+# paths with more elements than this are converted using native code
+native_path_elements = 256
+
 def createPath(path, scale):
     """Convert qt path to svg path.
 
     We use relative coordinates to make the file size smaller and help
     compression
     """
-    p = []
     count = path.elementCount()
+    if count > native_path_elements:
+        return svgPathString(path, scale)
+
+    p = []
     i = 0
     ox, oy = 0, 0
     while i < count:
@@ -135,10 +142,89 @@ class SVGElement(object):
             # simple close tag if not children or text
             fileobj.write('/>\n')
 
+class SVGStreamWriter(object):
+    """Write SVG elements directly to the output file.
+
+    This avoids building the whole tree of elements in memory. Groups
+    are only written when something is added to them, so empty groups
+    are dropped. Writing the end of a group is delayed until something
+    else is written, so that if an identical group is opened again in
+    the same place, the two groups are merged.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        # list of [attrb, written] for open groups
+        self.groups = []
+        # attributes of closed groups where the end tag has not been
+        # written, from the outside in, and the depth of the first
+        self.unclosed = []
+        self.unclosed_depth = 0
+
+    def pushGroup(self, attrb):
+        """Open a new group with the attributes given."""
+        if ( self.unclosed and self.unclosed[0] == attrb and
+             self.unclosed_depth == len(self.groups) ):
+            # reopen group which has just been closed
+            del self.unclosed[0]
+            self.unclosed_depth += 1
+            self.groups.append([attrb, True])
+        else:
+            self.groups.append([attrb, False])
+
+    def popGroup(self):
+        """Close the current group."""
+        attrb, written = self.groups.pop()
+        if written:
+            self.unclosed.insert(0, attrb)
+            self.unclosed_depth = len(self.groups)
+
+    def groupAttrb(self):
+        """Attributes of the current group (or None)."""
+        return self.groups[-1][0] if self.groups else None
+
+    def addElement(self, eltype, attrb, text=None):
+        """Write element to the current group."""
+        write = self.fileobj.write
+        self._writeUnclosed()
+
+        # write any groups not yet written
+        for grp in self.groups:
+            if not grp[1]:
+                write('<g %s>\n' % grp[0])
+                grp[1] = True
+
+        write('<%s' % eltype)
+        if attrb:
+            write(' ' + attrb)
+        if text:
+            write('>%s</%s>\n' % (text, eltype))
+        else:
+            write('/>\n')
+
+    def finish(self):
+        """Close all the groups."""
+        while self.groups:
+            self.popGroup()
+        self._writeUnclosed()
+
+    def _writeUnclosed(self):
+        """Write end tags for closed groups."""
+        self.fileobj.write('</g>\n' * len(self.unclosed))
+        self.unclosed = []
+
 class SVGPaintEngine(qt.QPaintEngine):
-    """Paint engine class for writing to svg files."""
+    """Paint engine class for writing to svg files.
 
-    def __init__(self, writetextastext=False):
+    If streaming is set, elements are written as they are drawn,
+    rather than building a tree of elements in memory and writing it
+    at the end. This uses much less memory for large plots.
+    """
+
+    # maximum number of paths to remember for reuse when streaming
+    stream_path_cache = 4096
+
+    def __init__(self, writetextastext=False, streaming=False):
         qt.QPaintEngine.__init__(
             self,
             qt.QPaintEngine.Antialiasing |
@@ -151,6 +237,7 @@ class SVGPaintEngine(qt.QPaintEngine):
 
         self.imageformat = 'png'
         self.writetextastext = writetextastext
+        self.streaming = streaming
 
     def begin(self, paintdevice):
         """Start painting."""
@@ -178,12 +265,28 @@ class SVGPaintEngine(qt.QPaintEngine):
         # definitions, for clips, etc.
         self.defs = SVGElement(self.rootelement, 'defs', '')
 
-        # this is where all the drawing goes
-        self.celement = SVGElement(
-            self.rootelement, 'g',
+        rootgroupattrb = (
             'stroke-linejoin="bevel" stroke-linecap="square" '
             'stroke="#000000" fill-rule="evenodd"')
 
+        if self.streaming:
+            # write the start of the document now, leaving the
+            # definitions until the end, as they are only known then
+            self.rootelement.children.remove(self.defs)
+            self._writeHeader()
+            fileobj = self.device.fileobj
+            fileobj.write('<svg %s>\n' % self.rootelement.attrb)
+            for c in self.rootelement.children:
+                c.write(fileobj)
+            self.streamwriter = SVGStreamWriter(fileobj)
+            self.streamwriter.pushGroup(rootgroupattrb)
+            self.celement = None
+        else:
+            self.streamwriter = None
+            # this is where all the drawing goes
+            self.celement = SVGElement(
+                self.rootelement, 'g', rootgroupattrb)
+
         # previous transform, stroke and clip states
         self.oldstate = [None, None, None]
 
@@ -222,19 +325,71 @@ class SVGPaintEngine(qt.QPaintEngine):
 
         recursive(self.rootelement)
 
-    def end(self):
-        self.pruneEmptyGroups()
+    def _writeHeader(self):
+        """Write XML header to output file."""
+        self.device.fileobj.write(
+            '<?xml version="1.0" standalone="no"?>\n'
+            '<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"\n'
+            '  "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n')
 
+    def end(self):
         fileobj = self.device.fileobj
-        fileobj.write('<?xml version="1.0" standalone="no"?>\n'
-                      '<!DOCTYPE svg PUBLIC "-//W3C//DTD SVG 1.1//EN"\n'
-                      '  "http://www.w3.org/Graphics/SVG/1.1/DTD/svg11.dtd">\n')
+
+        if self.streaming:
+            self.streamwriter.finish()
+            if self.defs.children:
+                self.defs.write(fileobj)
+            fileobj.write('</svg>\n')
+            return True
+
+        self.pruneEmptyGroups()
+        self._writeHeader()
 
         # write all the elements
         self.rootelement.write(fileobj)
 
         return True
 
+    def addElement(self, eltype, attrb, text=None):
+        """Add an element to the current group.
+
+        Returns the element if it is kept in memory, otherwise None.
+        """
+        if self.streamwriter is not None:
+            self.streamwriter.addElement(eltype, attrb, text=text)
+            return None
+        return SVGElement(self.celement, eltype, attrb, text=text)
+
+    def _addElementToParent(self, eltype, attrb):
+        """Add an element to the parent of the current group."""
+        if self.streamwriter is not None:
+            grpattrb = self.streamwriter.groupAttrb()
+            self.streamwriter.popGroup()
+            self.streamwriter.addElement(eltype, attrb)
+            self.streamwriter.pushGroup(grpattrb)
+        else:
+            SVGElement(self.celement.parent, eltype, attrb)
+
+    def _groupAttrb(self):
+        """Get attributes of the current group."""
+        if self.streamwriter is not None:
+            return self.streamwriter.groupAttrb()
+        return self.celement.attrb
+
+    def _pushGroup(self, attrb):
+        """Start a new group inside the current one."""
+        if self.streamwriter is not None:
+            self.streamwriter.pushGroup(attrb)
+        else:
+            self.celement = SVGElement(self.celement, 'g', attrb)
+
+    def _popGroup(self):
+        """Go back to the parent of the current group."""
+        if self.streamwriter is not None:
+            self.streamwriter.popGroup()
+        else:
+            self.celement = self.celement.parent
+
     def _updateClipPath(self, clippath, clipoperation):
         """Update clip path given state change."""
 
@@ -285,13 +440,12 @@ class SVGPaintEngine(qt.QPaintEngine):
         # go back up the tree the required number of times
         for i in crange(pop):
             if self.oldstate[i]:
-                self.celement = self.celement.parent
+                self._popGroup()
 
         # create new elements for changed states
         for i in crange(pop-1, -1, -1):
             if statevec[i]:
-                self.celement = SVGElement(
-                    self.celement, 'g', ' '.join(statevec[i]))
+                self._pushGroup(' '.join(statevec[i]))
 
         self.oldstate = statevec
 
@@ -401,21 +555,28 @@ class SVGPaintEngine(qt.QPaintEngine):
                 num = self.pathcacheidx
                 self.pathcacheidx += 1
                 self.pathcache[attrb] = element, num
-                # add an id attribute
-                element.attrb += ' id="p%i"' % num
+                if element is None:
+                    # already written when streaming, so add a copy
+                    # to the definitions
+                    SVGElement(self.defs, 'path', '%s id="p%i"' % (attrb, num))
+                else:
+                    # add an id attribute
+                    element.attrb += ' id="p%i"' % num
 
             # if the parent is a translation, swallow this into the use element
             m = re.match('transform="translate\(([-0-9.]+),([-0-9.]+)\)"',
-                         self.celement.attrb)
+                         self._groupAttrb())
             if m:
-                SVGElement(self.celement.parent, 'use',
-                           'xlink:href="#p%i" x="%s" y="%s"' % (
+                self._addElementToParent(
+                    'use', 'xlink:href="#p%i" x="%s" y="%s"' % (
                         num, m.group(1), m.group(2)))
             else:
-                SVGElement(self.celement, 'use', 'xlink:href="#p%i"' % num)
+                self.addElement('use', 'xlink:href="#p%i"' % num)
         else:
-            pathel = SVGElement(self.celement, 'path', attrb)
-            self.pathcache[attrb] = [pathel, None]
+            pathel = self.addElement('path', attrb)
+            if ( self.streamwriter is None or
+                 len(self.pathcache) < self.stream_path_cache ):
+                self.pathcache[attrb] = [pathel, None]
 
     def drawTextItem(self, pt, textitem):
         """Convert text to a path and draw it.
@@ -442,9 +603,7 @@ class SVGPaintEngine(qt.QPaintEngine):
             if font.bold():
                 grpattrb.append('font-weight="bold"')
 
-            grp = SVGElement(
-                self.celement, 'g',
-                ' '.join(grpattrb) )
+            self._pushGroup(' '.join(grpattrb))
 
             text = escapeXML( textitem.text() )
 
@@ -459,18 +618,16 @@ class SVGPaintEngine(qt.QPaintEngine):
                 textattrb.append('xml:space="preserve"')
 
             # write as an SVG text element
-            SVGElement(
-                grp, 'text',
-                ' '.join(textattrb),
-                text=text )
+            self.addElement('text', ' '.join(textattrb), text=text)
+            self._popGroup()
 
         else:
             # convert to a path
             path = qt.QPainterPath()
             path.addText(pt, textitem.font(), textitem.text())
             p = createPath(path, self.scale)
-            SVGElement(
-                self.celement, 'path',
+            self.addElement(
+                'path',
                 'd="%s" fill="%s" stroke="none" fill-opacity="%.3g"' % (
                     p, self.pen.color().name(), self.pen.color().alphaF()) )
 
@@ -484,7 +641,7 @@ class SVGPaintEngine(qt.QPaintEngine):
                 fltStr((line.x2()-line.x1())*self.scale),
                 fltStr((line.y2()-line.y1())*self.scale))
             paths.append(path)
-        SVGElement(self.celement, 'path', 'd="%s"' % ''.join(paths))
+        self.addElement('path', 'd="%s"' % ''.join(paths))
 
     def drawPolygon(self, points, mode):
         """Draw polygon on output."""
@@ -493,31 +650,31 @@ class SVGPaintEngine(qt.QPaintEngine):
             pts.append( '%s,%s' % (fltStr(p.x()*self.scale), fltStr(p.y()*self.scale)) )
 
         if mode == qt.QPaintEngine.PolylineMode:
-            SVGElement(self.celement, 'polyline',
-                       'fill="none" points="%s"' % ' '.join(pts))
+            self.addElement('polyline',
+                            'fill="none" points="%s"' % ' '.join(pts))
 
         else:
             attrb = 'points="%s"' % ' '.join(pts)
             if mode == qt.Qt.WindingFill:
                 attrb += ' fill-rule="nonzero"'
-            SVGElement(self.celement, 'polygon', attrb)
+            self.addElement('polygon', attrb)
 
     def drawEllipse(self, rect):
         """Draw an ellipse to the svg file."""
-        SVGElement(self.celement, 'ellipse',
-                   'cx="%s" cy="%s" rx="%s" ry="%s"' %
-                   (fltStr(rect.center().x()*self.scale),
-                    fltStr(rect.center().y()*self.scale),
-                    fltStr(rect.width()*0.5*self.scale),
-                    fltStr(rect.height()*0.5*self.scale)))
+        self.addElement('ellipse',
+                        'cx="%s" cy="%s" rx="%s" ry="%s"' %
+                        (fltStr(rect.center().x()*self.scale),
+                         fltStr(rect.center().y()*self.scale),
+                         fltStr(rect.width()*0.5*self.scale),
+                         fltStr(rect.height()*0.5*self.scale)))
 
     def drawPoints(self, points):
         """Draw points."""
         for pt in points:
             x, y = fltStr(pt.x()*self.scale), fltStr(pt.y()*self.scale)
-            SVGElement(self.celement, 'line',
-                       ('x1="%s" y1="%s" x2="%s" y2="%s" '
-                        'stroke-linecap="round"') % (x, y, x, y))
+            self.addElement('line',
+                            ('x1="%s" y1="%s" x2="%s" y2="%s" '
+                             'stroke-linecap="round"') % (x, y, x, y))
 
     def drawImage(self, r, img, sr, flags):
         """Draw image.
@@ -543,7 +700,7 @@ class SVGPaintEngine(qt.QPaintEngine):
                   'xlink:href="data:image/%s;base64,' % self.imageformat,
                   cbytes(data.toBase64()).decode('ascii'),
                   '" preserveAspectRatio="none"' ]
-        SVGElement(self.celement, 'image', ''.join(attrb))
+        self.addElement('image', ''.join(attrb))
 
     def type(self):
         """A random number for the engine."""
@@ -554,17 +711,20 @@ class SVGPaintDevice(qt.QPaintDevice):
 
     dpi is the real output DPI (unscaled)
     scale is a scaling value to apply to outputted values
+    streaming writes elements as they are drawn (see SVGPaintEngine)
     """
 
     def __init__(self, fileobj, width_in, height_in,
-                 writetextastext=False, dpi=90, scale=0.1):
+                 writetextastext=False, dpi=90, scale=0.1,
+                 streaming=False):
         qt.QPaintDevice.__init__(self)
         self.fileobj = fileobj
         self.width = width_in
         self.height = height_in
         self.scale = scale
         self.sdpi = dpi/scale
-        self.engine = SVGPaintEngine(writetextastext=writetextastext)
+        self.engine = SVGPaintEngine(
+            writetextastext=writetextastext, streaming=streaming)
 
     def paintEngine(self):
         return self.engine
@@ -124,3 +124,83 @@ void rollingAverage(const Numpy1DObj& indata,
 	out[i] = std::numeric_limits<double>::quiet_NaN();
     }
 }
+
+namespace
+{
+  // keep track of minimum and maximum of values
+  struct MinMax
+  {
+    MinMax(bool _positive)
+      : positive(_positive),
+	minval(std::numeric_limits<double>::infinity()),
+	maxval(-std::numeric_limits<double>::infinity()),
+	any(false)
+    {}
+
+    inline void add(double v)
+    {
+      if( isFinite(v) && (!positive || v > 0) )
+	{
+	  if( v < minval ) minval = v;
+	  if( v > maxval ) maxval = v;
+	  any = true;
+	}
+    }
+
+    bool positive;
+    double minval, maxval;
+    bool any;
+  };
+
+  // value of error array at index, or 0 if missing
+  inline double errVal(const Numpy1DObj* err, int i)
+  {
+    return (err != 0 && i < err->dim) ? (*err)(i) : 0.;
+  }
+}
+
+bool dataRange(const Numpy1DObj& data,
+	       const Numpy1DObj* serr, const Numpy1DObj* nerr,
+	       const Numpy1DObj* perr,
+	       bool combined, bool positive,
+	       double* minval, double* maxval)
+{
+  MinMax range(positive);
+  const int size = data.dim;
+
+  if( combined )
+    {
+      // separate ranges for lower and upper values
+      MinMax upper(positive);
+      for(int i=0; i<size; ++i)
+	{
+	  const double d = data(i);
+	  const double s = errVal(serr, i);
+	  range.add(d - s + errVal(nerr, i));
+	  upper.add(d + s + errVal(perr, i));
+	}
+      *minval = range.minval;
+      *maxval = upper.maxval;
+      return range.any && upper.any;
+    }
+  else
+    {
+      for(int i=0; i<size; ++i)
+	{
+	  const double d = data(i);
+	  range.add(d);
+	  if( serr != 0 && i < serr->dim )
+	    {
+	      range.add(d - (*serr)(i));
+	      range.add(d + (*serr)(i));
+	    }
+	  if( nerr != 0 && i < nerr->dim )
+	    range.add(d + (*nerr)(i));
+	  if( perr != 0 && i < perr->dim )
+	    range.add(d + (*perr)(i));
+	}
+      *minval = range.minval;
+      *maxval = range.maxval;
+      return range.any;
+    }
+}
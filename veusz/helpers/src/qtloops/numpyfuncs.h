@@ -35,4 +35,18 @@ void rollingAverage(const Numpy1DObj& indata,
 		    int width,
 		    int* numoutbins, double** outdata);
 
+// find range of finite values of data, including errors (which are
+// optional) in a single pass
+// if combined, the errors are summed for each point, giving
+//   data-serr+nerr and data+serr+perr
+// otherwise each is considered separately, giving
+//   data, data-serr, data+serr, data+nerr and data+perr
+// if positive, only values > 0 are included
+// returns false if there are no values
+bool dataRange(const Numpy1DObj& data,
+	       const Numpy1DObj* serr, const Numpy1DObj* nerr,
+	       const Numpy1DObj* perr,
+	       bool combined, bool positive,
+	       double* minval, double* maxval);
+
 #endif
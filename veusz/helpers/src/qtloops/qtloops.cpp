@@ -22,6 +22,10 @@
 #include "polygonclip.h"
 
 #include <math.h>
+#include <stdio.h>
+#include <algorithm>
+#include <stdlib.h>
+#include <string.h>
 
 #include <QPointF>
 #include <QVector>
@@ -29,6 +33,9 @@
 #include <QPen>
 #include <QTransform>
 #include <QColor>
+#include <QByteArray>
+#include <QtMath>
+#include <QString>
 
 namespace
 {
@@ -308,6 +315,118 @@ void plotBoxesToPainter(QPainter& painter,
     painter.drawRects(rects);
 }
 
+namespace
+{
+  // largest distance of path from origin along either axis
+  qreal pathExtent(const QPainterPath& path)
+  {
+    if( path.isEmpty() )
+      return 0;
+    const QRectF r = path.boundingRect();
+    return std::max( std::max(fabs(r.left()), fabs(r.right())),
+		     std::max(fabs(r.top()), fabs(r.bottom())) );
+  }
+
+  // draw head path at origin of transformation, scaling path by scale
+  void drawArrowHead(QPainter& painter, const QTransform& trans,
+		     const QPainterPath& path, bool fill,
+		     const Numpy1DObj* scaling, int i)
+  {
+    if( path.isEmpty() )
+      return;
+
+    painter.setWorldTransform(trans);
+    if( ! fill )
+      painter.setBrush(Qt::NoBrush);
+    if( scaling == 0 )
+      painter.drawPath(path);
+    else
+      {
+	QPainterPath scaled;
+	scalePath(path, (*scaling)(i), scaled);
+	painter.drawPath(scaled);
+      }
+  }
+}
+
+void plotArrowsToPainter(QPainter& painter,
+			 const Numpy1DObj& x, const Numpy1DObj& y,
+			 const Numpy1DObj& length, const Numpy1DObj& angle,
+			 const Numpy1DObj* scaling,
+			 const QPainterPath& frontpath, bool frontfill,
+			 const QPainterPath& backpath, bool backfill,
+			 const QRectF* clip)
+{
+  int size = min(x.dim, y.dim, length.dim, angle.dim);
+  if( scaling != 0 )
+    size = min(size, scaling->dim);
+
+  const qreal lw = painter.pen().widthF();
+  const qreal headext = std::max(pathExtent(frontpath),
+				 pathExtent(backpath));
+
+  QRectF cliprect( QPointF(-32767,-32767), QPointF(32767,32767) );
+  if( clip != 0 )
+    {
+      qreal x1, y1, x2, y2;
+      clip->getCoords(&x1, &y1, &x2, &y2);
+      cliprect.setCoords(x1, y1, x2, y2);
+    }
+  // lines are clipped to rectangle expanded by line width
+  const QRectF lineclip(cliprect.adjusted(-lw, -lw, lw, lw));
+
+  const QTransform origtrans(painter.worldTransform());
+  const QBrush origbrush(painter.brush());
+
+  QVector<QLineF> lines;
+  for(int i = 0; i < size; ++i)
+    {
+      const qreal l = length(i);
+      const qreal a = angle(i);
+      if( l == 0 || ! isFinite(l) || ! isFinite(a) ||
+	  ! isFinite(x(i)) || ! isFinite(y(i)) )
+	continue;
+
+      const qreal arad = qDegreesToRadians(a);
+      QPointF pt1(x(i), y(i));
+      QPointF pt2(pt1.x() + l*cos(arad), pt1.y() + l*sin(arad));
+
+      // skip arrows entirely outside clipping region
+      const qreal ext = lw + 1 +
+	headext*(scaling == 0 ? 1 : fabs((*scaling)(i)));
+      const QRectF bounds = QRectF(pt1, pt2).normalized().adjusted(
+	-ext, -ext, ext, ext);
+      if( ! cliprect.intersects(bounds) )
+	continue;
+
+      // head at end of line
+      QTransform trans(origtrans);
+      trans.translate(pt1.x(), pt1.y());
+      trans.rotate(a);
+      QTransform fronttrans(trans);
+      fronttrans.translate(l, 0);
+      drawArrowHead(painter, fronttrans, frontpath, frontfill, scaling, i);
+
+      // reversed head at start of line
+      QTransform backtrans(trans);
+      backtrans.scale(-1, 1);
+      drawArrowHead(painter, backtrans, backpath, backfill, scaling, i);
+      painter.setBrush(origbrush);
+
+      if( clipLine(lineclip, pt1, pt2) )
+	lines << QLineF(pt1, pt2);
+    }
+
+  painter.setWorldTransform(origtrans);
+
+  // lines are drawn without caps, so they finish at the heads
+  QPen pen(painter.pen());
+  pen.setCapStyle(Qt::FlatCap);
+  painter.setPen(pen);
+  if( ! lines.isEmpty() )
+    painter.drawLines(lines);
+}
+
 void addCubicsToPainterPath(QPainterPath& path, const QPolygonF& poly)
 {
   QPointF lastpt(-999999, -999999);
@@ -511,3 +630,88 @@ QImage resampleLinearImage(QImage& img,
 
   return outimg;
 }
+
+namespace
+{
+  // Append float to string with a maximum of 2 decimal places,
+  // removing trailing zeros. This gives the same results as
+  // svg_export.fltStr, including its rounding.
+  void appendFltStr(QByteArray& out, double v)
+  {
+    char buf[64];
+
+    // round to 4 decimal places (correctly rounded, as Python)
+    snprintf(buf, sizeof(buf), "%.4f", v);
+    v = strtod(buf, 0);
+
+    // take first 12 characters of 20 width string
+    snprintf(buf, sizeof(buf), "% 20.10f", v);
+    int end = std::min(int(strlen(buf)), 12);
+
+    // strip trailing zeros, leading spaces and trailing point
+    while(end>0 && buf[end-1]=='0')
+      --end;
+    int start = 0;
+    while(start<end && buf[start]==' ')
+      ++start;
+    if(end>start && buf[end-1]=='.')
+      --end;
+
+    if(end-start==2 && buf[start]=='-' && buf[start+1]=='0')
+      out.append('0');
+    else
+      out.append(buf+start, end-start);
+  }
+}
+
+QString svgPathString(const QPainterPath& path, double scale)
+{
+  QByteArray out;
+  const int count = path.elementCount();
+  out.reserve(count*16);
+
+  double ox=0, oy=0;
+  for(int i=0; i<count; ++i)
+    {
+      const QPainterPath::Element& e = path.elementAt(i);
+      const double nx = e.x*scale;
+      const double ny = e.y*scale;
+      switch(e.type)
+        {
+        case QPainterPath::MoveToElement:
+        case QPainterPath::LineToElement:
+          out.append(e.type == QPainterPath::MoveToElement ? 'm' : 'l');
+          appendFltStr(out, nx-ox);
+          out.append(',');
+          appendFltStr(out, ny-oy);
+          ox = nx; oy = ny;
+          break;
+        case QPainterPath::CurveToElement:
+          {
+            if(i+2 >= count)
+              return QString::fromLatin1(out);
+            const QPainterPath::Element& e1 = path.elementAt(i+1);
+            const QPainterPath::Element& e2 = path.elementAt(i+2);
+            out.append('c');
+            appendFltStr(out, nx-ox);
+            out.append(',');
+            appendFltStr(out, ny-oy);
+            out.append(',');
+            appendFltStr(out, e1.x*scale-ox);
+            out.append(',');
+            appendFltStr(out, e1.y*scale-oy);
+            out.append(',');
+            appendFltStr(out, e2.x*scale-ox);
+            out.append(',');
+            appendFltStr(out, e2.y*scale-oy);
+            ox = e2.x*scale; oy = e2.y*scale;
+            i += 2;
+          }
+          break;
+        default:
+          break;
+        }
+    }
+
+  return QString::fromLatin1(out);
+}
@@ -64,6 +64,19 @@ void plotBoxesToPainter(QPainter& painter,
 			const Numpy1DObj& x2, const Numpy1DObj& y2,
 			const QRectF* clip = 0, bool autoexpand = true);
 
+// plot lines with optional heads at each end
+// lines start at x, y, with length and angle (degrees) given
+// frontpath is drawn at the end of the line and backpath, reflected,
+// at the start, optionally scaling the paths by scaling
+// arrows entirely outside clip are not drawn
+void plotArrowsToPainter(QPainter& painter,
+			 const Numpy1DObj& x, const Numpy1DObj& y,
+			 const Numpy1DObj& length, const Numpy1DObj& angle,
+			 const Numpy1DObj* scaling,
+			 const QPainterPath& frontpath, bool frontfill,
+			 const QPainterPath& backpath, bool backfill,
+			 const QRectF* clip = 0);
+
 // add polygon to painter path as a cubic
 void addCubicsToPainterPath(QPainterPath& path, const QPolygonF& poly);
 
@@ -75,4 +88,8 @@ void applyImageTransparancy(QImage& img, const Numpy2DObj& data);
 QImage resampleLinearImage(QImage& img,
 			   const Numpy1DObj& xpts, const Numpy1DObj& ypts);
 
+// convert path to SVG path data with relative coordinates, scaling
+// by scale (matches svg_export.createPath)
+QString svgPathString(const QPainterPath& path, double scale);
+
 #endif
@@ -0,0 +1,450 @@
+//    Copyright (C) 2018 Jeremy S. Sanders
+//    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+//
+//    This program is free software; you can redistribute it and/or modify
+//    it under the terms of the GNU General Public License as published by
+//    the Free Software Foundation; either version 2 of the License, or
+//    (at your option) any later version.
+//
+//    This program is distributed in the hope that it will be useful,
+//    but WITHOUT ANY WARRANTY; without even the implied warranty of
+//    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//    GNU General Public License for more details.
+//
+//    You should have received a copy of the GNU General Public License along
+//    with this program; if not, write to the Free Software Foundation, Inc.,
+//    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+/////////////////////////////////////////////////////////////////////////////
+
+#include <QTransform>
+#include <QPaintDevice>
+#include "paintbuffer.h"
+
+namespace
+{
+  // types of command in buffer
+  enum Command
+    {
+      CMD_ELLIPSE, CMD_ELLIPSEF, CMD_IMAGE, CMD_LINES, CMD_LINESF,
+      CMD_PATH, CMD_PIXMAP, CMD_POINTS, CMD_POINTSF, CMD_POLYGON,
+      CMD_POLYGONF, CMD_RECTS, CMD_RECTSF, CMD_TEXT, CMD_TILEDPIXMAP,
+
+      CMD_PEN, CMD_BRUSH, CMD_BRUSHORIGIN, CMD_FONT, CMD_BACKGROUND,
+      CMD_BACKGROUNDMODE, CMD_TRANSFORM, CMD_CLIPREGION, CMD_CLIPPATH,
+      CMD_HINTS, CMD_COMPOSITION, CMD_CLIPENABLED
+    };
+
+  // how many recent items to look at when interning
+  const int INTERN_SEARCH = 16;
+
+  // return index of item in vector, adding if not found in the last
+  // few items
+  template<class T> quint32 intern(QVector<T>& vec, const T& item)
+  {
+    const int size = vec.size();
+    for(int i=size-1; i>=0 && i>=size-INTERN_SEARCH; --i)
+      if(vec[i] == item)
+        return i;
+    vec.push_back(item);
+    return size;
+  }
+
+  template<class T> quint32 store(QVector<T>& vec, const T& item)
+  {
+    vec.push_back(item);
+    return vec.size()-1;
+  }
+
+  // read items back from the buffer
+  class BufferReader
+  {
+  public:
+    BufferReader(const quint64* ptr)
+      : _ptr(ptr)
+    {}
+
+    // get pointer to array of items and move past
+    template<class T> const T* array(quint32 count)
+    {
+      const T* items = reinterpret_cast<const T*>(_ptr);
+      _ptr += (sizeof(T)*size_t(count)+sizeof(quint64)-1)/sizeof(quint64);
+      return items;
+    }
+
+    template<class T> T item()
+    {
+      T val;
+      std::memcpy(&val, _ptr, sizeof(T));
+      _ptr += (sizeof(T)+sizeof(quint64)-1)/sizeof(quint64);
+      return val;
+    }
+
+    const quint64* ptr() const { return _ptr; }
+
+  private:
+    const quint64* _ptr;
+  };
+
+  // matrix of transform, for storing in buffer
+  struct TransformVals
+  {
+    qreal m[9];
+  };
+}
+
+PaintBuffer::PaintBuffer(int dpi)
+  : _dpi(dpi)
+{
+}
+
+void PaintBuffer::addEllipse(const QRectF& rect)
+{
+  addCommand(CMD_ELLIPSEF);
+  addItem(rect);
+}
+
+void PaintBuffer::addEllipse(const QRect& rect)
+{
+  addCommand(CMD_ELLIPSE);
+  addItem(rect);
+}
+
+void PaintBuffer::addImage(const QRectF& rect, const QImage& image,
+                           const QRectF& sr, Qt::ImageConversionFlags flags)
+{
+  addCommand(CMD_IMAGE, store(_images, image));
+  addItem(rect);
+  addItem(sr);
+  addItem(quint32(flags));
+}
+
+void PaintBuffer::addLines(const QLineF* lines, int count)
+{
+  addCommand(CMD_LINESF, count);
+  addArray(lines, count);
+}
+
+void PaintBuffer::addLines(const QLine* lines, int count)
+{
+  addCommand(CMD_LINES, count);
+  addArray(lines, count);
+}
+
+void PaintBuffer::addPath(const QPainterPath& path)
+{
+  addCommand(CMD_PATH, intern(_paths, path));
+}
+
+void PaintBuffer::addPixmap(const QRectF& r, const QPixmap& pm,
+                            const QRectF& sr)
+{
+  addCommand(CMD_PIXMAP, store(_pixmaps, pm));
+  addItem(r);
+  addItem(sr);
+}
+
+void PaintBuffer::addPoints(const QPointF* points, int count)
+{
+  addCommand(CMD_POINTSF, count);
+  addArray(points, count);
+}
+
+void PaintBuffer::addPoints(const QPoint* points, int count)
+{
+  addCommand(CMD_POINTS, count);
+  addArray(points, count);
+}
+
+void PaintBuffer::addPolygon(const QPointF* points, int count,
+                             QPaintEngine::PolygonDrawMode mode)
+{
+  addCommand(CMD_POLYGONF, count);
+  addItem(quint32(mode));
+  addArray(points, count);
+}
+
+void PaintBuffer::addPolygon(const QPoint* points, int count,
+                             QPaintEngine::PolygonDrawMode mode)
+{
+  addCommand(CMD_POLYGON, count);
+  addItem(quint32(mode));
+  addArray(points, count);
+}
+
+void PaintBuffer::addRects(const QRectF* rects, int count)
+{
+  addCommand(CMD_RECTSF, count);
+  addArray(rects, count);
+}
+
+void PaintBuffer::addRects(const QRect* rects, int count)
+{
+  addCommand(CMD_RECTS, count);
+  addArray(rects, count);
+}
+
+void PaintBuffer::addText(const QPointF& pt, const QString& text)
+{
+  addCommand(CMD_TEXT, store(_texts, text));
+  addItem(pt);
+}
+
+void PaintBuffer::addTiledPixmap(const QRectF& rect, const QPixmap& pixmap,
+                                 const QPointF& pt)
+{
+  addCommand(CMD_TILEDPIXMAP, store(_pixmaps, pixmap));
+  addItem(rect);
+  addItem(pt);
+}
+
+void PaintBuffer::addState(const QPaintEngineState& state)
+{
+  // we add a new command for each change of state
+  const int flags = state.state();
+  if( flags & QPaintEngine::DirtyPen )
+    addCommand(CMD_PEN, intern(_pens, state.pen()));
+  if( flags & QPaintEngine::DirtyBrush )
+    addCommand(CMD_BRUSH, intern(_brushes, state.brush()));
+  if( flags & QPaintEngine::DirtyBrushOrigin )
+    {
+      addCommand(CMD_BRUSHORIGIN);
+      addItem(state.brushOrigin());
+    }
+  if( flags & QPaintEngine::DirtyFont )
+    addCommand(CMD_FONT, intern(_fonts, state.font()));
+  if( flags & QPaintEngine::DirtyBackground )
+    addCommand(CMD_BACKGROUND, intern(_brushes, state.backgroundBrush()));
+  if( flags & QPaintEngine::DirtyBackgroundMode )
+    addCommand(CMD_BACKGROUNDMODE, quint32(state.backgroundMode()));
+  if( flags & QPaintEngine::DirtyTransform )
+    {
+      const QTransform t(state.transform());
+      const TransformVals vals =
+        {{ t.m11(), t.m12(), t.m13(),
+           t.m21(), t.m22(), t.m23(),
+           t.m31(), t.m32(), t.m33() }};
+      addCommand(CMD_TRANSFORM);
+      addItem(vals);
+    }
+  if( flags & QPaintEngine::DirtyClipRegion )
+    {
+      addCommand(CMD_CLIPREGION, store(_regions, state.clipRegion()));
+      addItem(quint32(state.clipOperation()));
+    }
+  if( flags & QPaintEngine::DirtyClipPath )
+    {
+      addCommand(CMD_CLIPPATH, intern(_paths, state.clipPath()));
+      addItem(quint32(state.clipOperation()));
+    }
+  if( flags & QPaintEngine::DirtyHints )
+    addCommand(CMD_HINTS, quint32(state.renderHints()));
+  if( flags & QPaintEngine::DirtyCompositionMode )
+    addCommand(CMD_COMPOSITION, quint32(state.compositionMode()));
+  if( flags & QPaintEngine::DirtyClipEnabled )
+    addCommand(CMD_CLIPENABLED, state.isClipEnabled());
+}
+
+void PaintBuffer::squeeze()
+{
+  // avoid the overhead of the vector doubling in size
+  std::vector<Word>(_buf).swap(_buf);
+  _pens.squeeze();
+  _brushes.squeeze();
+  _fonts.squeeze();
+  _paths.squeeze();
+  _regions.squeeze();
+  _images.squeeze();
+  _pixmaps.squeeze();
+  _texts.squeeze();
+}
+
+void PaintBuffer::play(QPainter& painter) const
+{
+  if(_buf.empty())
+    return;
+
+  const QTransform origtransform(painter.worldTransform());
+
+  BufferReader reader(&_buf[0]);
+  const Word* end = &_buf[0] + _buf.size();
+  while(reader.ptr() < end)
+    {
+      const Word header = reader.item<Word>();
+      const unsigned cmd = unsigned(header & 0xffffffff);
+      const quint32 arg = quint32(header >> 32);
+
+      switch(cmd)
+        {
+        case CMD_ELLIPSE:
+          painter.drawEllipse(reader.item<QRect>());
+          break;
+        case CMD_ELLIPSEF:
+          painter.drawEllipse(reader.item<QRectF>());
+          break;
+        case CMD_IMAGE:
+          {
+            const QRectF rect(reader.item<QRectF>());
+            const QRectF sr(reader.item<QRectF>());
+            const quint32 flags = reader.item<quint32>();
+            painter.drawImage(rect, _images[arg], sr,
+                              Qt::ImageConversionFlags(flags));
+          }
+          break;
+        case CMD_LINES:
+          painter.drawLines(reader.array<QLine>(arg), arg);
+          break;
+        case CMD_LINESF:
+          painter.drawLines(reader.array<QLineF>(arg), arg);
+          break;
+        case CMD_PATH:
+          painter.drawPath(_paths[arg]);
+          break;
+        case CMD_PIXMAP:
+          {
+            const QRectF r(reader.item<QRectF>());
+            const QRectF sr(reader.item<QRectF>());
+            painter.drawPixmap(r, _pixmaps[arg], sr);
+          }
+          break;
+        case CMD_POINTS:
+          painter.drawPoints(reader.array<QPoint>(arg), arg);
+          break;
+        case CMD_POINTSF:
+          painter.drawPoints(reader.array<QPointF>(arg), arg);
+          break;
+        case CMD_POLYGON:
+        case CMD_POLYGONF:
+          {
+            const quint32 mode = reader.item<quint32>();
+            if(cmd == CMD_POLYGON)
+              {
+                const QPoint* pts = reader.array<QPoint>(arg);
+                switch(mode)
+                  {
+                  case QPaintEngine::OddEvenMode:
+                    painter.drawPolygon(pts, arg, Qt::OddEvenFill); break;
+                  case QPaintEngine::WindingMode:
+                    painter.drawPolygon(pts, arg, Qt::WindingFill); break;
+                  case QPaintEngine::ConvexMode:
+                    painter.drawConvexPolygon(pts, arg); break;
+                  case QPaintEngine::PolylineMode:
+                    painter.drawPolyline(pts, arg); break;
+                  }
+              }
+            else
+              {
+                const QPointF* pts = reader.array<QPointF>(arg);
+                switch(mode)
+                  {
+                  case QPaintEngine::OddEvenMode:
+                    painter.drawPolygon(pts, arg, Qt::OddEvenFill); break;
+                  case QPaintEngine::WindingMode:
+                    painter.drawPolygon(pts, arg, Qt::WindingFill); break;
+                  case QPaintEngine::ConvexMode:
+                    painter.drawConvexPolygon(pts, arg); break;
+                  case QPaintEngine::PolylineMode:
+                    painter.drawPolyline(pts, arg); break;
+                  }
+              }
+          }
+          break;
+        case CMD_RECTS:
+          painter.drawRects(reader.array<QRect>(arg), arg);
+          break;
+        case CMD_RECTSF:
+          painter.drawRects(reader.array<QRectF>(arg), arg);
+          break;
+        case CMD_TEXT:
+          painter.drawText(reader.item<QPointF>(), _texts[arg]);
+          break;
+        case CMD_TILEDPIXMAP:
+          {
+            const QRectF rect(reader.item<QRectF>());
+            const QPointF pt(reader.item<QPointF>());
+            painter.drawTiledPixmap(rect, _pixmaps[arg], pt);
+          }
+          break;
+
+        case CMD_PEN:
+          painter.setPen(_pens[arg]);
+          break;
+        case CMD_BRUSH:
+          painter.setBrush(_brushes[arg]);
+          break;
+        case CMD_BRUSHORIGIN:
+          painter.setBrushOrigin(reader.item<QPointF>());
+          break;
+        case CMD_FONT:
+          {
+            QFont tempfont(_fonts[arg]);
+            if( tempfont.pointSizeF() > 0. )
+              {
+                // scale font sizes in points using dpi ratio
+                int thisdpi = painter.device()->logicalDpiY();
+                double scale = tempfont.pointSizeF() / thisdpi * _dpi;
+                tempfont.setPointSizeF(scale);
+              }
+            painter.setFont(tempfont);
+          }
+          break;
+        case CMD_BACKGROUND:
+          painter.setBackground(_brushes[arg]);
+          break;
+        case CMD_BACKGROUNDMODE:
+          painter.setBackgroundMode(Qt::BGMode(arg));
+          break;
+        case CMD_TRANSFORM:
+          {
+            const TransformVals v(reader.item<TransformVals>());
+            painter.setWorldTransform(origtransform);
+            painter.setWorldTransform(QTransform(v.m[0], v.m[1], v.m[2],
+                                                 v.m[3], v.m[4], v.m[5],
+                                                 v.m[6], v.m[7], v.m[8]),
+                                      true);
+          }
+          break;
+        case CMD_CLIPREGION:
+          painter.setClipRegion(_regions[arg],
+                                Qt::ClipOperation(reader.item<quint32>()));
+          break;
+        case CMD_CLIPPATH:
+          painter.setClipPath(_paths[arg],
+                              Qt::ClipOperation(reader.item<quint32>()));
+          break;
+        case CMD_HINTS:
+          painter.setRenderHints(QPainter::RenderHints(arg));
+          break;
+        case CMD_COMPOSITION:
+          painter.setCompositionMode(QPainter::CompositionMode(arg));
+          break;
+        case CMD_CLIPENABLED:
+          painter.setClipping(arg != 0);
+          break;
+        default:
+          // should not get here
+          return;
+        }
+    }
+}
+
+qint64 PaintBuffer::memoryUsage() const
+{
+  qint64 mem = sizeof(*this) + qint64(_buf.capacity())*sizeof(Word);
+
+  mem += _pens.capacity()*sizeof(QPen) + _brushes.capacity()*sizeof(QBrush) +
+    _fonts.capacity()*sizeof(QFont);
+  for(const auto& path : _paths)
+    mem += sizeof(QPainterPath) +
+      path.elementCount()*sizeof(QPainterPath::Element);
+  for(const auto& region : _regions)
+    mem += sizeof(QRegion) + region.rectCount()*sizeof(QRect);
+  for(const auto& image : _images)
+    mem += sizeof(QImage) + image.byteCount();
+  for(const auto& pixmap : _pixmaps)
+    mem += sizeof(QPixmap) +
+      qint64(pixmap.width())*pixmap.height()*pixmap.depth()/8;
+  for(const auto& text : _texts)
+    mem += sizeof(QString) + text.size()*sizeof(QChar);
+
+  return mem;
+}
@@ -0,0 +1,121 @@
+//    Copyright (C) 2018 Jeremy S. Sanders
+//    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+//
+//    This program is free software; you can redistribute it and/or modify
+//    it under the terms of the GNU General Public License as published by
+//    the Free Software Foundation; either version 2 of the License, or
+//    (at your option) any later version.
+//
+//    This program is distributed in the hope that it will be useful,
+//    but WITHOUT ANY WARRANTY; without even the implied warranty of
+//    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//    GNU General Public License for more details.
+//
+//    You should have received a copy of the GNU General Public License along
+//    with this program; if not, write to the Free Software Foundation, Inc.,
+//    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+/////////////////////////////////////////////////////////////////////////////
+
+#ifndef PAINTBUFFER_H
+#define PAINTBUFFER_H
+
+#include <vector>
+#include <cstring>
+#include <QtGlobal>
+#include <QVector>
+#include <QPaintEngine>
+#include <QPainter>
+#include <QPainterPath>
+#include <QImage>
+#include <QPixmap>
+#include <QRegion>
+#include <QFont>
+#include <QPen>
+#include <QBrush>
+#include <QString>
+
+// A compact display list of painting commands. Commands are stored
+// one after another in a single buffer of 64 bit words, with arrays
+// of points, lines and rectangles stored inline. Larger Qt objects
+// (pens, brushes, paths, fonts, images, etc) are stored once in
+// separate vectors and referred to by index. Pens, brushes, fonts and
+// paths are interned, so that repeated states do not take extra
+// memory.
+
+class PaintBuffer
+{
+public:
+  PaintBuffer(int dpi);
+
+  // drawing commands
+  void addEllipse(const QRectF& rect);
+  void addEllipse(const QRect& rect);
+  void addImage(const QRectF& rect, const QImage& image,
+                const QRectF& sr, Qt::ImageConversionFlags flags);
+  void addLines(const QLineF* lines, int count);
+  void addLines(const QLine* lines, int count);
+  void addPath(const QPainterPath& path);
+  void addPixmap(const QRectF& r, const QPixmap& pm, const QRectF& sr);
+  void addPoints(const QPointF* points, int count);
+  void addPoints(const QPoint* points, int count);
+  void addPolygon(const QPointF* points, int count,
+                  QPaintEngine::PolygonDrawMode mode);
+  void addPolygon(const QPoint* points, int count,
+                  QPaintEngine::PolygonDrawMode mode);
+  void addRects(const QRectF* rects, int count);
+  void addRects(const QRect* rects, int count);
+  void addText(const QPointF& pt, const QString& text);
+  void addTiledPixmap(const QRectF& rect, const QPixmap& pixmap,
+                      const QPointF& pt);
+
+  // record changes in the painter state
+  void addState(const QPaintEngineState& state);
+
+  // release any unused memory after recording
+  void squeeze();
+
+  // replay commands to painter
+  void play(QPainter& painter) const;
+
+  // approximate number of bytes used
+  qint64 memoryUsage() const;
+
+private:
+  typedef quint64 Word;
+
+  // add a command with an integer argument
+  void addCommand(unsigned cmd, quint32 arg=0)
+  {
+    _buf.push_back(Word(cmd) | (Word(arg) << 32));
+  }
+
+  // copy an array of items into the buffer, padding to a whole word
+  template<class T> void addArray(const T* items, int count)
+  {
+    const size_t nbytes = sizeof(T)*size_t(count);
+    const size_t pos = _buf.size();
+    _buf.resize(pos + (nbytes+sizeof(Word)-1)/sizeof(Word));
+    if(nbytes > 0)
+      std::memcpy(&_buf[pos], items, nbytes);
+  }
+
+  template<class T> void addItem(const T& item)
+  {
+    addArray(&item, 1);
+  }
+
+private:
+  int _dpi;
+  std::vector<Word> _buf;
+
+  QVector<QPen> _pens;
+  QVector<QBrush> _brushes;
+  QVector<QFont> _fonts;
+  QVector<QPainterPath> _paths;
+  QVector<QRegion> _regions;
+  QVector<QImage> _images;
+  QVector<QPixmap> _pixmaps;
+  QVector<QString> _texts;
+};
+
+#endif
@@ -16,7 +16,6 @@
 //    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 /////////////////////////////////////////////////////////////////////////////
 
-#include <QtAlgorithms>
 #include <limits>
 #include "recordpaintdevice.h"
 #include "recordpaintengine.h"
@@ -26,14 +25,14 @@
 RecordPaintDevice::RecordPaintDevice(int width, int height,
 				     int dpix, int dpiy)
   :_width(width), _height(height), _dpix(dpix), _dpiy(dpiy),
-   _engine(new RecordPaintEngine)
+   _engine(new RecordPaintEngine),
+   _buffer(dpiy)
 {
 }
 
 RecordPaintDevice::~RecordPaintDevice()
 {
   delete _engine;
-  qDeleteAll(_elements);
 }
 
 QPaintEngine* RecordPaintDevice::paintEngine() const
@@ -72,9 +71,5 @@ int RecordPaintDevice::metric(QPaintDevice::PaintDeviceMetric metric) const
 
 void RecordPaintDevice::play(QPainter& painter)
 {
-  QTransform origtransform(painter.worldTransform());
-  foreach(PaintElement* el, _elements)
-    {
-      el->paint(painter, origtransform);
-    }
+  _buffer.play(painter);
 }
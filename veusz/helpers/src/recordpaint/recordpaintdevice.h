@@ -21,7 +21,7 @@
 
 #include <QPaintDevice>
 #include <QVector>
-#include "paintelement.h"
+#include "paintbuffer.h"
 #include "recordpaintengine.h"
 
 class RecordPaintDevice : public QPaintDevice
@@ -38,20 +38,16 @@ public:
 
   int drawItemCount() const { return _engine->drawItemCount(); }
 
+  // approximate memory used by the recorded commands, in bytes
+  qint64 memoryUsage() const { return _buffer.memoryUsage(); }
+
 public:
   friend class RecordPaintEngine;
 
-private:
-  // add an element to the list of maintained elements
-  void addElement(PaintElement* el)
-  {
-    _elements.push_back(el);
-  }
-
 private:
   int _width, _height, _dpix, _dpiy;
   RecordPaintEngine* _engine;
-  QVector<PaintElement*> _elements;
+  PaintBuffer _buffer;
 };
 
 #endif
@@ -2,8 +2,11 @@
 #include <algorithm>
 #include <cmath>
 #include <limits>
+#include <memory>
+#include <thread>
 #include "fragment.h"
 #include "bsp.h"
+#include "parallel.h"
 
 #define EPS 1e-6
 
@@ -20,7 +23,7 @@ namespace
 
   // Find set of three points to define a plane (pts).
   // Needs to find points which are not the same return true if ok
-  bool findPlane(const IdxVector& idxs, unsigned startidx,
+  bool findPlane(const IdxVector& idxs, unsigned startidx, unsigned endidx,
                  const FragmentVector& frags, Vec3* pts)
   {
     double maxtriarea2 = -1;
@@ -41,7 +44,6 @@ namespace
     // Using larger triangles is a heuristic to prevent lots of split
     // triangles. Empirically it seems to reduce the number of final
     // fragments by quite a lot.
-    const unsigned endidx = idxs.size();
     for(unsigned i=startidx; i<endidx; ++i)
       {
         const Fragment& f = frags[idxs[i]];
@@ -275,17 +277,91 @@ namespace
 
 }
 
-// This is a non-recursive BSP building routines. Fragment indices to
-// examine are built up on the to_process vector. A stack of
-// BSPStackItem items is used to keep track which BSP record the
-// fragment indices belong to.
+namespace
+{
+  // Choose a plane from the fragments in idxs[startidx:endidx] and
+  // sort them into those on, in front of or behind the plane. Split
+  // fragments are appended to fragvec. Returns false if no plane
+  // could be found.
+  bool splitFragments(FragmentVector& fragvec, const Vec3& viewdirn,
+                      const IdxVector& idxs,
+                      unsigned startidx, unsigned endidx,
+                      IdxVector& idxsame, IdxVector& idxfront,
+                      IdxVector& idxback)
+  {
+    Vec3 planepts[3];
+    if( !findPlane(idxs, startidx, endidx, fragvec, planepts) )
+      return false;
+
+    // norm of plane (making sure it points to observer)
+    Vec3 norm = cross(planepts[1]-planepts[0], planepts[2]-planepts[0]);
+    if(dot(norm, viewdirn) < 0)
+      norm = -norm;
+    // approximately normalise
+    norm *= 1./(std::abs(norm(0))+std::abs(norm(1))+std::abs(norm(2)));
+
+    for(unsigned i=startidx; i<endidx; ++i)
+      {
+        unsigned fidx = idxs[i];
+        switch(fragvec[fidx].type)
+          {
+          case Fragment::FR_PATH:
+            handlePath(norm, planepts[0], fragvec, fidx,
+                       idxsame, idxfront, idxback);
+            break;
+          case Fragment::FR_LINESEG:
+            handleLine(norm, planepts[0], fragvec, fidx,
+                       idxsame, idxfront, idxback);
+            break;
+          case Fragment::FR_TRIANGLE:
+            handleTriangle(norm, planepts[0], fragvec, fidx,
+                           idxsame, idxfront, idxback);
+            break;
+          default:
+            break;
+          }
+      }
+    return true;
+  }
+
+  // If nothing was left on the plane, but everything is on one side,
+  // move the fragments on that side into the node. Returns the number
+  // of fragments moved.
+  unsigned collapseOneSided(IdxVector& frag_idxs,
+                            IdxVector& idxfront, IdxVector& idxback)
+  {
+    unsigned nmoved = 0;
+    if(idxfront.empty() && !idxback.empty())
+      {
+        frag_idxs.insert(frag_idxs.end(), idxback.begin(), idxback.end());
+        nmoved = idxback.size();
+        idxback.resize(0);
+      }
+    else if(idxback.empty() && !idxfront.empty())
+      {
+        frag_idxs.insert(frag_idxs.end(), idxfront.begin(), idxfront.end());
+        nmoved = idxfront.size();
+        idxfront.resize(0);
+      }
+    return nmoved;
+  }
+
+  // do not build subtrees in parallel if they have fewer fragments
+  // than this, as the copying overhead dominates
+  const unsigned BSP_PARALLEL_MIN_FRAGS = 4096;
+
+  // depth of the tree to which subtrees are built in parallel
+  unsigned parallelDepth()
+  {
+    unsigned depth = 0;
+    for(unsigned n=numThreads(); n>1; n>>=1)
+      ++depth;
+    return depth;
+  }
+}
 
 BSPBuilder::BSPBuilder(FragmentVector& fragvec, Vec3 viewdirn)
 {
-  // initial record
-  bsp_recs.reserve(fragvec.size());
-  bsp_recs.push_back(BSPRecord());
-
   // add every non-empty fragment onto a list of fragments to process
   IdxVector to_process;
   to_process.reserve(fragvec.size()*2);
@@ -295,12 +371,158 @@ BSPBuilder::BSPBuilder(FragmentVector& fragvec, Vec3 viewdirn)
         to_process.push_back(i);
     }
 
+  buildParallel(fragvec, viewdirn, to_process, parallelDepth());
+}
+
+BSPBuilder::BSPBuilder(FragmentVector& fragvec, Vec3 viewdirn,
+                       IdxVector& to_process, unsigned depth)
+{
+  buildParallel(fragvec, viewdirn, to_process, depth);
+}
+
+// The top levels of the tree are built by splitting the fragments
+// once, then building the front and back subtrees as independent
+// BSPBuilders in separate threads. Each subtree works on its own copy
+// of its fragments, so no locking is needed. The subtrees are merged
+// back in a fixed order (front, then back), so the output does not
+// depend on thread scheduling.
+
+void BSPBuilder::buildParallel(FragmentVector& fragvec, Vec3 viewdirn,
+                               IdxVector& to_process, unsigned depth)
+{
+  if(depth == 0 || to_process.size() < 2*BSP_PARALLEL_MIN_FRAGS)
+    {
+      buildSerial(fragvec, viewdirn, to_process);
+      return;
+    }
+
+  bsp_recs.push_back(BSPRecord());
+
+  IdxVector idxfront, idxback;
+  if( !splitFragments(fragvec, viewdirn, to_process, 0, to_process.size(),
+                      frag_idxs, idxfront, idxback) )
+    {
+      // plane couldn't be found
+      frag_idxs = to_process;
+      bsp_recs[0].nfrags = frag_idxs.size();
+      return;
+    }
+  bsp_recs[0].nfrags = frag_idxs.size();
+  if(bsp_recs[0].nfrags == 0)
+    bsp_recs[0].nfrags = collapseOneSided(frag_idxs, idxfront, idxback);
+
+  // copy the fragments for each side into separate vectors
+  FragmentVector frontfrags, backfrags;
+  IdxVector frontlocal, backlocal;
+  for(unsigned i=0; i<idxfront.size(); ++i)
+    {
+      frontfrags.push_back(fragvec[idxfront[i]]);
+      frontlocal.push_back(i);
+    }
+  for(unsigned i=0; i<idxback.size(); ++i)
+    {
+      backfrags.push_back(fragvec[idxback[i]]);
+      backlocal.push_back(i);
+    }
+
+  // build the subtrees, the front in a new thread if it is large
+  // enough and the back in this one
+  std::unique_ptr<BSPBuilder> frontbsp, backbsp;
+  std::thread frontthread;
+  if(!idxfront.empty())
+    {
+      auto buildfront = [&frontbsp, &frontfrags, &frontlocal,
+                         viewdirn, depth]()
+        {
+          frontbsp.reset(new BSPBuilder(frontfrags, viewdirn,
+                                        frontlocal, depth-1));
+        };
+      if(idxfront.size() >= BSP_PARALLEL_MIN_FRAGS &&
+         idxback.size() >= BSP_PARALLEL_MIN_FRAGS)
+        frontthread = std::thread(buildfront);
+      else
+        buildfront();
+    }
+  if(!idxback.empty())
+    backbsp.reset(new BSPBuilder(backfrags, viewdirn, backlocal, depth-1));
+  if(frontthread.joinable())
+    frontthread.join();
+
+  // merging invalidates references to bsp_recs, so use temporaries
+  if(frontbsp)
+    {
+      unsigned frontidx = mergeSubtree(fragvec, *frontbsp,
+                                       frontfrags, idxfront);
+      bsp_recs[0].frontidx = frontidx;
+    }
+  if(backbsp)
+    {
+      unsigned backidx = mergeSubtree(fragvec, *backbsp,
+                                      backfrags, idxback);
+      bsp_recs[0].backidx = backidx;
+    }
+}
+
+// Add the nodes of a subtree built from subfrags onto this tree,
+// copying its fragments back into fragvec. origidxs gives the index
+// in fragvec of the initial fragments in subfrags. Fragments created
+// by splitting are appended to fragvec. Returns index of the root node
+// of the subtree.
+
+unsigned BSPBuilder::mergeSubtree(FragmentVector& fragvec,
+                                  const BSPBuilder& sub,
+                                  const FragmentVector& subfrags,
+                                  const IdxVector& origidxs)
+{
+  // mapping of fragment indices in the subtree to fragvec
+  IdxVector fragmap(subfrags.size());
+  const unsigned norig = origidxs.size();
+  for(unsigned i=0; i<norig; ++i)
+    {
+      fragvec[origidxs[i]] = subfrags[i];
+      fragmap[i] = origidxs[i];
+    }
+  for(unsigned i=norig; i<subfrags.size(); ++i)
+    {
+      fragmap[i] = fragvec.size();
+      fragvec.push_back(subfrags[i]);
+    }
+
+  const unsigned recoffset = bsp_recs.size();
+  const unsigned idxoffset = frag_idxs.size();
+
+  for(auto rec : sub.bsp_recs)
+    {
+      rec.minfragidxidx += idxoffset;
+      if(rec.frontidx != EMPTY_BSP_IDX)
+        rec.frontidx += recoffset;
+      if(rec.backidx != EMPTY_BSP_IDX)
+        rec.backidx += recoffset;
+      bsp_recs.push_back(rec);
+    }
+  for(auto idx : sub.frag_idxs)
+    frag_idxs.push_back(fragmap[idx]);
+
+  return recoffset;
+}
+
+// This is a non-recursive BSP building routines. Fragment indices to
+// examine are built up on the to_process vector. A stack of
+// BSPStackItem items is used to keep track which BSP record the
+// fragment indices belong to.
+
+void BSPBuilder::buildSerial(FragmentVector& fragvec, Vec3 viewdirn,
+                             IdxVector& to_process)
+{
+  // initial record
+  bsp_recs.reserve(fragvec.size());
+  bsp_recs.push_back(BSPRecord());
+
   // these are where indices for the front and back side of the plane
   IdxVector idxback;
   IdxVector idxfront;
   idxback.reserve(fragvec.size());
   idxfront.reserve(fragvec.size());
-  Vec3 planepts[3];
 
   // stack of items to process
   std::vector<BSPStackItem> stack;
@@ -317,60 +539,19 @@ BSPBuilder::BSPBuilder(FragmentVector& fragvec, Vec3 viewdirn)
       rec.minfragidxidx = frag_idxs.size(); // where the items get added
 
       // if more than item to process then choose a plane, then split
+      const unsigned to_process_size = to_process.size();
       if( stackitem.nidxs > 1 &&
-          findPlane(to_process, to_process.size()-stackitem.nidxs,
-                    fragvec, planepts) )
+          splitFragments(fragvec, viewdirn, to_process,
+                         to_process_size-stackitem.nidxs, to_process_size,
+                         frag_idxs, idxfront, idxback) )
         {
-          // norm of plane (making sure it points to observer)
-          Vec3 norm = cross(planepts[1]-planepts[0], planepts[2]-planepts[0]);
-          if(dot(norm, viewdirn) < 0)
-            norm = -norm;
-          // approximately normalise
-          norm *= 1./(std::abs(norm(0))+std::abs(norm(1))+std::abs(norm(2)));
-
-          unsigned to_process_size = to_process.size();
-          for(unsigned i=to_process_size-stackitem.nidxs; i<to_process_size; ++i)
-            {
-              unsigned fidx = to_process[i];
-              switch(fragvec[fidx].type)
-                {
-                  case Fragment::FR_PATH:
-                  handlePath(norm, planepts[0], fragvec, fidx,
-                             frag_idxs, idxfront, idxback);
-                  break;
-                case Fragment::FR_LINESEG:
-                  handleLine(norm, planepts[0], fragvec, fidx,
-                             frag_idxs, idxfront, idxback);
-                  break;
-                case Fragment::FR_TRIANGLE:
-                  handleTriangle(norm, planepts[0], fragvec, fidx,
-                                 frag_idxs, idxfront, idxback);
-                  break;
-                default:
-                  break;
-                }
-            }
-
           // number added to this node
           rec.nfrags = frag_idxs.size()-rec.minfragidxidx;
           // remove items to process
           to_process.resize(to_process_size-stackitem.nidxs);
 
           if(rec.nfrags == 0)
-            {
-              if(idxfront.empty() && !idxback.empty())
-                {
-                  frag_idxs.insert(frag_idxs.end(), idxback.begin(), idxback.end());
-                  rec.nfrags = idxback.size();
-                  idxback.resize(0);
-                }
-              else if(idxback.empty() && !idxfront.empty())
-                {
-                  frag_idxs.insert(frag_idxs.end(), idxfront.begin(), idxfront.end());
-                  rec.nfrags = idxfront.size();
-                  idxfront.resize(0);
-                }
-            }
+            rec.nfrags = collapseOneSided(frag_idxs, idxfront, idxback);
 
           // push_back invalidates rec, so we don't use it below
           if(!idxfront.empty())
@@ -66,6 +66,22 @@ public:
   std::vector<BSPRecord> bsp_recs;
   // vector of indices to the fragments vector
   IdxVector frag_idxs;
+
+private:
+  // build subtree for the fragment indices given, splitting into
+  // parallel subtrees down to depth
+  BSPBuilder(FragmentVector& fragvec, Vec3 viewdirn,
+             IdxVector& to_process, unsigned depth);
+
+  void buildParallel(FragmentVector& fragvec, Vec3 viewdirn,
+                     IdxVector& to_process, unsigned depth);
+  void buildSerial(FragmentVector& fragvec, Vec3 viewdirn,
+                   IdxVector& to_process);
+
+  // add nodes from subtree, returning index of its root
+  unsigned mergeSubtree(FragmentVector& fragvec, const BSPBuilder& sub,
+                        const FragmentVector& subfrags,
+                        const IdxVector& origidxs);
 };
 
 
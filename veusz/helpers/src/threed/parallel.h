@@ -0,0 +1,75 @@
+// -*-c++-*-
+
+//    Copyright (C) 2015 Jeremy S. Sanders
+//    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+//
+//    This program is free software; you can redistribute it and/or modify
+//    it under the terms of the GNU General Public License as published by
+//    the Free Software Foundation; either version 2 of the License, or
+//    (at your option) any later version.
+//
+//    This program is distributed in the hope that it will be useful,
+//    but WITHOUT ANY WARRANTY; without even the implied warranty of
+//    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+//    GNU General Public License for more details.
+//
+//    You should have received a copy of the GNU General Public License along
+//    with this program; if not, write to the Free Software Foundation, Inc.,
+//    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+/////////////////////////////////////////////////////////////////////////////
+
+#ifndef PARALLEL_H
+#define PARALLEL_H
+
+#include <algorithm>
+#include <thread>
+#include <vector>
+
+// minimum number of items handled by each thread in parallelFor
+#define PARALLEL_MIN_CHUNK 8192
+
+// number of threads to use for work
+inline unsigned numThreads()
+{
+  unsigned n = std::thread::hardware_concurrency();
+  return n==0 ? 1 : n;
+}
+
+// Call func(i) for i in [0, size), splitting the range into
+// contiguous chunks which are processed by separate threads. func
+// must only modify state associated with index i, so that the result
+// is independent of the number of threads.
+template<typename Func> void parallelFor(unsigned size, Func func)
+{
+  const unsigned nthreads = std::min(numThreads(),
+                                     size/PARALLEL_MIN_CHUNK);
+  if(nthreads <= 1)
+    {
+      for(unsigned i=0; i<size; ++i)
+        func(i);
+      return;
+    }
+
+  const unsigned chunk = (size+nthreads-1)/nthreads;
+  std::vector<std::thread> threads;
+  threads.reserve(nthreads-1);
+
+  // last chunk is done by this thread
+  for(unsigned t=0; t<nthreads-1; ++t)
+    {
+      const unsigned start = t*chunk;
+      const unsigned end = std::min(size, start+chunk);
+      threads.push_back(std::thread([start, end, &func]()
+                                    {
+                                      for(unsigned i=start; i<end; ++i)
+                                        func(i);
+                                    }));
+    }
+  for(unsigned i=(nthreads-1)*chunk; i<size; ++i)
+    func(i);
+
+  for(auto& thread : threads)
+    thread.join();
+}
+
+#endif
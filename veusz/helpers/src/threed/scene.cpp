@@ -30,6 +30,7 @@
 #include "scene.h"
 #include "fragment.h"
 #include "bsp.h"
+#include "parallel.h"
 
 namespace
 {
@@ -127,6 +128,121 @@ namespace
       }
   }
 
+  // only cull hidden fragments if there are at least this many, as
+  // the saving for small scenes is not worth the cost
+  const unsigned CULL_MIN_FRAGMENTS = 16384;
+
+  // maximum number of tiles in each direction for CoverageGrid
+  const unsigned COVERAGE_MAX_TILES = 256;
+
+  // Coarse grid of tiles in screen coordinates, keeping track of which
+  // tiles have been completely covered by opaque triangles. Fragments
+  // are added front to back, so anything lying entirely within
+  // covered tiles is hidden. A tile is only covered if every device
+  // pixel touching it is completely inside one triangle, so that the
+  // pixel is painted with the opaque color of the triangle, even with
+  // antialiasing. pixelsize is the size of a box containing a device
+  // pixel, in screen coordinates.
+  class CoverageGrid
+  {
+  public:
+    CoverageGrid(double x1, double y1, double x2, double y2,
+                 double _pixelsize)
+      : pixelsize(_pixelsize)
+    {
+      x0 = std::min(x1, x2);
+      y0 = std::min(y1, y2);
+      const double w = std::abs(x2-x1);
+      const double h = std::abs(y2-y1);
+      tilesize = std::max(std::max(w, h)*(1./COVERAGE_MAX_TILES), 1.);
+      nx = std::max(int(w/tilesize), 1);
+      ny = std::max(int(h/tilesize), 1);
+      covered.assign(nx*ny, 0);
+    }
+
+    // are all the tiles in the rectangle covered?
+    bool isCovered(double minx, double miny, double maxx, double maxy) const
+    {
+      int ix1, iy1, ix2, iy2;
+      if(!tileRange(minx, miny, maxx, maxy, ix1, iy1, ix2, iy2) ||
+         ix1<0 || iy1<0 || ix2>=nx || iy2>=ny)
+        return false;
+
+      for(int iy=iy1; iy<=iy2; ++iy)
+        for(int ix=ix1; ix<=ix2; ++ix)
+          if(!covered[iy*nx+ix])
+            return false;
+      return true;
+    }
+
+    // mark the tiles (and the pixels touching them) completely inside
+    // the triangle as covered
+    void addTriangle(const QPointF* pts)
+    {
+      const double minx = std::min(pts[0].x(), std::min(pts[1].x(), pts[2].x()));
+      const double maxx = std::max(pts[0].x(), std::max(pts[1].x(), pts[2].x()));
+      const double miny = std::min(pts[0].y(), std::min(pts[1].y(), pts[2].y()));
+      const double maxy = std::max(pts[0].y(), std::max(pts[1].y(), pts[2].y()));
+
+      // only tiles strictly inside the bounding box can be covered
+      int ix1, iy1, ix2, iy2;
+      if(!tileRange(minx, miny, maxx, maxy, ix1, iy1, ix2, iy2))
+        return;
+      ix1 = std::max(ix1+1, 0); iy1 = std::max(iy1+1, 0);
+      ix2 = std::min(ix2-1, nx-1); iy2 = std::min(iy2-1, ny-1);
+
+      for(int iy=iy1; iy<=iy2; ++iy)
+        for(int ix=ix1; ix<=ix2; ++ix)
+          {
+            const double tx1 = x0+ix*tilesize - pixelsize;
+            const double ty1 = y0+iy*tilesize - pixelsize;
+            const double tx2 = x0+(ix+1)*tilesize + pixelsize;
+            const double ty2 = y0+(iy+1)*tilesize + pixelsize;
+            if(!covered[iy*nx+ix] &&
+               insideTriangle(pts, tx1, ty1) &&
+               insideTriangle(pts, tx2, ty1) &&
+               insideTriangle(pts, tx1, ty2) &&
+               insideTriangle(pts, tx2, ty2))
+              covered[iy*nx+ix] = 1;
+          }
+    }
+
+  private:
+    // get range of tiles for rectangle, returning false if not finite
+    bool tileRange(double minx, double miny, double maxx, double maxy,
+                   int& ix1, int& iy1, int& ix2, int& iy2) const
+    {
+      if(!std::isfinite(minx) || !std::isfinite(miny) ||
+         !std::isfinite(maxx) || !std::isfinite(maxy))
+        return false;
+      // clip to avoid overflows when converting to int
+      const double lim = 2*COVERAGE_MAX_TILES;
+      ix1 = int(clip(std::floor((minx-x0)/tilesize), -lim, lim));
+      iy1 = int(clip(std::floor((miny-y0)/tilesize), -lim, lim));
+      ix2 = int(clip(std::floor((maxx-x0)/tilesize), -lim, lim));
+      iy2 = int(clip(std::floor((maxy-y0)/tilesize), -lim, lim));
+      return true;
+    }
+
+    static bool insideTriangle(const QPointF* pts, double x, double y)
+    {
+      double s[3];
+      for(unsigned i=0; i<3; ++i)
+        {
+          const QPointF& a = pts[i];
+          const QPointF& b = pts[(i+1)%3];
+          s[i] = (b.x()-a.x())*(y-a.y()) - (b.y()-a.y())*(x-a.x());
+        }
+      return (s[0]>=0 && s[1]>=0 && s[2]>=0) ||
+        (s[0]<=0 && s[1]<=0 && s[2]<=0);
+    }
+
+  private:
+    double x0, y0, tilesize, pixelsize;
+    int nx, ny;
+    std::vector<char> covered;
+  };
+
 }; // namespace
 
 void Scene::addLight(Vec3 posn, QColor col, double intensity)
@@ -435,30 +551,120 @@ void Scene::calcLighting()
   if(lights.empty())
     return;
 
-  for(auto &frag : fragments)
+  // each fragment is independent, so this can be split between threads
+  parallelFor(fragments.size(),
+              [this](unsigned i)
+              {
+                Fragment& frag = fragments[i];
+                switch(frag.type)
+                  {
+                  case Fragment::FR_TRIANGLE:
+                    if(frag.surfaceprop != 0)
+                      calcLightingTriangle(frag);
+                    break;
+                  case Fragment::FR_LINESEG:
+                    if(frag.lineprop != 0)
+                      calcLightingLine(frag);
+                    break;
+                  default:
+                    break;
+                  }
+              });
+}
+
+void Scene::projectFragments(const Camera& cam)
+{
+  // convert 3d to 2d coordinates using the Camera
+  parallelFor(fragments.size(),
+              [this, &cam](unsigned i)
+              {
+                Fragment& f = fragments[i];
+                for(unsigned pi=0, np=f.nPointsTotal(); pi<np; ++pi)
+                  f.proj[pi] = calcProjVec(cam.perspM, f.points[pi]);
+              });
+}
+
+bool Scene::isOpaqueTriangle(const Fragment& frag) const
+{
+  return frag.type == Fragment::FR_TRIANGLE &&
+    frag.surfaceprop != 0 && !frag.surfaceprop->hide &&
+    surfaceProp2QColor(frag).alpha() == 255;
+}
+
+void Scene::cullHiddenFragments(const Mat3& screenM, double linescale,
+                                double pixelsize,
+                                double x1, double y1, double x2, double y2)
+{
+  if(draworder.size() < CULL_MIN_FRAGMENTS ||
+     !std::isfinite(pixelsize) || pixelsize <= 0)
+    return;
+
+  // screen coordinates of fragment points
+  auto screenPts = [&screenM](const Fragment& frag, QPointF* pts)
     {
+      for(unsigned pi=0, s=frag.nPointsVisible(); pi<s; ++pi)
+        {
+          Vec2 p = projVecToScreen(screenM, frag.proj[pi]);
+          pts[pi] = QPointF(p(0), p(1));
+        }
+    };
+
+  // Occlusion: walk from the front to the back, remembering which
+  // tiles have been covered by opaque triangles
+  CoverageGrid grid(x1, y1, x2, y2, pixelsize);
+  std::vector<char> keep(draworder.size(), 1);
+  QPointF pts[3];
+  for(int i=int(draworder.size())-1; i>=0; --i)
+    {
+      const Fragment& frag = fragments[draworder[i]];
+
+      // margin for the width of the line drawn around the fragment,
+      // plus a pixel for antialiasing or cosmetic pens
+      double margin = pixelsize;
       switch(frag.type)
         {
         case Fragment::FR_TRIANGLE:
-          if(frag.surfaceprop != 0)
-            calcLightingTriangle(frag);
+          if(frag.surfaceprop==0 || frag.surfaceprop->hide)
+            {
+              // not drawn anyway
+              keep[i] = 0;
+              continue;
+            }
+          margin += 1;
           break;
         case Fragment::FR_LINESEG:
-          if(frag.lineprop != 0)
-            calcLightingLine(frag);
+          if(frag.lineprop==0 || frag.lineprop->hide)
+            {
+              keep[i] = 0;
+              continue;
+            }
+          margin += frag.lineprop->width*linescale + 1;
           break;
         default:
-          break;
+          // paths can be of any size, so are never culled
+          continue;
+        }
+
+      screenPts(frag, pts);
+      const unsigned np = frag.nPointsVisible();
+      double minx=pts[0].x(), maxx=minx, miny=pts[0].y(), maxy=miny;
+      for(unsigned pi=1; pi<np; ++pi)
+        {
+          minx = std::min(minx, pts[pi].x()); maxx = std::max(maxx, pts[pi].x());
+          miny = std::min(miny, pts[pi].y()); maxy = std::max(maxy, pts[pi].y());
         }
+
+      if(grid.isCovered(minx-margin, miny-margin, maxx+margin, maxy+margin))
+        keep[i] = 0;
+      else if(isOpaqueTriangle(frag))
+        grid.addTriangle(pts);
     }
-}
 
-void Scene::projectFragments(const Camera& cam)
-{
-  // convert 3d to 2d coordinates using the Camera
-  for(auto& f : fragments)
-    for(unsigned pi=0, np=f.nPointsTotal(); pi<np; ++pi)
-      f.proj[pi] = calcProjVec(cam.perspM, f.points[pi]);
+  unsigned out = 0;
+  for(unsigned i=0, s=draworder.size(); i<s; ++i)
+    if(keep[i])
+      draworder[out++] = draworder[i];
+  draworder.resize(out);
 }
 
 void Scene::renderPainters(const Camera& cam)
@@ -613,6 +819,20 @@ void Scene::render_internal(Object* root,
 
   double linescale = std::max(std::abs(x2-x1), std::abs(y2-y1)) * (1./1000);
 
+  // remove fragments which will not be seen, unless the callback
+  // needs to see every fragment drawn
+  if(callback == 0)
+    {
+      // size of box around a device pixel in screen coordinates,
+      // allowing for rotation
+      const QTransform t = painter->combinedTransform();
+      const double sx = std::sqrt(t.m11()*t.m11() + t.m12()*t.m12());
+      const double sy = std::sqrt(t.m21()*t.m21() + t.m22()*t.m22());
+      const double pixelsize = std::sqrt(2.) / std::min(sx, sy);
+
+      cullHiddenFragments(screenM, linescale, pixelsize, x1, y1, x2, y2);
+    }
+
   // finally draw items
   doDrawing(painter, screenM, linescale, cam, callback);
 
@@ -83,6 +83,13 @@ private:
   // compute projected coordinates
   void projectFragments(const Camera& cam);
 
+  // remove fragments from draworder which would be hidden by opaque
+  // triangles in front
+  void cullHiddenFragments(const Mat3& screenM, double linescale,
+                           double pixelsize,
+                           double x1, double y1, double x2, double y2);
+  bool isOpaqueTriangle(const Fragment& frag) const;
+
   void doDrawing(QPainter* painter, const Mat3& screenM, double linescale,
                  const Camera& cam, DrawCallback* callback=0);
 
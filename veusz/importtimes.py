@@ -0,0 +1,135 @@
+#    Copyright (C) 2018 Jeremy S. Sanders
+#    Email: Jeremy Sanders <jeremy@jeremysanders.net>
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License along
+#    with this program; if not, write to the Free Software Foundation, Inc.,
+#    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+###############################################################################
+
+"""Record the time taken to import modules, to help speed up startup."""
+
+from __future__ import division, print_function
+import sys
+import threading
+import atexit
+
+try:
+    from time import perf_counter as _clock
+except ImportError:
+    from time import time as _clock
+
+_finder = None
+_lock = threading.Lock()
+_local = threading.local()
+
+# module name -> [cumulative time, self time]
+_times = {}
+
+def _timeCall(modname, func, *args):
+    """Call func(*args), recording the time taken for module modname."""
+
+    # time taken by imports made by this import
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.)
+
+    start = _clock()
+    try:
+        return func(*args)
+    finally:
+        total = _clock() - start
+        children = stack.pop()
+        if stack:
+            stack[-1] += total
+        with _lock:
+            t = _times.setdefault(modname, [0., 0.])
+            t[0] += total
+            t[1] += total - children
+
+class _TimingLoader(object):
+    """Wrap a loader to time executing the module."""
+
+    def __init__(self, loader, modname):
+        self.loader = loader
+        self.modname = modname
+
+    def create_module(self, spec):
+        # extension modules are loaded here
+        create = getattr(self.loader, 'create_module', None)
+        if create is None:
+            return None
+        return _timeCall(self.modname, create, spec)
+
+    def exec_module(self, module):
+        # the module should only see the original loader
+        module.__loader__ = self.loader
+        if getattr(module, '__spec__', None) is not None:
+            module.__spec__.loader = self.loader
+        _timeCall(self.modname, self.loader.exec_module, module)
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+class _TimingFinder(object):
+    """Finder placed at the start of sys.meta_path, which finds modules
+    using the other finders and wraps their loaders. This sees all
+    imports, including those using importlib and submodules of
+    packages."""
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, 'find_spec', None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimingLoader(spec.loader, fullname)
+        return spec
+
+def install(reportatexit=True):
+    """Start recording the time taken for new imports.
+
+    If reportatexit is set, write the report to stderr on exit."""
+    global _finder
+    if _finder is not None:
+        return
+    if sys.version_info < (3, 4):
+        print('Recording import times needs Python 3.4 or later',
+              file=sys.stderr)
+        return
+    _finder = _TimingFinder()
+    sys.meta_path.insert(0, _finder)
+    if reportatexit:
+        atexit.register(report)
+
+def report(fileobj=None, number=30):
+    """Write the slowest imports to the file given (default stderr)."""
+    if fileobj is None:
+        fileobj = sys.stderr
+
+    with _lock:
+        items = sorted(_times.items(), key=lambda x: -x[1][0])
+
+    total = sum(t[1] for n, t in items)
+    print('Import times (top %i of %i modules, %.3fs in total):' % (
+        min(number, len(items)), len(items), total), file=fileobj)
+    print('%10s %10s  %s' % ('cumul (s)', 'self (s)', 'module'),
+          file=fileobj)
+    for name, (cumul, selft) in items[:number]:
+        print('%10.4f %10.4f  %s' % (cumul, selft, name), file=fileobj)
@@ -22,6 +22,10 @@
 
 from __future__ import division, print_function
 import re
+import time
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import numpy as N
 from . import field
 
@@ -104,6 +108,29 @@ class Dataset1D(_DatasetBase):
         return datasets.Dataset(
             data=self.data, serr=self.serr, perr=self.perr, nerr=self.nerr)
 
+class Dataset1DNative(Dataset1D):
+    """1D dataset for ImportPlugin, keeping the numerical type of the
+    data.
+
+    The array is not copied, so it can be a read-only or memory-mapped
+    array. The values are converted to floating point when used.
+    """
+    def __init__(self, name, data):
+        """name: name of dataset
+        data: numpy 1D array of numbers
+        """
+        self.name = name
+        self.update(data=data)
+
+    def update(self, data=[], serr=None, perr=None, nerr=None):
+        """Update values to those given (errors are not supported)."""
+        self.data = N.asanyarray(data)
+        self.serr = self.perr = self.nerr = None
+
+    def _unlinkedVeuszDataset(self):
+        """Convert this to an equivalent (unlinked) Veusz dataset."""
+        return datasets.DatasetNative(self.data)
+
 class Dataset2D(_DatasetBase):
     """2D dataset for ImportPlugin or DatasetPlugin."""
     def __init__(self, name, data=[[]], rangex=None, rangey=None,
@@ -277,34 +304,48 @@ class DatasetPluginHelper(object):
     def __init__(self, doc):
         """Construct helper object to pass to DatasetPlugins."""
         self._doc = doc
+        self._resetUsed()
+
+    def _resetUsed(self):
+        """Reset record of what the plugin used from the document.
+
+        _usednames are the names of datasets used and _usedall is set if
+        the plugin may depend on anything else in the document."""
+        self._usednames = set()
+        self._usedall = False
 
     @property
     def datasets1d(self):
         """Return list of existing 1D numeric datasets"""
+        self._usedall = True
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 1 and ds.datatype == 'numeric')]
 
     @property
     def datasets2d(self):
         """Return list of existing 2D numeric datasets"""
+        self._usedall = True
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 2 and ds.datatype == 'numeric')]
 
     @property
     def datasetstext(self):
         """Return list of existing 1D text datasets"""
+        self._usedall = True
         return [name for name, ds in citems(self._doc.data) if
                 (ds.dimensions == 1 and ds.datatype == 'text')]
 
     @property
     def datasetsdatetime(self):
         """Return list of existing date-time datesets"""
+        self._usedall = True
         return [name for name, ds in citems(self._doc.data) if
                 isinstance(ds, datasets.DatasetDateTime)]
 
     @property
     def locale(self):
         """Return Qt locale."""
+        self._usedall = True
         return self._doc.locale
 
     def evaluateExpression(self, expr, part='data'):
@@ -314,6 +355,7 @@ class DatasetPluginHelper(object):
 
         Returns None if expression could not be evaluated.
         """
+        self._usedall = True
         ds = datasets.evalDatasetExpression(self._doc, expr, part=part)
         return None if ds is None else ds.data
 
@@ -327,6 +369,7 @@ class DatasetPluginHelper(object):
         name not found: raise a DatasetPluginException
         dimensions not right: raise a DatasetPluginException
         """
+        self._usednames.add(name)
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -364,6 +407,7 @@ class DatasetPluginHelper(object):
         name not found: raise a DatasetPluginException
         """
 
+        self._usednames.add(name)
         try:
             ds = self._doc.data[name]
         except KeyError:
@@ -390,6 +434,15 @@ class DatasetPluginManager(object):
         self.fields = dict(fields)
         self.changeset = -1
 
+        # key for inputs when last updated (see inputKey)
+        self.inputkey = None
+        # incremented when the plugin is run
+        self.version = 0
+        # time taken to run plugin when last updated (s)
+        self.updatetime = None
+        # update can be called from several threads
+        self.lock = threading.RLock()
+
         self.fixMissingFields()
         self.setupDatasets()
 
@@ -439,28 +492,137 @@ class DatasetPluginManager(object):
 
         fileobj.write( 'DatasetPlugin(%s)\n' % (', '.join(args)) )
 
+    def inputKey(self):
+        """Return a key which changes when the datasets used by the plugin
+        when it was last run change, or None if the plugin may depend
+        on anything in the document.
+
+        Plugin datasets used are updated first."""
+
+        if self.helper._usedall:
+            return None
+
+        doc = self.document
+        key = []
+        for name in sorted(self.helper._usednames):
+            ds = doc.data.get(name)
+            manager = getattr(ds, 'pluginmanager', None)
+            if manager is not None and manager is not self:
+                manager.update()
+                key.append( (name, id(ds), manager.version) )
+            else:
+                key.append( (name, doc.datasetChangeKey(name)) )
+        return key
+
     def update(self, raiseerrors=False):
         """Update created datasets.
 
+        The plugin is only run if the datasets it used have changed.
+
         if raiseerrors is True, raise an exception if there is an exeception
         when updating the dataset
         """
 
-        if self.document.changeset == self.changeset:
-            return
-        self.changeset = self.document.changeset
+        with self.lock:
+            if self.document.changeset == self.changeset:
+                return
+            self.changeset = self.document.changeset
 
-        # run the plugin with its parameters
-        try:
-            self.plugin.updateDatasets(self.fields, self.helper)
-        except DatasetPluginException as ex:
-            # this is for immediate notification
-            if raiseerrors:
-                raise
+            if self.inputkey is not None and self.inputKey() == self.inputkey:
+                return
 
-            # otherwise if there's an error, then log and null outputs
-            self.document.log( cstr(ex) )
-            self.nullDatasets()
+            # run the plugin with its parameters
+            self.helper._resetUsed()
+            start = time.time()
+            try:
+                self.plugin.updateDatasets(self.fields, self.helper)
+            except DatasetPluginException as ex:
+                # this is for immediate notification
+                if raiseerrors:
+                    raise
+
+                # otherwise if there's an error, then log and null outputs
+                self.document.log( cstr(ex) )
+                self.nullDatasets()
+            finally:
+                self.updatetime = time.time() - start
+                self.version += 1
+                self.inputkey = self.inputKey()
+
+def updatePluginManagers(managers, maxthreads=None):
+    """Update several dataset plugin managers, running plugins which do
+    not depend on each other in parallel.
+
+    The dependencies are found from the datasets used by each plugin
+    when it was last run. Plugins which have not been run, or which may
+    use anything in the document (e.g. by evaluating expressions), are
+    run in this thread.
+
+    Returns a list of (manager, time taken) for the plugins which were
+    run.
+    """
+
+    managers = list(managers)
+    versions = [m.version for m in managers]
+
+    # find which managers create each dataset
+    creators = {}
+    for m in managers:
+        for ds in m.veuszdatasets:
+            creators[id(ds)] = m
+
+    # managers providing the inputs for each manager
+    deps = {}
+    for m in managers:
+        deps[m] = set()
+        for name in m.helper._usednames:
+            creator = creators.get(id(m.document.data.get(name)))
+            if creator is not None and creator is not m:
+                deps[m].add(creator)
+
+    if maxthreads is None:
+        maxthreads = multiprocessing.cpu_count()
+    pool = None
+
+    remaining = list(managers)
+    done = set()
+    try:
+        while remaining:
+            ready = [m for m in remaining if deps[m] <= done]
+            if not ready:
+                # dependency cycle, so leave plugins to update each other
+                ready = remaining
+
+            serial = [m for m in ready
+                      if m.inputkey is None or m.helper._usedall]
+            parallel = [m for m in ready if m not in serial]
+            for m in serial:
+                m.update()
+
+            if len(parallel) > 1 and maxthreads > 1:
+                # read derived inputs in this thread, as they may
+                # evaluate expressions, which is not thread safe
+                for m in parallel:
+                    for name in m.helper._usednames:
+                        ds = m.document.data.get(name)
+                        if ds is not None and not ds.editable:
+                            ds.data
+                if pool is None:
+                    pool = ThreadPool(min(len(remaining), maxthreads))
+                pool.map(lambda m: m.update(), parallel)
+            else:
+                for m in parallel:
+                    m.update()
+
+            done.update(ready)
+            remaining = [m for m in remaining if m not in done]
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return [ (m, m.updatetime) for m, v in czip(managers, versions)
+             if m.version != v ]
 
 class DatasetPlugin(object):
     """Base class for defining dataset plugins."""
@@ -1824,6 +1986,14 @@ class Histogram2D(DatasetPlugin):
 
             field.FieldDataset('ds_out', _('Output 2D dataset'), dims=2),
             ]
+        self.counter = datasets.HistogramCounter()
+
+    @staticmethod
+    def _binEdges(minval, maxval, numbins):
+        """Get equally spaced bin edges (as N.histogram2d)."""
+        if minval == maxval:
+            minval, maxval = minval-0.5, maxval+0.5
+        return N.linspace(minval, maxval, numbins+1)
 
     def probabilityCalculator(self, histo):
         """Convert an image of counts to a cumulative probability
@@ -1867,9 +2037,11 @@ class Histogram2D(DatasetPlugin):
         if maxx == 'Auto': maxx = N.nanmax(dsx)
 
         # compute counts in each bin
-        histo, xedge, yedge = N.histogram2d(
-            dsy, dsx, bins=[fields['binsy'], fields['binsx']],
-            range=[[miny,maxy], [minx,maxx]], normed=False)
+        histo = self.counter.count(
+            [dsy, dsx],
+            [self._binEdges(miny, maxy, fields['binsy']),
+             self._binEdges(minx, maxx, fields['binsx'])],
+            uniform=True).astype(N.float64)
 
         m = fields['mode']
         if m == 'Count':
@@ -37,11 +37,15 @@ def _(text, disambiguation=None, context='ImportPlugin'):
 importpluginregistry = []
 
 class ImportPluginParams(object):
-    """Parameters to plugin are passed in this object."""
-    def __init__(self, filename, encoding, field_results):
+    """Parameters to plugin are passed in this object.
+
+    linked is True if the imported data will be linked to the file.
+    """
+    def __init__(self, filename, encoding, field_results, linked=False):
         self.filename = filename
         self.encoding = encoding
         self.field_results = field_results
+        self.linked = linked
 
     def openFileWithEncoding(self):
         """Helper to open filename but respecting encoding."""
@@ -445,7 +449,8 @@ class ImportPluginQdp(ImportPlugin):
         return rqdp.retndata
 
 def cnvtImportNumpyArray(name, val, errorsin2d=True):
-    """Convert a numpy array to plugin returns."""
+    """Convert a numpy array to plugin returns.
+    Numerical 1D arrays are not converted or copied."""
 
     try:
         val.shape
@@ -464,13 +469,18 @@ def cnvtImportNumpyArray(name, val, errorsin2d=True):
         # need to convert each item to proper unicode string
         return datasetplugin.DatasetText(name, [cunicode(v) for v in val])
 
-    # check whether numeric dataset
+    # check whether numeric dataset (without touching the data)
     try:
-        val + 0.
-        val = val.astype(N.float64)
+        N.zeros(0, dtype=val.dtype) + 0.
     except TypeError:
         raise ImportPluginException(_("Unsupported array type"))
 
+    if val.ndim == 1 and ( N.issubdtype(val.dtype, N.integer) or
+                           N.issubdtype(val.dtype, N.floating) ):
+        # keep type, avoiding a copy of the (possibly mapped) array
+        return datasetplugin.Dataset1DNative(name, val)
+
+    val = val.astype(N.float64)
     if val.ndim == 1:
         return datasetplugin.Dataset1D(name, val)
     elif val.ndim == 2:
@@ -513,7 +523,7 @@ class ImportPluginNpy(ImportPlugin):
         Returns (text, okaytoimport)
         """
         try:
-            retn = N.load(params.filename)
+            retn = N.load(params.filename, mmap_mode='r')
         except Exception:
             return _("Cannot read file"), False
 
@@ -535,7 +545,10 @@ class ImportPluginNpy(ImportPlugin):
             raise ImportPluginException(_("Please provide a name for the dataset"))
 
         try:
-            retn = N.load(params.filename)
+            # map file rather than reading it, unless linked, as
+            # linked files may be rewritten while mapped
+            retn = N.load(params.filename,
+                          mmap_mode=None if params.linked else 'r')
         except IOError as e:
             raise e
         except Exception as e:
@@ -639,16 +652,48 @@ class ImportPluginBinary(ImportPlugin):
         return t.newbyteorder( {"little": "<", "big": ">"} [
                 params.field_results["endian"]] )
 
+    def readData(self, params):
+        """Return array of data in file.
+
+        This is a read-only memory map of the file, unless the import
+        is linked. Linked files may be rewritten while mapped, so are
+        read into memory.
+        """
+
+        dtype = self.getNumpyDataType(params)
+        offset = params.field_results["offset"]
+        length = params.field_results["length"]
+
+        filesize = os.path.getsize(params.filename)
+        avail = max(0, filesize-offset) // dtype.itemsize
+        if length < 0:
+            length = avail
+        elif length > avail:
+            raise ValueError(_("File is too short for %i values") % length)
+
+        if length == 0:
+            # cannot map zero bytes
+            return N.zeros(0, dtype=dtype)
+        if params.linked:
+            with open(params.filename, 'rb') as f:
+                f.seek(offset)
+                data = N.fromfile(f, dtype=dtype, count=length)
+            if len(data) != length:
+                raise ValueError(_("File is too short for %i values") % length)
+            return data
+        return N.memmap(params.filename, dtype=dtype, mode='r',
+                        offset=offset, shape=(length,))
+
     def getPreview(self, params):
         """Preview of data files."""
         try:
-            f = open(params.filename, "rb")
-            data = f.read()
-            f.close()
+            with open(params.filename, "rb") as f:
+                data = f.read(65536)
+            filesize = os.path.getsize(params.filename)
         except EnvironmentError as e:
             return _("Cannot read file (%s)") % cstrerror(e), False
 
-        text = [_('File length: %i bytes') % len(data)]
+        text = [_('File length: %i bytes') % filesize]
 
         def filtchr(c):
             """Filtered character to ascii range."""
@@ -679,23 +724,15 @@ class ImportPluginBinary(ImportPlugin):
             raise ImportPluginException(_("Please provide a name for the dataset"))
 
         try:
-            f = open(params.filename, "rb")
-            f.seek( params.field_results["offset"] )
-            retn = f.read()
-            f.close()
+            data = self.readData(params)
         except EnvironmentError as e:
             raise ImportPluginException(_("Error while reading file '%s'\n\n%s") %
                                         (params.filename, cstrerror(e)))
-
-        try:
-            data = N.fromstring(retn, dtype=self.getNumpyDataType(params),
-                                count=params.field_results["length"])
         except ValueError as e:
             raise ImportPluginException(_("Error converting data for file '%s'\n\n%s") %
                                         (params.filename, cstr(e)))
 
-        data = data.astype(N.float64)
-        return [ datasetplugin.Dataset1D(name, data) ]
+        return [ datasetplugin.Dataset1DNative(name, data) ]
 
 class ImportPluginGnuplot2D(ImportPlugin):
     """A Veusz plugin for reading data in Gnuplot 2D data format from a file."""
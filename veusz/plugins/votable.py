@@ -21,10 +21,17 @@ from ..compat import CStringIO, CBytesIO, curlrequest
 from .importplugin import ImportPlugin, importpluginregistry
 from .datasetplugin import Dataset1D, DatasetText
 
-try:
-    from astropy.io.votable.table import parse
-except ImportError:
-    parse = None
+def _haveAstropy():
+    """Is astropy available? (checked without importing it)"""
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        # Python 2
+        from pkgutil import find_loader as find_spec
+    return find_spec('astropy') is not None
+
+_hasastropy = _haveAstropy()
+if not _hasastropy:
     print('VO table import: astropy module not available')
 
 class ImportPluginVoTable(ImportPlugin):
@@ -33,6 +40,9 @@ class ImportPluginVoTable(ImportPlugin):
     description = 'Reads datasets from VO tables'
 
     def _load_votable(self, params):
+        # astropy is slow to import, so only import when needed
+        from astropy.io.votable.table import parse
+
         if 'url' in params.field_results:
             try:
                 buff = CStringIO(curlrequest.urlopen(
@@ -92,5 +102,5 @@ class ImportPluginVoTable(ImportPlugin):
 
         return ('\n'.join(summary), True)
 
-if parse is not None:
+if _hasastropy:
     importpluginregistry += [ImportPluginVoTable]
@@ -48,30 +48,55 @@ def wrap(text, width):
     return "\n\n".join(out)
 
 class DatasetNode(TMNode):
-    """Node for a dataset."""
+    """Node for a dataset.
+
+    The node data only contains the dataset name. The values of the
+    other columns are computed when they are first requested and are
+    cached until the dataset changes.
+    """
 
     def __init__(self, model, dsname, cols, parent):
-        ds = model.doc.data[dsname]
-        data = []
         assert cols[0] == "name"
-        for c in cols:
-            if c == "name":
-                data.append( dsname )
-            elif c == "size":
-                data.append( ds.userSize() )
-            elif c == "type":
-                data.append( ds.dstype )
-            elif c == "linkfile":
-                data.append( os.path.basename(datasetLinkFile(ds)) )
-            elif c == "check":
-                data.append( dsname in model.checked_datasets )
-
-        TMNode.__init__(self, tuple(data), parent)
+        TMNode.__init__(self, (dsname,), parent)
         self.model = model
         self.cols = cols
         self.dsname = dsname
+        self.cachekey = None
+        self.cachevals = None
+
+    def columnValues(self):
+        """Get tuple of column values (except for check columns)."""
+        key = self.model.doc.datasetChangeKey(self.dsname)
+        if key != self.cachekey:
+            ds = self.model.doc.data.get(self.dsname)
+            vals = []
+            for c in self.cols:
+                if ds is None or c == "check":
+                    vals.append(None)
+                elif c == "name":
+                    vals.append( self.dsname )
+                elif c == "size":
+                    vals.append( ds.userSize() )
+                elif c == "type":
+                    vals.append( ds.dstype )
+                elif c == "linkfile":
+                    vals.append( os.path.basename(datasetLinkFile(ds)) )
+            self.cachevals = tuple(vals)
+            self.cachekey = key
+        return self.cachevals
+
+    def nodeData(self, column):
+        """Get data for column."""
+        try:
+            c = self.cols[column]
+        except IndexError:
+            return None
+        if c == "check":
+            return self.dsname in self.model.checked_datasets
+        return self.columnValues()[column]
 
-    def getPreviewPixmap(self, ds):
+    @staticmethod
+    def getPreviewPixmap(ds):
         """Get a preview pixmap for a dataset."""
         size = (140, 70)
         if ds.dimensions != 1 or ds.datatype != "numeric":
@@ -138,7 +163,7 @@ class DatasetNode(TMNode):
         elif c == "size" or (c == 'type' and 'size' not in self.cols):
             text = ds.userPreview()
             # add preview of dataset if possible
-            pix = self.getPreviewPixmap(ds)
+            pix = self.model.previewPixmap(self.dsname)
             if pix:
                 text = text.replace("\n", "<br>")
                 text = "<html>%s<br>%s</html>" % (text, utils.pixmapAsHtml(pix))
@@ -188,10 +213,17 @@ class FilenameNode(TMNode):
 def treeFromList(nodelist, rootdata):
     """Construct a tree from a list of nodes."""
     tree = TMNode( rootdata, None )
-    for node in nodelist:
-        tree.insertChildSorted(node)
+    addChildrenSorted(tree, nodelist)
     return tree
 
+def addChildrenSorted(parent, nodelist):
+    """Add list of nodes to parent, sorted by their data.
+    This is much quicker than inserting each sorted node in turn."""
+    nodelist = sorted(nodelist, key=lambda n: n.data)
+    for node in nodelist:
+        node.parent = parent
+    parent.childnodes += nodelist
+
 class DatasetRelationModel(TreeModel):
     """A model to show how the datasets are related to each file."""
     def __init__(self, doc, grouping="filename", readonly=False,
@@ -215,9 +247,27 @@ class DatasetRelationModel(TreeModel):
         self.filterdtype = filterdtype
         self.checkable = checkable
         self.checked_datasets = set()
+        # cache of preview pixmaps: name -> (key, pixmap)
+        self.previewcache = {}
+        # value of doc.datachangeset when the tree was last built
+        self.builtchangeset = None
         self.refresh()
 
-        doc.signalModified.connect(self.refresh)
+        doc.signalModified.connect(self.slotDocModified)
+
+    def previewPixmap(self, name):
+        """Get cached preview pixmap for dataset with name."""
+        key = self.doc.datasetChangeKey(name)
+        try:
+            cachekey, pix = self.previewcache[name]
+            if cachekey == key:
+                return pix
+        except KeyError:
+            pass
+        ds = self.doc.data.get(name)
+        pix = None if ds is None else DatasetNode.getPreviewPixmap(ds)
+        self.previewcache[name] = (key, pix)
+        return pix
 
     def datasetFilterOut(self, ds, node):
         """Should dataset be filtered out by filter options."""
@@ -230,7 +280,7 @@ class DatasetRelationModel(TreeModel):
             if any([t.find(self.filter) >= 0 for t in ds.tags
                     if isinstance(t, cbasestr)]):
                 keep = True
-            if any([t.find(self.filter) >= 0 for t in node.data
+            if any([t.find(self.filter) >= 0 for t in node.columnValues()
                     if isinstance(t, cbasestr)]):
                 keep = True
         # check dimensions haven't been filtered
@@ -257,12 +307,14 @@ class DatasetRelationModel(TreeModel):
             cols += [_('check')]
 
         tree = TMNode(heads , None)
+        children = []
         for name, ds in citems(self.doc.data):
             child = DatasetNode(self, name, cols, None)
 
             # add if not filtered for filtering
             if not self.datasetFilterOut(ds, child):
-                tree.insertChildSorted(child)
+                children.append(child)
+        addChildrenSorted(tree, children)
         return tree
 
     def makeGrpTree(self, coltitles, colitems, grouper, GrpNodeClass):
@@ -277,21 +329,23 @@ class DatasetRelationModel(TreeModel):
             coltitles = coltitles + [_('Select')]
             colitems = colitems + [_('check')]
 
-        grpnodes = {}
+        grpchildren = {}
         for name, ds in citems(self.doc.data):
             child = DatasetNode(self, name, colitems, None)
 
             # check whether filtered out
             if not self.datasetFilterOut(ds, child):
-                # get group
-                grps = grouper(ds)
-                for grp in grps:
-                    if grp not in grpnodes:
-                        grpnodes[grp] = GrpNodeClass( (grp,), None )
-                    # add to group
-                    grpnodes[grp].insertChildSorted(child)
+                # add to each group
+                for grp in grouper(ds):
+                    grpchildren.setdefault(grp, []).append(child)
 
-        return treeFromList(list(grpnodes.values()), coltitles)
+        grpnodes = []
+        for grp, children in citems(grpchildren):
+            grpnode = GrpNodeClass( (grp,), None )
+            addChildrenSorted(grpnode, children)
+            grpnodes.append(grpnode)
+
+        return treeFromList(grpnodes, coltitles)
 
     def makeGrpTreeFilename(self):
         """Make a tree of datasets grouped by linked file."""
@@ -373,10 +427,38 @@ class DatasetRelationModel(TreeModel):
                 self.checked_datasets.add(name)
             else:
                 self.checked_datasets.remove(name)
-            # emitted by refresh: self.dataChanged.emit(idx, idx)
-            self.refresh()
+            self.dataChanged.emit(idx, idx)
             return True
 
+    def emitAllChanged(self, parentidx=qt4.QModelIndex()):
+        """Tell views that the column values of all the nodes may
+        have changed, so they are recomputed when next shown."""
+        rows = self.rowCount(parentidx)
+        if rows == 0:
+            return
+        self.dataChanged.emit(
+            self.index(0, 0, parentidx),
+            self.index(rows-1, self.columnCount(parentidx)-1, parentidx))
+        for row in crange(rows):
+            idx = self.index(row, 0, parentidx)
+            if self.rowCount(idx) > 0:
+                self.emitAllChanged(idx)
+
+    @qt4.pyqtSlot()
+    def slotDocModified(self):
+        """Update tree when document is modified.
+
+        The tree structure is only rebuilt if datasets have been
+        changed, or if the structure could depend on derived datasets
+        (size grouping or filtering). Otherwise the values shown are
+        simply updated."""
+
+        if ( self.doc.datachangeset != self.builtchangeset or
+             self.grouping == "size" or self.filter ):
+            self.refresh()
+        else:
+            self.emitAllChanged()
+
     @qt4.pyqtSlot()
     def refresh(self):
         """Update tree of datasets when document changes."""
@@ -390,6 +472,14 @@ class DatasetRelationModel(TreeModel):
             }[self.grouping]()
 
         self.syncTree(tree)
+        self.builtchangeset = self.doc.datachangeset
+
+        # remove previews of datasets which no longer exist
+        for name in list(self.previewcache):
+            if name not in self.doc.data:
+                del self.previewcache[name]
+
+        self.emitAllChanged()
 
 class DatasetsNavigatorTree(qt4.QTreeView):
     """Tree view for dataset names."""
@@ -1250,7 +1250,7 @@ class DatasetExtended(Dataset):
                 self.val, datatype=self.datatype, dimensions=self.dimensions)
             if ds:
                 # get numpy array of values
-                return N.array(ds.data)
+                return N.array(ds.data, dtype=N.float64)
         else:
             # list of values
             return N.array(self.val)
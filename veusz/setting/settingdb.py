@@ -40,12 +40,27 @@ defaultValues = {
     'export_quality': 85,
     'export_background': '#ffffff00',
     'export_SVG_text_as_text': False,
+    'export_SVG_streaming': False,
 
     # plot options
     'plot_updatepolicy': -1, # update on document changed
     'plot_antialias': True,
     'plot_numthreads': 2,
 
+    # memory limit of undo history in MB (0 for no limit)
+    'undo_memory_limit': 1024,
+    # store large arrays in the undo history in temporary files
+    'undo_spill': False,
+
+    # cache imported data on disk
+    'import_cache': False,
+    # directory for import cache (blank for default)
+    'import_cache_dir': '',
+    # maximum size of import cache in MB
+    'import_cache_size': 4096,
+    # keep compact numerical types when importing HDF5 and FITS data
+    'compact_datasets': False,
+
     # recent files list
     'main_recentfiles': [],
 
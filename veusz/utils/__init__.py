@@ -21,11 +21,11 @@
 from .version import *
 from .textrender import Renderer, FontMetrics, latexEscape
 from .safe_eval import compileChecked, SafeEvalException
-from .fitlm import fitLM
+from .fitlm import fitLM, FitterLM, FitResult
 
 from .utilfuncs import *
 from .points import getPointPainterPath, MarkerCodes, plotMarkers, \
-    plotMarker, ArrowCodes, plotLineArrow
+    plotMarker, ArrowCodes, plotLineArrow, plotLineArrows
 from .action import *
 from .dates import *
 from .formatting import *
@@ -36,4 +36,5 @@ from .feedback import feedback, FeedbackCheckThread, disableFeedback
 from ..helpers.qtloops import addNumpyToPolygonF, plotPathsToPainter, \
     plotLinesToPainter, plotClippedPolyline, polygonClip, \
     plotClippedPolygon, plotBoxesToPainter, addNumpyPolygonToPath, \
-    resampleLinearImage, RotatedRectangle, RectangleOverlapTester
+    resampleLinearImage, RotatedRectangle, RectangleOverlapTester, \
+    plotArrowsToPainter, dataRange
@@ -22,6 +22,7 @@ Numerical fitting of functions to data.
 
 from __future__ import division, print_function
 import sys
+import time
 
 import numpy as N
 try:
@@ -31,6 +32,253 @@ except:
 
 from ..compat import crange
 
+class FitResult(object):
+    """Results of a fit.
+
+    params: best fitting parameters
+    errors: 1-sigma parameter errors from the covariance matrix (or None)
+    chi2: chi^2 of best fit
+    dof: degrees of freedom
+    iters: number of accepted iterations
+    nevals: number of function evaluations (batched evaluations count 1)
+    converged: whether the fit converged
+    elapsed: time taken in seconds
+    message: description of how the fit stopped
+    """
+
+    def __init__(self, params, errors, chi2, dof, iters, nevals,
+                 converged, elapsed, message):
+        self.params = params
+        self.errors = errors
+        self.chi2 = chi2
+        self.dof = dof
+        self.iters = iters
+        self.nevals = nevals
+        self.converged = converged
+        self.elapsed = elapsed
+        self.message = message
+
+    @property
+    def redchi2(self):
+        """Reduced chi^2 (or -1 if no degrees of freedom)."""
+        return self.chi2 / self.dof if self.dof > 0 else -1.
+
+class FitterLM(object):
+    """Levenberg-Marquardt fitter (as described in Bevington & Robinson).
+
+    The derivatives of the function are computed by finite differences.
+    If possible, the function is evaluated for all the offset parameter
+    sets in a single call, by passing params as an array with shape
+    (nparams, nsets, 1), so that each parameter broadcasts against the
+    x values. If the function does not support this, it is called once
+    for each parameter.
+    """
+
+    def __init__(self, func, xvals, yvals, errors=None, weights=None,
+                 bounds=None,
+                 stopdeltalambda=1e-5,
+                 deltaderiv=1e-5, maxiters=20, Lambda=1e-4,
+                 callback=None):
+        """
+        func(params, xvals) is a python function to evaluate the model
+        for the parameters given.
+
+        xvals are x data points (numpy), yvals are the y data points
+        errors are errors on the y data points (None for 1)
+        weights are optional weights for each data point
+        bounds is None or a list of (min, max) for each parameter,
+          where min or max may be None
+
+        stopdeltalambda: minimum change in chi2 to carry on fitting
+        deltaderiv: change to make in parameters to calculate derivative
+        maxiters: maximum number of better fitting solutions before stopping
+        Lambda: starting lambda value (as described in Bevington)
+        callback(iters, chi2, params) is called after each improvement
+        """
+
+        self.func = func
+        self.xvals = xvals
+        self.yvals = yvals
+
+        # weight of each point in chi2
+        if errors is None:
+            wt = N.ones(len(yvals), dtype=N.float64)
+        else:
+            wt = 1. / errors**2
+        if weights is not None:
+            wt = wt * weights
+        self.wt = wt
+
+        self.bounds = bounds
+        self.stopdeltalambda = stopdeltalambda
+        self.deltaderiv = deltaderiv
+        self.maxiters = maxiters
+        self.Lambda = Lambda
+        self.callback = callback
+
+        # None: untested, True/False: whether func supports batching
+        self.batched = None
+        self.nevals = 0
+
+    def _boundArrays(self, nparams):
+        """Get arrays of minimum and maximum parameter values."""
+        lo = N.full(nparams, -N.inf)
+        hi = N.full(nparams, N.inf)
+        if self.bounds is not None:
+            for i, (bmin, bmax) in enumerate(self.bounds):
+                if bmin is not None:
+                    lo[i] = bmin
+                if bmax is not None:
+                    hi[i] = bmax
+        return lo, hi
+
+    def _eval(self, params):
+        """Evaluate function for parameters."""
+        self.nevals += 1
+        return self.func(params, self.xvals)
+
+    def _evalBatched(self, paramsets):
+        """Evaluate function for each row of paramsets in one call.
+
+        Returns None if the function cannot be evaluated this way."""
+
+        nsets = len(paramsets)
+        try:
+            self.nevals += 1
+            out = self.func(paramsets.T[:,:,N.newaxis], self.xvals)
+        except Exception:
+            return None
+
+        out = N.asarray(out)
+        if out.shape != (nsets, len(self.xvals)):
+            return None
+
+        if self.batched is None:
+            # check result against an unbatched evaluation, in case
+            # the function does something which does not broadcast
+            # (e.g. a sum over the values)
+            single = self._eval(paramsets[-1])
+            if not N.allclose(out[-1], single, rtol=1e-12, atol=0.,
+                               equal_nan=True):
+                return None
+            self.batched = True
+
+        return out
+
+    def _derivs(self, params, modelvals, steps):
+        """Compute derivatives of the model for each parameter."""
+
+        nparams = len(params)
+        paramsets = params + N.diag(steps)
+
+        out = None
+        if self.batched is not False:
+            out = self._evalBatched(paramsets)
+            if out is None:
+                self.batched = False
+
+        if out is None:
+            out = N.empty((nparams, len(self.xvals)), dtype=N.float64)
+            for i in crange(nparams):
+                out[i] = self._eval(paramsets[i])
+
+        return (out - modelvals) * (1. / steps)[:,N.newaxis]
+
+    def _chi2(self, modelvals):
+        return ((modelvals - self.yvals)**2 * self.wt).sum()
+
+    def fit(self, params):
+        """Fit the function, starting from the parameters given.
+
+        Returns a FitResult."""
+
+        starttime = time.time()
+        self.nevals = 0
+
+        params = N.array(params, dtype=N.float64)
+        nparams = len(params)
+        lo, hi = self._boundArrays(nparams)
+        params = N.clip(params, lo, hi)
+        wt = self.wt
+        Lambda = self.Lambda
+
+        # work out fit using current parameters
+        modelvals = self._eval(params)
+        chi2 = self._chi2(modelvals)
+
+        done = False
+        message = ''
+        iters = 0
+        alpha = None
+        while iters < self.maxiters and not done:
+            # step parameters away from upper bound to get derivatives
+            steps = N.where(
+                params + self.deltaderiv > hi,
+                -self.deltaderiv, self.deltaderiv)
+            derivs = self._derivs(params, modelvals, steps)
+
+            # beta is -0.5*dchi2/dparam
+            beta = N.dot(derivs, (self.yvals - modelvals)*wt)
+            # alpha is curvature matrix
+            alpha = N.dot(derivs*wt, derivs.T)
+
+            # twiddle alpha using lambda
+            talpha = alpha * (1. + N.identity(nparams)*Lambda)
+
+            # now work out deltas on parameters to get better fit
+            try:
+                deltas = NLA.solve(talpha, beta)
+            except NLA.LinAlgError:
+                deltas = None
+
+            if deltas is not None:
+                new_params = N.clip(params+deltas, lo, hi)
+                new_modelvals = self._eval(new_params)
+                new_chi2 = self._chi2(new_modelvals)
+
+                if N.isnan(new_chi2):
+                    message = 'Chi2 is NaN. Aborting fit.'
+                    break
+
+            if deltas is None or new_chi2 > chi2:
+                # if solution is worse, increase lambda
+                Lambda *= 10.
+                if not N.isfinite(Lambda):
+                    message = 'Fit did not converge.'
+                    break
+            else:
+                # better fit, so we accept this solution
+
+                # if the change is small
+                done = chi2 - new_chi2 < self.stopdeltalambda
+
+                chi2 = new_chi2
+                params = new_params
+                modelvals = new_modelvals
+                Lambda *= 0.1
+
+                iters += 1
+                if self.callback is not None:
+                    self.callback(iters, chi2, params)
+
+        if done:
+            message = 'Fit converged.'
+        elif not message:
+            message = 'Maximum number of iterations reached.'
+
+        # estimate errors from covariance matrix
+        errors = None
+        if alpha is not None:
+            try:
+                covar = NLA.inv(alpha)
+                errors = N.sqrt(N.abs(N.diag(covar)))
+            except NLA.LinAlgError:
+                pass
+
+        return FitResult(
+            params, errors, chi2, len(self.yvals) - nparams,
+            iters, self.nevals, done, time.time() - starttime, message)
+
 def fitLM(func, params, xvals, yvals, errors,
           stopdeltalambda = 1e-5,
           deltaderiv = 1e-5, maxiters = 20, Lambda = 1e-4):
@@ -53,92 +301,22 @@ def fitLM(func, params, xvals, yvals, errors,
     deltaderiv: change to make in parameters to calculate derivative
     maxiters: maximum number of better fitting solutions before stopping
     Lambda: starting lambda value (as described in Bevington)
-    """
-
-    # optimisation to avoid computing this all the time
-    inve2 = 1. / errors**2
-
-    # work out fit using current parameters
-    oldfunc = func(params, xvals)
-    chi2 = ( (oldfunc - yvals)**2 * inve2 ).sum()
-
-    # initialise temporary space
-    beta = N.zeros( len(params), dtype='float64' )
-    alpha = N.zeros( (len(params), len(params)), dtype='float64' )
-    derivs = N.zeros( (len(params), len(xvals)), dtype='float64' )
-
-    done = False
-    iters = 0
-    while iters < maxiters and not done:
-        # iterate over each of the parameters and calculate the derivatives
-        # of chi2 to populate the beta vector
-
-        # also calculate the derivative of the function at each of the points
-        # wrt the parameters
-
-        for i in crange( len(params) ):
-            params[i] += deltaderiv
-            new_func = func(params, xvals)
-            chi2_new = ((new_func - yvals)**2 * inve2).sum()
-            params[i] -= deltaderiv
-
-            beta[i] = chi2_new - chi2
-            derivs[i] = new_func - oldfunc
-
-        # beta is now dchi2 / dparam
-        beta *= (-0.5 / deltaderiv)
-        derivs *= (1. / deltaderiv)
-
-        # calculate alpha matrix
-        # FIXME: stupid - must be a better way to avoid this iteration
-        for j in crange( len(params) ):
-            for k in crange(j+1):
-                v = (derivs[j]*derivs[k] * inve2).sum()
-                alpha[j][k] = v
-                alpha[k][j] = v
-
-        # twiddle alpha using lambda
-        alpha *= 1. + N.identity(len(params), dtype='float64')*Lambda
-
-        # now work out deltas on parameters to get better fit
-        deltas = NLA.solve(alpha, beta)
-
-        # new solution
-        new_params = params+deltas
-        new_func = func(new_params, xvals)
-        new_chi2 = ( (new_func - yvals)**2 * inve2 ).sum()
-
-        if N.isnan(new_chi2):
-            sys.stderr.write('Chi2 is NaN. Aborting fit.\n')
-            break
-
-        if new_chi2 > chi2:
-            # if solution is worse, increase lambda
-            Lambda *= 10.
-        else:
-            # better fit, so we accept this solution
 
-            # if the change is small
-            done = chi2 - new_chi2 < stopdeltalambda
-
-            chi2 = new_chi2
-            params = new_params
-            oldfunc = new_func
-            Lambda *= 0.1
+    Returns (params, chi2, dof). Use FitterLM for more information
+    about the fit.
+    """
 
-            # format new parameters
-            iters += 1
-            p = [iters, chi2] + params.tolist()
-            str = ("%5i " + "%8g " * (len(params)+1)) % tuple(p)
-            print(str)
+    fitter = FitterLM(
+        func, xvals, yvals, errors=errors,
+        stopdeltalambda=stopdeltalambda, deltaderiv=deltaderiv,
+        maxiters=maxiters, Lambda=Lambda)
+    res = fitter.fit(params)
 
-    if not done:
-        sys.stderr.write("Warning: maximum number of iterations reached\n")
+    if not res.converged:
+        sys.stderr.write('Warning: %s\n' % res.message)
 
     # print out fit statistics at end
-    dof = len(yvals) - len(params)
-    redchi2 = chi2 / dof
-    print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (chi2, dof, redchi2))
-
-    return (params, chi2, dof)
+    print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (
+        res.chi2, res.dof, res.redchi2))
 
+    return (res.params, res.chi2, res.dof)
@@ -22,7 +22,7 @@ from __future__ import division
 from .. import qtall as qt4
 import numpy as N
 
-from ..helpers.qtloops import plotPathsToPainter
+from ..helpers.qtloops import plotPathsToPainter, plotArrowsToPainter
 
 from . import colormap
 
@@ -506,6 +506,40 @@ ArrowCodes = ( 'none', 'arrow', 'arrownarrow',
                'lineextend',
                )
 
+def plotLineArrows(painter, xpos, ypos, lengths, angles,
+                   arrowsize=0, scaling=None,
+                   arrowleft='none', arrowright='none', clip=None):
+    """Plot a set of lines or arrows.
+
+    This is the same as calling plotLineArrow for each line, but is
+    much faster.
+
+    xpos, ypos: arrays of starting points of lines
+    lengths, angles: arrays of lengths and angles (degrees) of lines
+    arrowsize: size of arrows
+    scaling: scale arrow size by array, or don't if None
+    arrowleft, arrowright: arrow codes
+    clip: rectangle if clipping wanted
+    """
+
+    painter.save()
+
+    pen = painter.pen()
+    pen.setJoinStyle(qt4.Qt.MiterJoin)
+    painter.setPen(pen)
+
+    linewidth = pen.widthF()
+    rightpath, rightfill = getPointPainterPath(
+        arrow_translate[arrowright], arrowsize, linewidth)
+    leftpath, leftfill = getPointPainterPath(
+        arrow_translate[arrowleft], arrowsize, linewidth)
+
+    plotArrowsToPainter(
+        painter, xpos, ypos, lengths, angles, scaling,
+        rightpath, rightfill, leftpath, leftfill, clip)
+
+    painter.restore()
+
 def plotLineArrow(painter, xpos, ypos, length, angle,
                   arrowsize=0,
                   arrowleft='none', arrowright='none'):
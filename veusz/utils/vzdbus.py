@@ -30,6 +30,9 @@ try:
     from dbus.service import method, Object
     from dbus.mainloop.qt import DBusQtMainLoop
 
+    # file descriptor passing needs a recent dbus-python
+    UnixFd = getattr(dbus.types, 'UnixFd', None)
+
     def setup():
         """Initialise dbus."""
 
@@ -51,6 +54,8 @@ try:
 except ImportError:
     # no DBus, so we try to make the interface do nothing
 
+    UnixFd = None
+
     def setup():
         pass
 
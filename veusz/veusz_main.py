@@ -26,6 +26,11 @@ import os.path
 import signal
 import argparse
 
+if '--import-times' in sys.argv:
+    # start recording before the other veusz modules are imported
+    from veusz import importtimes
+    importtimes.install()
+
 import veusz
 from veusz.compat import czip, cbytes, cstr
 from veusz import qtall as qt
@@ -141,11 +146,22 @@ class ImportThread(qt.QThread):
     '''Do import of main code within another thread.
     Main application runs when this is done
     '''
+
+    def __init__(self, preload):
+        qt.QThread.__init__(self)
+        self.preload = preload
+
     def run(self):
         from veusz import setting
         from veusz import widgets
         from veusz import dataimport
 
+        if self.preload:
+            # the user interface will need these, so import them now
+            # while the splash screen is shown (otherwise they are
+            # imported when first used)
+            dataimport.loadImportTabs()
+
 class VeuszApp(qt.QApplication):
     """Event which can open mac files."""
 
@@ -196,6 +212,10 @@ class VeuszApp(qt.QApplication):
         parser.add_argument(
             '--translation', metavar='FILE',
             help='load the translation .qm file given')
+        parser.add_argument(
+            '--import-times',
+            action='store_true',
+            help='write the time taken to import modules on exit')
         parser.add_argument(
             'docs', metavar='FILE', nargs='*',
             help='document to load')
@@ -259,12 +279,13 @@ class VeuszApp(qt.QApplication):
     def startup(self):
         """Do startup."""
 
-        if not (self.args.listen or self.args.export):
+        interactive = not (self.args.listen or self.args.export)
+        if interactive:
             # show the splash screen on normal start
             self.splash = makeSplash(self)
             self.splash.show()
 
-        self.thread = ImportThread()
+        self.thread = ImportThread(interactive)
         self.thread.finished.connect(self.slotStartApplication)
         self.thread.start()
 
@@ -655,7 +655,9 @@ class Axis(widget.Widget):
     def dataToPlotterCoords(self, posn, data):
         """Convert data values to plotter coordinates, scaling if necessary."""
         self.updateAxisLocation(posn)
-        return self._graphToPlotter(data*self.settings.datascale)
+        # converts compact (single precision or integer) data to doubles
+        return self._graphToPlotter(
+            N.multiply(data, self.settings.datascale, dtype=N.float64))
 
     def plotterToGraphCoords(self, bounds, vals):
         """Convert plotter coordinates on this axis to graph coordinates.
@@ -38,14 +38,14 @@ class AxisError(RuntimeError):
 class FunctionError(AxisError):
     pass
 
-def solveFunction(function, vals, mint=None, maxt=None):
-    '''Solve a function for a list of values (vals), if we don't know
-    where the solution lies. function is a function to call.
-
-    This tries a range of possible input values, and uses binary
-    search to refine the solution.
+def functionGrid(function, mint=None, maxt=None):
+    '''Evaluate function on a grid of values spanning many orders of
+    magnitude, for finding where solutions lie.
 
     mint and maxt are the bounds to use when solving
+
+    Returns (xvals, yvals), where yvals is increasing. Raises
+    FunctionError if the function is not suitable.
     '''
 
     xvals = N.array(
@@ -103,69 +103,70 @@ def solveFunction(function, vals, mint=None, maxt=None):
         yfilt = yfilt[::-1]
         xfilt = xfilt[::-1]
 
-    # do binary search for each input value
-    out = []
-    for thisval in vals:
-        # renorm to zero
-        ydelta = yfilt - thisval
-
-        # solution is between this and the next
-        idx = N.searchsorted(ydelta, 0.)
-        if idx == 0:
-            if ydelta[0] == 0.:
-                # work around value being at start of array
-                idx = 1
-            else:
-                raise AxisError(_('No solution found'))
-        elif idx == len(ydelta):
-            raise AxisError(_('No solution found'))
-
-        x1, x2 = xfilt[idx-1], xfilt[idx]
-        y1, y2 = ydelta[idx-1], ydelta[idx]
-
-        # binary search
-        tol = abs(1e-6 * thisval)
-        for i in crange(30):
-            # print x1, y1, "->", x2, y2
+    return xfilt, yfilt
 
-            if abs(y1) <= tol and abs(y1) < abs(y2):
-                x2, y2 = x1, y1
-                break   # found solution
-            if abs(y2) <= tol:
-                x1, y1 = x2, y2
-                break   # found solution
-
-            if y1 == y2 or ((y1<0) and (y2<0)) or ((y1>0) and (y2>0)):
-                raise AxisError(_('No solution found'))
+def solveFunction(function, vals, mint=None, maxt=None, grid=None):
+    '''Solve a function for a list of values (vals), if we don't know
+    where the solution lies. function is a function to call.
 
-            ### This is a bit faster, but bisection is simpler
-            # xv = N.linspace(x1, x2, num=100)
-            # yv = function(xv) + xv*0. - thisval
+    This tries a range of possible input values, and uses binary
+    search to refine the solution. The search is done for all the
+    values at once.
 
-            # idx = N.searchsorted(yv, 0.)
-            # if idx == 0:
-            #     idx = 1
+    mint and maxt are the bounds to use when solving
+    grid is the optional output of functionGrid for these values
 
-            # x1 = xv[idx-1]
-            # y1 = yv[idx-1]
-            # x2 = xv[idx]
-            # y2 = yv[idx]
+    Returns a numpy array of solutions.
+    '''
 
-            x3 = 0.5*(x1+x2)
-            y3 = function(x3) - thisval
-            if not N.isfinite(y3):
-                raise AxisError(_('Non-finite value encountered'))
+    if grid is None:
+        grid = functionGrid(function, mint=mint, maxt=maxt)
+    xfilt, yfilt = grid
+
+    vals = N.array(vals, dtype=N.float64).ravel()
+
+    # solution is between idx-1 and idx
+    idx = N.searchsorted(yfilt, vals)
+    # work around value being at start of array
+    idx[(idx == 0) & (yfilt[0] == vals)] = 1
+    if N.any(idx == 0) or N.any(idx == len(yfilt)):
+        raise AxisError(_('No solution found'))
+
+    x1, x2 = xfilt[idx-1], xfilt[idx]
+    y1, y2 = yfilt[idx-1]-vals, yfilt[idx]-vals
+
+    # binary search, for values which are not yet solved
+    tol = N.abs(1e-6 * vals)
+    active = N.ones(len(vals), dtype=bool)
+    for i in crange(30):
+        # found solutions
+        done1 = active & (N.abs(y1) <= tol) & (N.abs(y1) < N.abs(y2))
+        x2[done1] = x1[done1]
+        done2 = active & ~done1 & (N.abs(y2) <= tol)
+        x1[done2] = x2[done2]
+        active &= ~(done1 | done2)
+
+        a = N.nonzero(active)[0]
+        if len(a) == 0:
+            break
+
+        ay1, ay2 = y1[a], y2[a]
+        if N.any( (ay1 == ay2) | ((ay1<0) & (ay2<0)) | ((ay1>0) & (ay2>0)) ):
+            raise AxisError(_('No solution found'))
 
-            if y3 < 0:
-                x1 = x3
-                y1 = y3
-            else:
-                x2 = x3
-                y2 = y3
+        x3 = 0.5*(x1[a]+x2[a])
+        y3 = function(x3) + N.zeros(len(x3)) - vals[a]
+        if not N.all(N.isfinite(y3)):
+            raise AxisError(_('Non-finite value encountered'))
 
-        out.append(0.5*(x1+x2))
+        low = y3 < 0
+        lo, hi = a[low], a[~low]
+        x1[lo] = x3[low]
+        y1[lo] = y3[low]
+        x2[hi] = x3[~low]
+        y2[hi] = y3[~low]
 
-    return out
+    return 0.5*(x1+x2)
 
 class AxisFunction(axis.Axis):
     '''An axis using an function of another axis.'''
@@ -177,6 +178,7 @@ class AxisFunction(axis.Axis):
         axis.Axis.__init__(self, *args, **argsv)
 
         self.cachedfuncobj = None
+        self.cachedgrid = None
         self.cachedbounds = None
         self.funcchangeset = -1
         self.boundschangeset = -1
@@ -258,14 +260,13 @@ class AxisFunction(axis.Axis):
                     return N.nan + t
             self.cachedfuncobj = function
 
+            # check function and keep grid of values for solving
             mint, maxt = self.getMinMaxT()
             try:
-                solveFunction(function, [0.], mint=mint, maxt=maxt)
+                self.cachedgrid = functionGrid(function, mint=mint, maxt=maxt)
             except FunctionError as e:
                 self.logError(e)
                 self.cachedfuncobj = None
-            except AxisError:
-                pass
 
         return self.cachedfuncobj
 
@@ -274,9 +275,8 @@ class AxisFunction(axis.Axis):
         fn = self.getFunction()
         if fn is None:
             return None
-        mint, maxt = self.getMinMaxT()
         try:
-            return solveFunction(fn, vals, mint=mint, maxt=maxt)
+            return solveFunction(fn, vals, grid=self.cachedgrid)
         except Exception as e:
             self.logError(e)
             return None
@@ -34,19 +34,26 @@ def _(text, disambiguation=None, context='BoxPlot'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-def percentile(sortedds, perc):
-    """Given a sorted dataset, get the percentile perc.
+def _percentileIndices(num, perc):
+    """Get indices to interpolate between, and the fraction, for the
+    percentile perc of num sorted values."""
+    frac, index = math.modf(perc * 0.01 * (num-1))
+    index = int(index)
+    return index, min(index+1, num-1), frac
 
-    Interpolates between data points."""
+def percentilesPartition(data, percs):
+    """Get percentiles percs of unsorted data.
 
-    index = perc * 0.01 * (sortedds.shape[0]-1)
+    data are partially sorted in place with N.partition, which is
+    faster than a full sort. Interpolates between data points."""
 
-    # interpolate between indices
-    frac, index = math.modf(index)
-    index = int(index)
-    indexplus1 = min(index+1, sortedds.shape[0]-1)
-    interpol = (1-frac)*sortedds[index] + frac*sortedds[indexplus1]
-    return interpol
+    indices = [_percentileIndices(data.shape[0], p) for p in percs]
+    kth = set()
+    for i1, i2, frac in indices:
+        kth.update((i1, i2))
+    data.partition(sorted(kth))
+    return [ (1-frac)*data[i1] + frac*data[i2]
+             for i1, i2, frac in indices ]
 
 def swapline(painter, x1, y1, x2, y2, swap):
     """Draw line, swapping x and y coordinates if swap is True."""
@@ -65,45 +72,59 @@ def swapbox(painter, x1, y1, x2, y2, swap):
 class _Stats(object):
     """Store statistics about box."""
 
-    def calculate(self, data, whiskermode):
-        """Calculate statistics for data."""
+    def calculate(self, data, whiskermode, outliers=True, samplesize=0):
+        """Calculate statistics for data.
+
+        outliers: whether to find outliers
+        samplesize: if non-zero, estimate percentiles from this number
+                    of evenly spaced values, if there are more values
+        """
         cleaned = data[ N.isfinite(data) ]
-        cleaned.sort()
+        self.outliers = N.array([])
 
         if len(cleaned) == 0:
             self.median = self.botquart = self.topquart = self.mean = \
                 self.botwhisker = self.topwhisker = N.nan
             return
 
-        self.median = percentile(cleaned, 50)
-        self.botquart = percentile(cleaned, 25)
-        self.topquart = percentile(cleaned, 75)
         self.mean = N.mean(cleaned)
-        
+
+        percs = [50, 25, 75]
+        if whiskermode == '9/91 percentile':
+            percs += [9, 91]
+        elif whiskermode == '2/98 percentile':
+            percs += [2, 98]
+        elif whiskermode not in ('min/max', '1.5IQR', '1 stddev'):
+            raise RuntimeError("Invalid whisker mode")
+
+        if samplesize > 1 and len(cleaned) > samplesize:
+            sample = cleaned[ N.linspace(
+                0, len(cleaned)-1, samplesize).astype(N.intp) ]
+        else:
+            sample = cleaned
+        vals = percentilesPartition(sample, percs)
+        self.median, self.botquart, self.topquart = vals[:3]
+
         if whiskermode == 'min/max':
             self.botwhisker = cleaned.min()
             self.topwhisker = cleaned.max()
         elif whiskermode == '1.5IQR':
+            # nearest value within range, or extreme value if none
             iqr = self.topquart - self.botquart
-            eltop = N.searchsorted(cleaned, self.topquart+1.5*iqr)-1
-            self.topwhisker = cleaned[eltop]
-            elbot = max(N.searchsorted(cleaned, self.botquart-1.5*iqr)-1, 0)
-            self.botwhisker = cleaned[elbot]
+            below = cleaned[ cleaned < self.topquart+1.5*iqr ]
+            self.topwhisker = below.max() if len(below) else cleaned.max()
+            below = cleaned[ cleaned < self.botquart-1.5*iqr ]
+            self.botwhisker = below.max() if len(below) else cleaned.min()
         elif whiskermode == '1 stddev':
             stddev = N.std(cleaned)
             self.topwhisker = self.mean+stddev
             self.botwhisker = self.mean-stddev
-        elif whiskermode == '9/91 percentile':
-            self.topwhisker = percentile(cleaned, 91)
-            self.botwhisker = percentile(cleaned, 9)
-        elif whiskermode == '2/98 percentile':
-            self.topwhisker = percentile(cleaned, 98)
-            self.botwhisker = percentile(cleaned, 2)
         else:
-            raise RuntimeError("Invalid whisker mode")
+            self.botwhisker, self.topwhisker = vals[3:]
 
-        self.outliers = cleaned[ (cleaned < self.botwhisker) |
-                                 (cleaned > self.topwhisker) ]
+        if outliers:
+            self.outliers = cleaned[ (cleaned < self.botwhisker) |
+                                     (cleaned > self.topwhisker) ]
 
 class BoxPlot(GenericPlotter):
     """Plot bar charts."""
@@ -112,6 +133,12 @@ class BoxPlot(GenericPlotter):
     allowusercreation=True
     description=_('Plot box plots')
 
+    def __init__(self, *args, **argsv):
+        GenericPlotter.__init__(self, *args, **argsv)
+
+        # map dataset names to (key, _Stats)
+        self.statscache = {}
+
     @classmethod
     def addSettings(klass, s):
         """Construct list of settings."""
@@ -127,6 +154,12 @@ class BoxPlot(GenericPlotter):
                               '1.5IQR', 
                               descr = _('Whisker mode'), 
                               usertext=_('Whisker mode')), 0 )
+        s.add( setting.Int('samplesize', 0,
+                           minval=0,
+                           descr=_('Estimate percentiles from this number '
+                                   'of values for larger datasets, or 0 to '
+                                   'use all values'),
+                           usertext=_('Sample size')), 1 )
 
         s.add( setting.Choice('direction', 
                               ('horizontal', 'vertical'), 'vertical', 
@@ -178,7 +211,8 @@ class BoxPlot(GenericPlotter):
                                   descr = _('Calculate statistics from datasets'
                                             ' rather than given manually'),
                                   usertext = _('Calculate'),
-                                  settingstrue=('whiskermode', 'values'),
+                                  settingstrue=('whiskermode', 'samplesize',
+                                                'values'),
                                   settingsfalse=('boxmin', 'whiskermin',
                                                  'boxmax', 'whiskermax',
                                                  'mean', 'median')), 0 )
@@ -311,6 +345,40 @@ class BoxPlot(GenericPlotter):
         positions = self.getPosns()
         return (text, positions)
 
+    def calculatedStats(self, values):
+        """Get statistics for the datasets values, which are cached
+        until the datasets or settings change."""
+
+        s = self.settings
+        doc = self.document
+        showoutliers = ( s.outliersmarker != 'none' and not (
+            s.MarkersLine.hide and s.MarkersFill.hide) )
+        params = (s.whiskermode, s.samplesize, showoutliers)
+
+        # names of datasets returned by setting
+        ids = set([id(v) for v in values])
+        names = [n for n in s.values if id(doc.data.get(n)) in ids]
+
+        cache = {}
+        out = []
+        for name in names:
+            key = (doc.datasetChangeKey(name), params)
+            if name in cache:
+                entry = cache[name]
+            else:
+                entry = self.statscache.get(name)
+            if entry is None or entry[0] != key:
+                stats = _Stats()
+                stats.calculate(
+                    doc.data[name].data, s.whiskermode,
+                    outliers=showoutliers, samplesize=s.samplesize)
+                entry = (key, stats)
+            cache[name] = entry
+            out.append(entry[1])
+
+        self.statscache = cache
+        return out
+
     def plotBox(self, painter, axes, boxposn, posn, width, clip, stats):
         """Draw box for dataset."""
 
@@ -435,9 +503,8 @@ class BoxPlot(GenericPlotter):
 
         if s.calculate:
             # calculated boxes
-            for vals, plotpos in czip(values, plotposns):
-                stats = _Stats()
-                stats.calculate(vals.data, s.whiskermode)
+            for stats, plotpos in czip(
+                    self.calculatedStats(values), plotposns):
                 self.plotBox(painter, axes, plotpos, widgetposn, width,
                              clip, stats)
         else:
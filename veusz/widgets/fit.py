@@ -22,6 +22,8 @@
 from __future__ import division, absolute_import, print_function
 import re
 import sys
+import time
+from multiprocessing.pool import ThreadPool
 
 import numpy as N
 
@@ -34,21 +36,34 @@ from .. import qtall as qt4
 from .function import FunctionPlotter
 from . import widget
 
-# try importing iminuit first, then minuit, then None
-try:
-    import iminuit as minuit
-except ImportError:
-    try:
-        import minuit
-    except ImportError:
-        minuit = None
+# minuit module, imported when first needed (None if unavailable)
+_minuit = False
+
+def getMinuit():
+    """Try importing iminuit first, then minuit, then None."""
+    global _minuit
+    if _minuit is False:
+        try:
+            import iminuit as _minuit
+        except ImportError:
+            try:
+                import minuit as _minuit
+            except ImportError:
+                _minuit = None
+    return _minuit
 
 def _(text, disambiguation=None, context='Fit'):
     """Translate text."""
     return qt4.QCoreApplication.translate(context, text, disambiguation)
 
-def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
-    """Do fitting with minuit (if installed)."""
+def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr,
+              verbose=True):
+    """Do fitting with minuit (if installed).
+
+    If verbose is False, progress and results are not printed."""
+
+    # output function, if verbose
+    out = print if verbose else (lambda *args: None)
 
     def chi2(params):
         """generate a lambda function to impedance-match between PyMinuit's
@@ -58,7 +73,7 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
             chi2.iters += 1
             p = [chi2.iters, c] + params.tolist()
             str = ("%5i " + "%8g " * (len(params)+1)) % tuple(p)
-            print(str)
+            out(str)
 
         return c
 
@@ -68,8 +83,8 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
     # this is safe because the only user-controlled variable is len(names)
     fn = eval(fnstr, {'chi2' : chi2, 'N' : N})
 
-    print(_('Fitting via Minuit:'))
-    m = minuit.Minuit(fn, **values)
+    out(_('Fitting via Minuit:'))
+    m = getMinuit().Minuit(fn, **values)
 
     # run the fit
     chi2.runningFit = True
@@ -85,7 +100,7 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
         m.minos()
         have_err = True
     except Exception as e:
-        print(e)
+        out(e)
         if str(e).startswith('Discovered a new minimum'):
             # the initial fit really failed
             raise
@@ -96,25 +111,151 @@ def minuitFit(evalfunc, params, names, values, xvals, yvals, yserr):
     redchi2 = retchi2 / dof
 
     if have_err:
-        print(_('Fit results:\n') + "\n".join([
+        out(_('Fit results:\n') + "\n".join([
                     u"    %s = %g \u00b1 %g (+%g / %g)"
                     % (n, m.values[n], m.errors[n], m.merrors[(n, 1.0)],
                        m.merrors[(n, -1.0)]) for n in names]))
     elif have_symerr:
-        print(_('Fit results:\n') + "\n".join([
+        out(_('Fit results:\n') + "\n".join([
                     u"    %s = %g \u00b1 %g" % (n, m.values[n], m.errors[n])
                     for n in names]))
-        print(_('MINOS error estimate not available.'))
+        out(_('MINOS error estimate not available.'))
     else:
-        print(_('Fit results:\n') + "\n".join([
+        out(_('Fit results:\n') + "\n".join([
                     '    %s = %g' % (n, m.values[n]) for n in names]))
-        print(_('No error analysis available: fit quality uncertain'))
+        out(_('No error analysis available: fit quality uncertain'))
 
-    print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (retchi2, dof, redchi2))
+    out("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (retchi2, dof, redchi2))
 
     vals = dict(m.values)
     return vals, retchi2, dof
 
+class FitInput(object):
+    """Function, parameters and data for a fit, from Fit.prepareFit."""
+
+    def __init__(self, evalfunc, params, paramnames, values,
+                 xvals, yvals, yserr):
+        self.evalfunc = evalfunc
+        self.params = params
+        self.paramnames = paramnames
+        self.values = values
+        self.xvals = xvals
+        self.yvals = yvals
+        self.yserr = yserr
+
+class FitOutput(object):
+    """Results of runFit.
+
+    vals: dict of best fitting parameter values
+    chi2, dof: chi^2 and degrees of freedom of fit
+    elapsed: time taken for fit in seconds
+    message: status of fit
+    """
+
+    def __init__(self, vals, chi2, dof, elapsed, message):
+        self.vals = vals
+        self.chi2 = chi2
+        self.dof = dof
+        self.elapsed = elapsed
+        self.message = message
+
+def runFit(fitinput, verbose=True):
+    """Do the fit, either via Minuit or our own LM fitter.
+
+    This does not access the document, so can be run in a thread.
+    Returns a FitOutput.
+    """
+
+    fi = fitinput
+    starttime = time.time()
+    message = ''
+
+    if getMinuit() is not None:
+        vals, chi2, dof = minuitFit(
+            fi.evalfunc, fi.params, fi.paramnames, fi.values,
+            fi.xvals, fi.yvals, fi.yserr, verbose=verbose)
+    else:
+        if verbose:
+            print(_('Minuit not available, falling back to simple L-M fitting:'))
+        res = utils.FitterLM(
+            fi.evalfunc, fi.xvals, fi.yvals, fi.yserr).fit(fi.params)
+        chi2, dof, message = res.chi2, res.dof, res.message
+        vals = {}
+        for i, v in czip(fi.paramnames, res.params):
+            vals[i] = float(v)
+
+        if verbose:
+            print(_('%s (%i iterations, %i evaluations, %.3gs)') % (
+                res.message, res.iters, res.nevals, res.elapsed))
+            if res.errors is not None:
+                print(_('Fit results:\n') + "\n".join([
+                    u"    %s = %g \u00b1 %g" % (n, v, e) for n, v, e in
+                    czip(fi.paramnames, res.params, res.errors)]))
+            print("chi^2 = %g, dof = %i, reduced-chi^2 = %g" % (
+                chi2, dof, res.redchi2))
+
+    return FitOutput(vals, chi2, dof, time.time()-starttime, message)
+
+def fitWidgets(fitwidgets, threads=0):
+    """Fit several Fit widgets concurrently.
+
+    The fits are run in a pool of threads (the number of CPUs if
+    threads is 0). The results are applied to the document as a single
+    operation, so can be undone in one step.
+
+    Returns a list of (widget, FitOutput) for the widgets fitted.
+    """
+
+    if not fitwidgets:
+        return []
+
+    # get the data in this thread, as this accesses the document
+    inputs = []
+    for w in fitwidgets:
+        fitinput = w.prepareFit()
+        if fitinput is not None:
+            inputs.append((w, fitinput))
+
+    def dofit(fitinput):
+        try:
+            return runFit(fitinput, verbose=False)
+        except Exception as e:
+            return FitOutput(None, -1., -1, 0., cstr(e))
+
+    pool = ThreadPool(threads if threads > 0 else None)
+    try:
+        outputs = pool.map(dofit, [fi for w, fi in inputs])
+    finally:
+        pool.close()
+
+    results = []
+    operations = []
+    for (w, fitinput), out in czip(inputs, outputs):
+        results.append((w, out))
+        if out.vals is not None:
+            operations += w.fitOperations(out.vals, out.chi2, out.dof)
+
+    if operations:
+        fitwidgets[0].document.applyOperation(
+            document.OperationMultiple(operations, descr=_('fit widgets')) )
+
+    return results
+
+def fitReport(results):
+    """Return text table of chi^2 and timing from fitWidgets results."""
+
+    lines = []
+    for w, out in results:
+        if out.vals is None:
+            lines.append('%s: failed (%s)' % (w.path, out.message))
+        else:
+            redchi2 = out.chi2/out.dof if out.dof > 0 else -1.
+            lines.append(
+                '%s: chi^2 = %g, dof = %i, reduced-chi^2 = %g, %.3gs%s' % (
+                    w.path, out.chi2, out.dof, redchi2, out.elapsed,
+                    ' (%s)' % out.message if out.message else ''))
+    return '\n'.join(lines)
+
 class Fit(FunctionPlotter):
     """A plotter to fit a function to data."""
 
@@ -232,15 +373,18 @@ class Fit(FunctionPlotter):
             ops.append( document.OperationSettingSet(
                     labelwidget.settings.get('label') , text ) )
 
-    def actionFit(self):
-        """Fit the data."""
+    def prepareFit(self):
+        """Get the data and function to fit.
+
+        Returns a FitInput, or None if the fit cannot be done.
+        """
 
         s = self.settings
 
         # check and get compiled for of function
         compiled = self.document.evaluate.compileCheckedExpression(s.function)
         if compiled is None:
-            return
+            return None
 
         # populate the input parameters
         paramnames = sorted(s.values)
@@ -284,14 +428,19 @@ class Fit(FunctionPlotter):
                                                 drange[0], drange[1]))
 
         evalenv = self.initEnviron()
+        variable = s.variable
         def evalfunc(params, xvals):
             # update environment with variable and parameters
-            evalenv[self.settings.variable] = xvals
+            evalenv[variable] = xvals
             evalenv.update( czip(paramnames, params) )
 
             try:
                 return eval(compiled, evalenv) + xvals*0.
             except Exception as e:
+                if N.ndim(params) > 1:
+                    # batched evaluation failed; the fitter falls back
+                    # to evaluating each parameter set separately
+                    raise
                 self.document.log(cstr(e))
                 return N.nan
 
@@ -317,14 +466,10 @@ class Fit(FunctionPlotter):
         # various error checks
         if len(xvals) != len(yvals) or len(xvals) != len(yserr):
             sys.stderr.write(_('Fit data not equal in length. Not fitting.\n'))
-            return
+            return None
         if len(params) > len(xvals):
             sys.stderr.write(_('No degrees of freedom for fit. Not fitting\n'))
-            return
-
-        # actually do the fit, either via Minuit or our own LM fitter
-        chi2 = 1
-        dof = 1
+            return None
 
         # only consider finite values
         finite = N.isfinite(xvals) & N.isfinite(yvals) & N.isfinite(yserr)
@@ -335,19 +480,15 @@ class Fit(FunctionPlotter):
         # check length after excluding non-finite values
         if len(xvals) == 0:
             sys.stderr.write(_('No data values. Not fitting.\n'))
-            return
+            return None
 
-        if minuit is not None:
-            vals, chi2, dof = minuitFit(
-                evalfunc, params, paramnames, s.values,
-                xvals, yvals, yserr)
-        else:
-            print(_('Minuit not available, falling back to simple L-M fitting:'))
-            retn, chi2, dof = utils.fitLM(
-                evalfunc, params, xvals, yvals, yserr)
-            vals = {}
-            for i, v in czip(paramnames, retn):
-                vals[i] = float(v)
+        return FitInput(evalfunc, params, paramnames, dict(s.values),
+                        xvals, yvals, yserr)
+
+    def fitOperations(self, vals, chi2, dof):
+        """Get list of operations to set the results of the fit."""
+
+        s = self.settings
 
         # list of operations do we can undo the changes
         operations = []
@@ -371,8 +512,20 @@ class Fit(FunctionPlotter):
 
         self.updateOutputLabel(operations, vals, chi2, dof)
 
+        return operations
+
+    def actionFit(self):
+        """Fit the data."""
+
+        fitinput = self.prepareFit()
+        if fitinput is None:
+            return
+
+        res = runFit(fitinput)
+        operations = self.fitOperations(res.vals, res.chi2, res.dof)
+
         # actually change all the settings
-        d.applyOperation(
+        self.document.applyOperation(
             document.OperationMultiple(operations, descr=_('fit')) )
 
     def generateOutputExpr(self, vals):
@@ -23,7 +23,7 @@ import collections
 import textwrap
 import numpy as N
 
-from ..compat import crange, citems
+from ..compat import crange, citems, cbasestr
 from .. import qtall as qt4
 from .. import document
 from .. import setting
@@ -49,6 +49,30 @@ def _resolveLinkedAxis(axis):
             return None
     return axis
 
+def _settingValues(settings):
+    """Get list of values of settings, excluding groups of settings."""
+    return [s.val for s in settings.getSettingList()]
+
+def _datasetKey(plotter):
+    """Get a key which changes when the datasets used by plotter change.
+
+    Expressions or missing datasets use a key which changes when any
+    dataset changes."""
+
+    doc = plotter.document
+    key = [doc.evaluate.contextchangeset]
+    for s in plotter.settings.getSettingList():
+        if isinstance(s, (setting.Dataset, setting.Datasets)):
+            val = s.val
+            for name in (val if isinstance(val, list) else [val]):
+                if not isinstance(name, cbasestr) or not name:
+                    continue
+                if name in doc.data:
+                    key.append(doc.datasetChangeKey(name))
+                else:
+                    key.append(doc.datachangeset)
+    return key
+
 class AxisDependHelper(object):
     """A class to work out the dependency of widgets on axes and vice
     versa, in terms of ranges of the axes.
@@ -87,9 +111,14 @@ class AxisDependHelper(object):
       * Don't keep track of range separately -> propagate to real axis
       * For dependency order resolution, use real axis
       * In self.deps, use axisfunction axis so we know which axis to use
+
+    The ranges from plotters are cached in rangecache, and are reused
+    if the settings of the plotter and axis and the datasets used by
+    the plotter are unchanged. The helper can be reused to find the
+    ranges again if the widgets have not changed.
     """
 
-    def __init__(self):
+    def __init__(self, rangecache=None):
         # map widgets to widgets it depends on
         self.deps = collections.defaultdict(list)
         # list of axes
@@ -100,6 +129,11 @@ class AxisDependHelper(object):
         self.ranges = {}
         # pairs of dependent widgets
         self.pairs = []
+        # order to process dependencies, once found
+        self.ordered = None
+
+        # map (plotter, axis, depname) to (key, range)
+        self.rangecache = {} if rangecache is None else rangecache
 
         # track axes which map from one axis to another
         self.axis_to_axislinked = {}
@@ -191,14 +225,33 @@ class AxisDependHelper(object):
         axis.setAutoRange(axrange)
         del self.ranges[axis]
 
+    def _plotterRange(self, axis, plotter, plotterdep):
+        """Get the range of plotter for axis, using the cache if
+        possible."""
+
+        therange = list(defaultrange)
+        if plotter.requiresAxisRange():
+            # depends on the ranges of other axes, so do not cache
+            plotter.getRange(axis, plotterdep, therange)
+            return therange
+
+        cachekey = (plotter, axis, plotterdep)
+        key = ( _settingValues(plotter.settings),
+                _settingValues(axis.settings),
+                _datasetKey(plotter) )
+        entry = self.oldrangecache.get(cachekey)
+        if entry is None or entry[0] != key:
+            plotter.getRange(axis, plotterdep, therange)
+            entry = (key, therange)
+        self.rangecache[cachekey] = entry
+        return list(entry[1])
+
     def _updateRangeFromPlotter(self, axis, plotter, plotterdep):
         """Update the range for axis from the plotter."""
 
+        therange = self._plotterRange(axis, plotter, plotterdep)
         if axis.isLinked():
             # take range and map back to real axis
-            therange = list(defaultrange)
-            plotter.getRange(axis, plotterdep, therange)
-
             if therange != defaultrange:
                 # follow up chain
                 loopcheck = set()
@@ -214,7 +267,9 @@ class AxisDependHelper(object):
                         N.nanmax((self.ranges[axis][1], therange[1]))
                         ]
         else:
-            plotter.getRange(axis, plotterdep, self.ranges[axis])
+            axrange = self.ranges[axis]
+            axrange[0] = min(axrange[0], therange[0])
+            axrange[1] = max(axrange[1], therange[1])
 
     def processWidgetDeps(self, dep):
         """Process dependencies for a single widget."""
@@ -233,6 +288,15 @@ class AxisDependHelper(object):
                 if axis in self.ranges:
                     self._updateAxisAutoRange(axis)
 
+    def findOrder(self):
+        """Find order to process dependencies, breaking cycles."""
+        while True:
+            ordered, cyclic = utils.topological_sort(self.pairs)
+            if not cyclic:
+                break
+            self.breakCycles(cyclic)
+        self.ordered = ordered
+
     def processDepends(self):
         """Go through dependencies of widget.
         If the dependency has no dependency itself, then update the
@@ -246,15 +310,11 @@ class AxisDependHelper(object):
           widget. Then delete that depency from the dependency list.
         """
 
-        # get ordered list, breaking cycles
-        while True:
-            ordered, cyclic = utils.topological_sort(self.pairs)
-            if not cyclic:
-                break
-            self.breakCycles(cyclic)
+        if self.ordered is None:
+            self.findOrder()
 
         # iterate over widgets in order
-        for dep in ordered:
+        for dep in self.ordered:
             self.processWidgetDeps(dep)
 
             # process deps for any axis functions
@@ -268,18 +328,34 @@ class AxisDependHelper(object):
         Follows the dependencies calculated above.
         """
 
+        self.ranges = dict([(axis, list(defaultrange))
+                            for axis in self.axes])
+
+        # keep only ranges used this time in the cache
+        self.oldrangecache = self.rangecache
+        self.rangecache = {}
+
         self.processDepends()
 
         # set any remaining ranges
         for axis in list(self.ranges.keys()):
             self._updateAxisAutoRange(axis)
 
+        del self.oldrangecache
+
 class Page(widget.Widget):
     """A class for representing a page of plotting."""
 
     typename='page'
     allowusercreation = True
     description=_('Blank page')
+
+    def __init__(self, *args, **argsv):
+        widget.Widget.__init__(self, *args, **argsv)
+
+        # axis dependencies, reused while the document is unchanged
+        self.axisdependhelper = None
+        self.axisdependchangeset = None
  
     @classmethod
     def addSettings(klass, s):
@@ -321,9 +397,18 @@ class Page(widget.Widget):
         # document should pass us the page bounds
         x1, y1, x2, y2 = parentposn
 
-        # find ranges of axes
-        axisdependhelper = AxisDependHelper()
-        axisdependhelper.recursivePlotterSearch(self)
+        # find ranges of axes, only looking for dependencies again if
+        # the document has changed
+        axisdependhelper = self.axisdependhelper
+        changeset = self.document.changeset
+        if axisdependhelper is None or self.axisdependchangeset != changeset:
+            axisdependhelper = AxisDependHelper(
+                rangecache = None if self.axisdependhelper is None
+                else self.axisdependhelper.rangecache)
+            axisdependhelper.recursivePlotterSearch(self)
+            axisdependhelper.findOrder()
+            self.axisdependhelper = axisdependhelper
+            self.axisdependchangeset = changeset
         axisdependhelper.findAxisRanges()
 
         # store axis->plotter mappings in painthelper
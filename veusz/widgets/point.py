@@ -492,22 +492,12 @@ class PointPlotter(GenericPlotter):
         dsetn = self.settings.get(dataname)
         data = dsetn.getData(self.document)
 
-        if axis.settings.log:
-            def updateRange(v):
-                with N.errstate(invalid='ignore'):
-                    chopzero = v[(v>0) & N.isfinite(v)]
-                if len(chopzero) > 0:
-                    axrange[0] = min(axrange[0], chopzero.min())
-                    axrange[1] = max(axrange[1], chopzero.max())
-        else:
-            def updateRange(v):
-                fvals = v[N.isfinite(v)]
-                if len(fvals) > 0:
-                    axrange[0] = min(axrange[0], fvals.min())
-                    axrange[1] = max(axrange[1], fvals.max())
-
         if data:
-            data.rangeVisit(updateRange)
+            # only positive values for log axes
+            drange = data.getErrorRange(positive=axis.settings.log)
+            if drange is not None:
+                axrange[0] = min(axrange[0], drange[0])
+                axrange[1] = max(axrange[1], drange[1])
         elif dsetn.isEmpty():
             # no valid dataset.
             # check if there a valid dataset for the other axis.
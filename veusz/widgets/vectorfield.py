@@ -19,9 +19,9 @@
 ###############################################################################
 
 from __future__ import division
+import math
 import numpy as N
 
-from ..compat import czip
 from .. import setting
 from .. import document
 from .. import utils
@@ -81,6 +81,12 @@ class VectorField(plotters.GenericPlotter):
             descr = _('Reflect vector in Y direction'),
             usertext = _('Reflect Y')),
                5 )
+        s.add( setting.Bool(
+            'decimate', False,
+            descr = _('Plot a subset of vectors, so that there is at most '
+                      'one vector per output pixel'),
+            usertext = _('Decimate')),
+               6 )
 
         # formatting
         s.add( setting.DistancePt('baselength', '10pt',
@@ -155,6 +161,18 @@ class VectorField(plotters.GenericPlotter):
 
         painter.restore()
 
+    @staticmethod
+    def decimateStep(axis, posn, centres):
+        """Get step between grid points so that there is at most one
+        point per pixel along axis."""
+        if len(centres) < 2:
+            return 1
+        spacing = N.abs(N.diff(axis.dataToPlotterCoords(posn, centres)))
+        spacing = spacing[ N.isfinite(spacing) & (spacing > 0) ]
+        if len(spacing) == 0:
+            return 1
+        return max(1, int(math.ceil(1. / spacing.min())))
+
     def dataDraw(self, painter, axes, posn, cliprect):
         """Draw the widget."""
 
@@ -179,9 +197,21 @@ class VectorField(plotters.GenericPlotter):
         xw = min(data1st.shape[1], data2nd.shape[1])
         yw = min(data1st.shape[0], data2nd.shape[0])
 
+        data1st, data2nd = data1st[:yw, :xw], data2nd[:yw, :xw]
+
         # get pixel coordinates
         xc, yc = data1.getPixelCentres()
         xc, yc = xc[:xw], yc[:yw]
+
+        # only use a sub-grid if the vectors are closer than pixels
+        if s.decimate:
+            stepx = self.decimateStep(axes[0], posn, xc)
+            stepy = self.decimateStep(axes[1], posn, yc)
+            xc, yc = xc[::stepx], yc[::stepy]
+            data1st = data1st[::stepy, ::stepx]
+            data2nd = data2nd[::stepy, ::stepx]
+            xw, yw = len(xc), len(yc)
+
         xdsvals = N.reshape(N.tile(xc, yw), xw*yw)
         ydsvals = N.reshape(N.tile(yc[:, N.newaxis], xw), xw*yw)
 
@@ -193,12 +223,12 @@ class VectorField(plotters.GenericPlotter):
         painter.setPen(pen)
 
         if s.mode == 'cartesian':
-            dx = (data1st[:yw, :xw] * baselength).ravel()
-            dy = (data2nd[:yw, :xw] * baselength).ravel()
+            dx = (data1st * baselength).ravel()
+            dy = (data2nd * baselength).ravel()
 
         elif s.mode == 'polar':
-            r = data1st[:yw, :xw].ravel() * baselength
-            theta = data2nd[:yw, :xw].ravel()
+            r = data1st.ravel() * baselength
+            theta = data2nd.ravel()
             dx = r * N.cos(theta)
             dy = r * N.sin(theta)
 
@@ -228,16 +258,15 @@ class VectorField(plotters.GenericPlotter):
             lengths = N.sqrt(dx**2+dy**2) * 2
             
             # scale arrow heads by arrow length if requested
+            scaling = None
             if s.scalearrow:
-                arrowsizes = (arrowsize/baselength/2) * lengths
-            else:
-                arrowsizes = N.zeros(lengths.shape) + arrowsize
-
-            for x, y, l, a, asize in czip(x2, y2, lengths, angles, arrowsizes):
-                if l != 0.:
-                    utils.plotLineArrow(painter, x, y, l, a, asize,
-                                        arrowleft=s.arrowfront,
-                                        arrowright=s.arrowback)
-                
+                scaling = lengths / (2*baselength)
+
+            utils.plotLineArrows(painter, x2, y2, lengths, angles,
+                                 arrowsize=arrowsize, scaling=scaling,
+                                 arrowleft=s.arrowfront,
+                                 arrowright=s.arrowback,
+                                 clip=cliprect)
+
 # allow the factory to instantiate a vector field
 document.thefactory.register( VectorField )
@@ -344,6 +344,17 @@ class MainWindow(qt4.QMainWindow):
         self.vzactions['edit.redo'].setText(redotext)
         self.vzactions['edit.redo'].setEnabled(canredo)
 
+        # report memory used by history
+        inmem, ondisk = self.document.historyMemoryUsage()
+        memtext = _('history data uses %.1f MB in memory') % (
+            inmem/1024**2)
+        if ondisk:
+            memtext += _(', %.1f MB in temporary files') % (ondisk/1024**2)
+        self.vzactions['edit.undo'].setStatusTip(
+            '%s (%s)' % (_('Undo the previous operation'), memtext))
+        self.vzactions['edit.redo'].setStatusTip(
+            '%s (%s)' % (_('Redo the previous operation'), memtext))
+
     def slotEditUndo(self):
         """Undo the previous operation"""
         if self.document.canUndo():
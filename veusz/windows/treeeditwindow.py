@@ -906,6 +906,12 @@ class TreeEditDock(qt4.QDockWidget):
                     a(self, _('Renames the selected widget'), _('&Rename'),
                       self.slotWidgetRename,
                       icon='kde-edit-rename'),
+                'edit.fit':
+                    a(self, _('Fit the selected fit widgets and any fits '
+                              'within the selected widgets'),
+                      _('&Fit selected'),
+                      self.slotWidgetsFit,
+                      icon='button_fit'),
 
                 'add.shapemenu':
                     a(self, _('Add a shape to the plot'), _('Shape'),
@@ -980,7 +986,8 @@ class TreeEditDock(qt4.QDockWidget):
                     'edit.moveup',
                     'edit.movedown',
                     'edit.delete',
-                    'edit.rename'
+                    'edit.rename',
+                    'edit.fit',
                     )),
             )
         utils.constructMenus( self.parentwin.menuBar(),
@@ -995,7 +1002,8 @@ class TreeEditDock(qt4.QDockWidget):
         utils.addToolbarActions(self.edittoolbar,  actions,
                                 ('edit.cut', 'edit.copy', 'edit.paste',
                                  'edit.moveup', 'edit.movedown',
-                                 'edit.delete', 'edit.rename'))
+                                 'edit.delete', 'edit.rename',
+                                 'edit.fit'))
 
         self.parentwin.menus['edit.select'].aboutToShow.connect(
             self.updateSelectMenu)
@@ -1118,6 +1126,22 @@ class TreeEditDock(qt4.QDockWidget):
         self.selectWidget(self.document.basewidget)
         self.selectWidget(nextwidget)
 
+    def slotWidgetsFit(self):
+        """Fit any fit widgets in the selected widgets together."""
+
+        from ..widgets import fit
+        fitwidgets = []
+        for w in self.selwidgets:
+            allw = []
+            w.buildFlatWidgetList(allw)
+            for child in allw:
+                if isinstance(child, fit.Fit) and child not in fitwidgets:
+                    fitwidgets.append(child)
+
+        results = fit.fitWidgets(fitwidgets)
+        if results:
+            self.document.log(fit.fitReport(results))
+
     def slotWidgetRename(self):
         """Allows the user to rename the selected widget."""
 